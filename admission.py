@@ -0,0 +1,61 @@
+"""
+בקרת כניסה לבקשות פענוח.
+
+לפני שהבקשה קוראת את גוף הטופס בכלל:
+- RateLimiter: token bucket לכל כתובת IP (rate אסימונים לשנייה, עד burst),
+  עם מספר חסום של כתובות במעקב (LRU).
+- InFlightLimiter: תקרה למספר הפענוחים שרצים במקביל ב-worker; מעבר לה
+  עונים מיד ב-503 במקום לצבור תור ולהאט את כולם.
+גודל הגוף נאכף בנפרד דרך MAX_CONTENT_LENGTH של Flask/Werkzeug.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """0 אם הבקשה מותרת, אחרת כמה שניות לחכות עד האסימון הבא"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            # הכתובת שלא נראתה הכי הרבה זמן יוצאת (ומתחילה מחדש עם burst מלא)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class InFlightLimiter:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """True אם יש מקום לבקשה נוספת (ואז חובה לקרוא ל-release)"""
+        with self._lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
@@ -1,306 +1,701 @@
-from flask import Flask, request, render_template, Response, redirect, url_for, flash, session
-from ics import Calendar, Event
-from datetime import datetime, timedelta
-import pytz
+from flask import Flask, request, render_template, Response, redirect, url_for, flash, session, jsonify, g, stream_with_context
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+import math
+import os
 import re
-import io
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from admission import InFlightLimiter, RateLimiter
+from assets import EncodedBodies, compress, init_app as init_assets, negotiate_encoding
+from chat_export import MAX_EXPORT_BYTES, MODES as CHAT_MODES, find_roster_blocks, map_export, parse_blocks, select_blocks
+
+from events import EventBatch, format_seconds
+from feeds import FeedStore, events_fingerprint, new_token
+from intervals import IntervalIndex
+from ics_reader import iter_merged_calendar
+from ics_writer import calendar_dtstamp, calendar_index, calendar_text, diff_index, iter_delta_calendar, recurring_calendar_text
+from mailer import MailQueue
+from metrics import Registry, SlowRequestSampler, current_timer, start_timer, stop_timer
+from parsers import classify_line, dispatch_stats, iter_rows, parse_schedule
+from previews import PreviewStore
+from response_cache import CachedCalendar, cache_key, create_cache
+from timezones import EPOCH_ORDINAL, LOCAL, UTC
+from vocabulary import DEFAULT_PROFILE, VocabularyStore
 
 app = Flask(__name__)
 app.secret_key = 'Yyt7M@RW^El*o'  
 
-def _parse_hour_minute(hhmm):
+# מטמון תוצאות לפי תוכן הלו"ז. SCHEDULE_CACHE_DIR (למשל /dev/shm/calander-cache)
+# משתף את המטמון בין כל ה-workers של gunicorn
+response_cache = create_cache(
+    directory=os.environ.get("SCHEDULE_CACHE_DIR"),
+    max_entries=int(os.environ.get("SCHEDULE_CACHE_SIZE", 256)),
+    ttl=int(os.environ.get("SCHEDULE_CACHE_TTL", 600)),
+)
+
+# פרופילי אוצר מילים ליחידות (<name>.json בתיקייה), מקומפלים ונשמרים ב-LRU
+vocabulary_store = VocabularyStore(
+    os.environ.get("VOCABULARY_DIR", os.path.join(app.root_path, "vocabularies")),
+    max_entries=int(os.environ.get("VOCABULARY_CACHE_SIZE", 32)),
+)
+
+# מאגר מנויי ה-webcal (לו"ז אחרון לכל טוקן); פיד שלא נשלח ולא נמשך
+# במשך FEED_TTL שניות נמחק
+feed_store = FeedStore(
+    os.environ.get("FEED_DB_PATH", "feeds.db"),
+    ttl=int(os.environ.get("FEED_TTL", 90 * 86400)),
+)
+
+# תצוגות מקדימות בצד השרת - ב-session נשמר רק מזהה קצר
+preview_store = PreviewStore(
+    os.environ.get("PREVIEW_DB_PATH", "previews.db"),
+    max_lines=int(os.environ.get("PREVIEW_MAX_LINES", 500)),
+    ttl=int(os.environ.get("PREVIEW_TTL", 3600)),
+)
+
+# שליחת הקובץ במייל ברקע - פעיל רק אם הוגדרו SENDGRID_API_KEY ו-MAIL_FROM.
+# הכתובת מגיעה מהטופס, ולכן השליחה מוגבלת במכסות יומיות (mailer.MailQuota)
+mail_queue = MailQueue.from_env()
+_EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# אורך קלט מקסימלי (בתווים) ללו"ז שנשלח בטופס או כגוף text/plain
+MAX_SCHEDULE_CHARS = int(os.environ.get("MAX_SCHEDULE_CHARS", 200_000))
+
+# מדדים ל-/metrics (לכל worker בנפרד) וזמני שלבים לכותרת Server-Timing
+metrics = Registry(prefix="calander_")
+REQUESTS = metrics.counter("requests_total", "HTTP requests by endpoint, method and status", ("endpoint", "method", "status"))
+REQUEST_ERRORS = metrics.counter("request_errors_total", "Requests answered with a 5xx status", ("endpoint",))
+SCHEDULES_REJECTED = metrics.counter("schedules_rejected_total", "Submitted schedules rejected with parse errors")
+REQUEST_SECONDS = metrics.histogram("request_duration_seconds", "Request latency", ("endpoint",))
+STAGE_SECONDS = metrics.histogram("stage_duration_seconds", "Time per request stage", ("stage",))
+
+# פרופיילר דוגם לבקשות איטיות - פעיל רק אם הוגדר SLOW_REQUEST_MS
+slow_sampler = SlowRequestSampler.from_env()
+
+# בקרת כניסה לשליחות לו"ז, לפני קריאת הגוף: גודל מקסימלי (טקסט עברי
+# בטופס urlencoded תופס עד 6 בתים לתו), קצב לכל IP ופענוחים במקביל ל-worker
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", MAX_SCHEDULE_CHARS * 6 + 64 * 1024))
+RATE_LIMIT_PER_MINUTE = float(os.environ.get("RATE_LIMIT_PER_MINUTE", 30))
+rate_limiter = (
+    RateLimiter(RATE_LIMIT_PER_MINUTE / 60, int(os.environ.get("RATE_LIMIT_BURST", 10)))
+    if RATE_LIMIT_PER_MINUTE > 0 else None
+)
+# התקרה נבדקת רק בין threads של אותו worker: עם workers סינכרוניים (thread
+# אחד) אין אף פעם שתי בקשות במקביל והיא לא נכנסת לפעולה. תחת gunicorn היא
+# נקבעת לפי מספר ה-threads (size_parse_slots), אלא אם MAX_INFLIGHT_PARSES הוגדר
+parse_slots = InFlightLimiter(int(os.environ.get("MAX_INFLIGHT_PARSES", 4)))
+# קבצים שמועלים (יומן למיזוג, ייצוא צ'אט) נקראים שורה-שורה או דרך mmap,
+# אז אפשר לאפשר קבצים גדולים
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 16 * 1024 * 1024))
+# ייצוא צ'אט ב-zip מחולץ לקובץ זמני עד התקרה הזו
+MAX_CHAT_EXPORT_BYTES = int(os.environ.get("MAX_CHAT_EXPORT_BYTES", MAX_EXPORT_BYTES))
+SHED = metrics.counter("shed_total", "Schedule submissions rejected by admission control", ("reason",))
+
+# נכסים סטטיים עם טביעת אצבע בשם, דחוסים מראש בזיכרון (asset_url בתבניות)
+asset_manifest = init_assets(app)
+
+# קובצי ICS נדחסים לפי Accept-Encoding; גוף עם ETag נדחס פעם אחת לכל קידוד
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+encoded_bodies = EncodedBodies(max_entries=64)
+
+# מאחורי reverse proxy (למשל Render) כתובת הלקוח מגיעה ב-X-Forwarded-For.
+# בלי זה כל המשתמשים חולקים את כתובת ה-proxy ואת ה-bucket שלו ב-rate_limiter.
+# Render מגדיר RENDER=true ויש לפניו hop אחד
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", 1 if os.environ.get("RENDER") else 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+_proxy_warning = TRUSTED_PROXY_HOPS == 0
+
+
+def warm_up(days_ahead=400):
+    """
+    טוענת מראש מצב לקריאה בלבד (טבלת היסטי אזור הזמן, המסווג) כדי שעם
+    gunicorn --preload כל ה-workers יקבלו אותו משותף מתהליך האב.
+    """
+    today = datetime.now().date()
+    for offset in range(-7, days_ahead):
+        day = today + timedelta(days=offset)
+        LOCAL.to_local(LOCAL.to_utc(datetime.combine(day, time(12, 0))))
+        LOCAL.local_seconds_to_utc((day.toordinal() - EPOCH_ORDINAL) * 86400)
+    classify_line("קשה 22-2")
+    vocabulary_store.warm_up()
+
+
+def size_parse_slots(threads):
+    """
+    תקרת הפענוחים במקביל לפי מספר ה-threads של ה-worker (נקראת מ-gunicorn.conf.py):
+    thread אחד נשאר פנוי לבקשות הזולות (פיד, נכסים, /metrics) גם כשכל השאר
+    מפענחים. MAX_INFLIGHT_PARSES שהוגדר במפורש גובר.
+    """
+    if "MAX_INFLIGHT_PARSES" not in os.environ:
+        parse_slots.limit = max(1, threads - 1)
+
+
+_PREVIEW_FORMAT = "%d/%m/%Y %H:%M"
+
+
+def _build_calendar(events):
+    """מייצרת מ-EventBatch את קובץ ה-ICS, שורות התצוגה המקדימה והחפיפות לשמירה במטמון"""
+    timer = current_timer()
+    with timer.stage("build"):
+        # הזמנים המקומיים כבר שמורים באצווה - אין צורך בהמרה חזרה מ-UTC
+        preview = [
+            f"{events.summary(n)}: {format_seconds(start, _PREVIEW_FORMAT)} - {format_seconds(end, _PREVIEW_FORMAT)}"
+            for n, (start, end) in enumerate(zip(events.local_starts, events.local_ends))
+        ]
+        # ערכי האינדקס הם מיקומי האירועים, כדי להשתמש שוב בשורות התצוגה
+        overlaps = IntervalIndex(zip(events.starts, events.ends, range(len(events))))
+        conflicts = [f"{preview[first]} חופף ל-{preview[second]}" for first, second in overlaps.conflicts()]
+        fingerprint = events_fingerprint(events)
+    with timer.stage("serialize"):
+        # ה-index מצמיד לכל אירוע UID יציב, שבו משתמש גם קובץ ה-ICS
+        index = calendar_index(events)
+        ics = calendar_text(events).encode("utf-8")
+    return CachedCalendar(ics, preview, fingerprint=fingerprint, index=index, conflicts=conflicts)
+
+
+def _request_vocabulary():
+    """פרופיל אוצר המילים שנבחר (profile בטופס או בשאילתה); None (אחרי flash) אם אינו מוכר"""
+    # בגוף text/plain הפרמטר מגיע רק בשאילתה - לא לגעת בזרם
+    source = request.args if request.mimetype == "text/plain" else request.values
+    try:
+        return vocabulary_store.get(source.get("profile") or DEFAULT_PROFILE)
+    except KeyError:
+        flash("פרופיל אוצר המילים לא מוכר.", "error")
+        return None
+
+
+def _schedule_calendar(schedule_text, vocabulary):
+    """הלוח המוכן ללו"ז מהמטמון או מפענוח חדש; None (אחרי flash של השגיאות) אם הלו"ז נדחה"""
+    variant = f"{vocabulary.name}:{vocabulary.version}" if vocabulary.version else ""
+    key = cache_key(schedule_text, variant=variant)
+    with g.timer.stage("cache"):
+        cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with g.timer.stage("parse"):
+        events, errors = parse_schedule(schedule_text, vocabulary=vocabulary)
+
+    if errors:
+        SCHEDULES_REJECTED.inc()
+        for error in errors:
+            flash(error, "error")
+        return None
+
+    if not events:
+        SCHEDULES_REJECTED.inc()
+        flash("לא נמצאו אירועים תקפים בטקסט שהוזן.", "error")
+        return None
+
+    cached = _build_calendar(events)
+    with g.timer.stage("cache"):
+        response_cache.put(key, cached)
+    return cached
+
+
+def _chat_calendar(upload, mode, vocabulary):
+    """הלוח מבלוקי הלו"ז שבייצוא הצ'אט שהועלה; None (אחרי flash) אם לא נמצא בו לו"ז תקין"""
+    if mode not in CHAT_MODES:
+        mode = "latest"
+    try:
+        with map_export(upload.stream, MAX_CHAT_EXPORT_BYTES) as data:
+            with g.timer.stage("scan"):
+                blocks = select_blocks(find_roster_blocks(data), mode)
+            if not blocks:
+                SCHEDULES_REJECTED.inc()
+                flash("לא נמצא לו\"ז בייצוא הצ'אט (כותרת שבוע ואחריה שורות יום).", "error")
+                return None
+            with g.timer.stage("parse"):
+                events, errors = parse_blocks(data, blocks, vocabulary)
+    except ValueError:
+        # zip פגום, או שהצ'אט שבתוכו גדול מ-MAX_CHAT_EXPORT_BYTES
+        SCHEDULES_REJECTED.inc()
+        flash("קובץ הייצוא פגום או גדול מדי.", "error")
+        return None
+
+    if errors:
+        SCHEDULES_REJECTED.inc()
+        for error in errors:
+            flash(error, "error")
+        return None
+
+    if not events:
+        SCHEDULES_REJECTED.inc()
+        flash("לא נמצאו אירועים תקפים בטקסט שהוזן.", "error")
+        return None
+    return _build_calendar(events)
+
+
+def _calendar_body(data, etag=None):
+    """(גוף, קידוד) לתגובת text/calendar לפי Accept-Encoding של הבקשה"""
+    if len(data) < COMPRESS_MIN_BYTES:
+        return data, None
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return data, None
+    if etag is None:
+        return compress(data, encoding), encoding
+    return encoded_bodies.get(etag, encoding, data), encoding
+
+
+def _calendar_variant(ics, etag, index, compact):
+    """
+    (ics, etag) - הלוח המלא, או במצב compact הלוח המכווץ (RRULE/EXDATE) עם ETag משלו.
+    הלוח המכווץ נגזר רק מהלוח המלא (כולל ה-DTSTAMP שלו), כך שה-ETag החזק
+    תמיד מתאר את אותם בתים - בכל בקשה ובכל worker
+    """
+    if not compact or not index:
+        return ics, etag
+    return recurring_calendar_text(index.items(), calendar_dtstamp(ics)).encode("utf-8"), f"{etag}-rrule"
+
+
+def _feed_token(create=False):
+    """הטוקן הקבוע של המשתמש לפיד ה-webcal, נשמר ב-session"""
+    token = session.get("feed_token")
+    if token is None and create:
+        token = new_token()
+        session["feed_token"] = token
+        session.permanent = True
+    return token
+
+
+def _feed_url(token):
+    url = url_for("feed", token=token, _external=True)
+    return "webcal://" + url.split("://", 1)[1]
+
+
+@app.before_request
+def _start_request_timer():
+    g.timer = start_timer()
+    if slow_sampler is not None:
+        slow_sampler.begin(f"{request.method} {request.path}")
+
+
+def _too_large():
+    SHED.inc("too_large")
+    flash("קלט ארוך מדי. אנא צמצם את לוח הזמנים שהוזן.", "error")
+    return redirect(url_for('index'))
+
+
+@app.before_request
+def _admit_schedule():
+    """דחייה מהירה (413/429/503) של שליחות לו"ז לפני שהגוף נקרא ומפוענח"""
+    if request.endpoint not in ("index", "merge") or request.method != "POST":
+        return None
+    if request.endpoint == "merge" or request.mimetype == "multipart/form-data":
+        # קובץ מצורף (יומן למיזוג או ייצוא צ'אט) מקבל תקרה משלו
+        request.max_content_length = app.config["MAX_CONTENT_LENGTH"] + MAX_UPLOAD_BYTES
+    if (request.content_length or 0) > request.max_content_length:
+        return _too_large()
+    if rate_limiter is not None:
+        global _proxy_warning
+        if _proxy_warning and "X-Forwarded-For" in request.headers:
+            # פעם אחת לכל worker: כנראה שיש proxy שלא הוגדר
+            _proxy_warning = False
+            app.logger.warning(
+                "X-Forwarded-For received but TRUSTED_PROXY_HOPS=0: rate limiting keys on the proxy address"
+            )
+        wait = rate_limiter.acquire(request.remote_addr or "unknown")
+        if wait:
+            SHED.inc("rate_limited")
+            return Response(
+                "יותר מדי בקשות. נסה שוב בעוד רגע.",
+                status=429,
+                mimetype="text/plain",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+    if not parse_slots.try_acquire():
+        SHED.inc("overloaded")
+        return Response(
+            "השרת עמוס כרגע. נסה שוב בעוד רגע.",
+            status=503,
+            mimetype="text/plain",
+            headers={"Retry-After": "1"},
+        )
+    g.parse_slot = True
+    return None
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def _request_too_large(error):
+    # גוף בלי Content-Length (chunked) שחרג מ-MAX_CONTENT_LENGTH תוך כדי קריאה
+    return _too_large()
+
+
+@app.after_request
+def _record_request(response):
+    timer = g.get("timer")
+    if timer is None:
+        return response
+    endpoint = request.endpoint or "unknown"
+    response.headers["Server-Timing"] = timer.server_timing()
+    REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    if response.status_code >= 500:
+        REQUEST_ERRORS.inc(endpoint)
+    REQUEST_SECONDS.observe(timer.elapsed(), endpoint)
+    for stage, seconds in timer.stages.items():
+        STAGE_SECONDS.observe(seconds, stage)
+    return response
+
+
+@app.teardown_request
+def _finish_request(exc):
+    if g.pop("parse_slot", False):
+        parse_slots.release()
+    stop_timer()
+    if slow_sampler is not None:
+        slow_sampler.end()
+
+
+@metrics.collector
+def _component_metrics():
+    """המונים הקיימים של המטמון, הפרסר ותור המייל, בזמן הקריאה"""
+    cache = response_cache.stats()
+    parser = dispatch_stats()
+    families = [
+        ("cache_hits_total", "counter", "Schedule cache hits", [({}, cache["hits"])]),
+        ("cache_misses_total", "counter", "Schedule cache misses", [({}, cache["misses"])]),
+        ("cache_evictions_total", "counter", "Expired schedule cache entries", [({}, cache["evictions"])]),
+        ("cache_entries", "gauge", "Entries in the schedule cache", [({}, cache["entries"])]),
+        (
+            "parser_dispatch_total", "counter", "Schedules dispatched per format",
+            [({"format": name}, count) for name, count in sorted(parser["formats"].items())],
+        ),
+        ("parser_sniff_seconds_total", "counter", "Time spent detecting formats", [({}, parser["sniff_ms_total"] / 1000)]),
+        ("parses_in_flight", "gauge", "Schedule submissions being processed", [({}, parse_slots.in_flight)]),
+        ("parses_in_flight_limit", "gauge", "Max concurrent schedule submissions per worker", [({}, parse_slots.limit)]),
+    ]
+    if mail_queue is not None:
+        families.append((
+            "mail_total", "counter", "Mail queue events by outcome",
+            [({"outcome": key}, value) for key, value in sorted(mail_queue.stats.items())],
+        ))
+    return families
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain", headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+def _remember_preview(preview_id):
     """
-    פונקציית עזר שמקבלת מחרוזת '22' או '22:30'
-    ומחזירה (22, 30). אם אין דקות מצוינות, מניחים 00.
+    שומרת ב-session את התצוגה המקדימה של השליחה הזו, יחד עם ה-nonce
+    שהטופס שלח (preview_nonce) - כך הדף יודע מתי התצוגה של השליחה שלו מוכנה
     """
-    parts = hhmm.split(":")
-    if len(parts) == 1:
-        hour = int(parts[0])
-        minute = 0
+    session["preview_id"] = preview_id
+    if request.mimetype == "text/plain":
+        session.pop("preview_nonce", None)
     else:
-        hour = int(parts[0])
-        minute = int(parts[1])
-    return hour, minute
-
-def parse_schedule(schedule_text):
-    events = []
-    errors = []
-    lines = schedule_text.split("\n")
-    local_tz = pytz.timezone("Asia/Jerusalem")
-
-    # מזהים "יום X" כמו "ראשון 23.03"
-    date_pattern = re.compile(r"^(?:\*?)?(?:יום )?(ראשון|שני|שלישי|רביעי|חמישי|שישי|שבת)\s+(\d{1,2}[./-]\d{1,2})")
-    # מזהים כותרת שבוע, לדוגמה: 🌟שבוע 13 (23-29/3) או 🌟שבוע 14 (30/3-5/4)
-    week_pattern = re.compile(r"^.*?שבוע\s+\d+\s+\((\d{1,2}[./-]\d{1,2})-?(\d{1,2}[./-]\d{1,2})\).*?$")
-    # תבנית גמישה יותר עבור טווח שעות בכל מקום בשורה (למשל "22-2 קשה", "קשה 22-2")
-    time_pattern = re.compile(r'(?:.*?)(\d{1,2}(?::\d{2})?)\s*-\s*(\d{1,2}(?::\d{2})?)(?:.*?)')
-
-    instructions_keywords = ["בקשות לחילופים", "כדי להכניס ללו״ז"]
-
-    i = 0
-    current_date = None
-    current_day_name = None
-
-    while i < len(lines):
-        line = lines[i].strip()
-        # אם הגענו לשורת הנחיות - מפסיקים עיבוד
-        if any(keyword in line for keyword in instructions_keywords):
-            break
-
-        # בדיקה אם זו שורת שבוע
-        if week_pattern.match(line):
-            i += 1
-            continue
-
-        # בדיקה אם זו שורת תאריך (לדוגמה: "ראשון 30.03")
-        date_match = date_pattern.match(line)
-        if date_match:
-            current_day_name = date_match.group(1).strip()  # "ראשון", "שבת" וכו'
-            date_str = date_match.group(2).replace("/", ".").replace("-", ".")
-
-            try:
-                # אם לא צוינה שנה, נוסיף את השנה הנוכחית
-                if len(date_str.split(".")) == 2:
-                    current_month = int(date_str.split(".")[1])
-                    current_year = datetime.now().year
-                    
-                    # אם החודש קטן מהחודש הנוכחי והוא לא דצמבר/ינואר, כנראה מדובר בשנה הבאה
-                    now = datetime.now()
-                    if current_month < now.month and not (now.month == 12 and current_month == 1):
-                        current_year += 1
-                        
-                    date_str += f".{current_year}"
-
-                parsed_date = datetime.strptime(date_str, "%d.%m.%Y")
-
-                # אם התאריך כבר עבר (קטן מהיום), נניח שמדובר בשנה הבאה (ניתן להסיר אם לא רצוי)
-                if parsed_date.date() < datetime.now().date():
-                    parsed_date = parsed_date.replace(year=parsed_date.year + 1)
-
-                current_date = local_tz.localize(parsed_date)
-
-            except Exception as e:
-                errors.append(f"שגיאה בעיבוד תאריך בשורה {i+1}: {e}")
-                current_date = None
-
-            i += 1
-
-            # לאחר זיהוי תאריך, נטפל בשורות הבאות עד שנגיע לתאריך חדש / שבוע חדש / הנחיות
-            while i < len(lines):
-                next_line = lines[i].strip()
-
-                # אם הגענו להנחיות - מפסיקים
-                if any(keyword in next_line for keyword in instructions_keywords):
-                    return events, errors
-
-                # יום חדש / שבוע חדש / שורה ריקה => נעצור את העיבוד ליום הזה
-                if not next_line or date_pattern.match(next_line) or week_pattern.match(next_line):
-                    break
-
-                if current_date is None:
-                    i += 1
-                    continue
-
-                # אם יש מילה "כוננות 60" בשורה
-                if "כוננות 60" in next_line:
-                    # נגדיר לדוגמה 08:00-08:00 למחרת
-                    start = datetime.combine(current_date.date(), datetime.strptime("08:00", "%H:%M").time())
-                    end = start + timedelta(days=1)
-                    events.append({
-                        "start": local_tz.localize(start).astimezone(pytz.utc),
-                        "end": local_tz.localize(end).astimezone(pytz.utc),
-                        "description": next_line  # כל הטקסט המקורי
-                    })
-                    i += 1
-                    continue
-
-                # ננסה לזהות טווח שעות בכל מקום בשורה:
-                time_match_res = time_pattern.search(next_line)  # <-- משתמשים ב-search
-
-                # אם זו שורה ריקה או רק עם הכותרת של היום - נדלג
-                if not next_line.strip() or next_line.strip() == current_day_name:
-                    i += 1
-                    continue
-
-                if time_match_res:
-                    # דוגמים את השעות
-                    start_time_raw = time_match_res.group(1).strip()  # לדוגמה "22", "22:30"
-                    end_time_raw   = time_match_res.group(2).strip()  # לדוגמה "2", "02:00"
-
-                    # המרה לפורמט עם אפסים מובילים
-                    sh, sm = _parse_hour_minute(start_time_raw)
-                    eh, em = _parse_hour_minute(end_time_raw)
-                    
-                    start_time_formatted = f"{sh:02d}:{sm:02d}"
-                    end_time_formatted = f"{eh:02d}:{em:02d}"
-
-                    # מסירים את הדקות אם הן 00
-                    start_time_display = start_time_formatted[:2] if start_time_formatted.endswith(":00") else start_time_formatted
-                    end_time_display = end_time_formatted[:2] if end_time_formatted.endswith(":00") else end_time_formatted
-                    
-                    # יוצרים תיאור מלא מהטקסט השלם
-                    description = next_line
-                    
-                    # ננסה לחלץ את התפקיד במשמרת (לא סוג המשמרת)
-                    roles = ["קשה", "קל", "בינוני", "מאומץ", "נינוח", "רגיל", "חוץ", "פנים"]
-                    special_events = ["שיחת מפעילים", "קה\"ד", "הכשרה", "תדריך", "ישיבה"]
-                    
-                    # בדיקה לאירועים מיוחדים
-                    event_title = ""
-                    for special in special_events:
-                        if special.lower() in next_line.lower():
-                            event_title = f"{special} ({start_time_display}-{end_time_display})"
-                            break
-                    
-                    # אם לא מצאנו אירוע מיוחד, נחפש תפקיד
-                    if not event_title:
-                        role = ""
-                        for r in roles:
-                            if r in next_line:
-                                role = r
-                                break
-                        
-                        # נוסיף את התפקיד לתיאור
-                        if role:
-                            event_title = f"{role} ({start_time_display}-{end_time_display})"
-                        else:
-                            event_title = f"משמרת ({start_time_display}-{end_time_display})"
-
-                    # ממירים את השעות למספרים שכבר חילצנו למעלה
-                    start_dt = datetime.combine(current_date.date(), datetime.min.time()).replace(hour=sh, minute=sm)
-                    end_dt   = datetime.combine(current_date.date(), datetime.min.time()).replace(hour=eh, minute=em)
-
-                    # לוגיקת "יום עבודה" בטייסות: 06:00 עד 06:00 למחרת
-                    # כל שעה 00:00-05:59 שייכת ליום העבודה הקודם (תאריך קלנדרי הבא)
-                    
-                    if sh >= 0 and sh < 6:
-                        # מקרה 1: שעת התחלה בין חצות ל-06:00 בבוקר
-                        # דוגמה: "שלישי 2-6" → רביעי 02:00-06:00
-                        start_dt += timedelta(days=1)
-                        end_dt += timedelta(days=1)
-                    elif eh >= 0 and eh < 6:
-                        # מקרה 2: שעת התחלה מ-06:00 ואילך, אבל סיום לפני 06:00
-                        # דוגמה: "שלישי 22-02" → שלישי 22:00 ועד רביעי 02:00
-                        end_dt += timedelta(days=1)
-                    elif end_dt <= start_dt:
-                        # מקרה 3: מקרי קצה (למשל 14-12 למחרת)
-                        end_dt += timedelta(days=1)
-
-                    events.append({
-                        "start": local_tz.localize(start_dt).astimezone(pytz.utc),
-                        "end": local_tz.localize(end_dt).astimezone(pytz.utc),
-                        "description": description,  # שומרת את כל השורה
-                        "title": event_title  # כותרת מתומצתת לאירוע
-                    })
-                else:
-                    # לא זוהה טווח שעות, ולא "כוננות 60"
-                    # נבדוק אם "יום" או "לילה"
-                    if "יום" in next_line:
-                        # לדוגמה 06:00–18:00
-                        start = datetime.combine(current_date.date(), datetime.strptime("06:00", "%H:%M").time())
-                        end = datetime.combine(current_date.date(), datetime.strptime("18:00", "%H:%M").time())
-                        events.append({
-                            "start": local_tz.localize(start).astimezone(pytz.utc),
-                            "end": local_tz.localize(end).astimezone(pytz.utc),
-                            "description": next_line
-                        })
-                    elif "לילה" in next_line:
-                        # 18:00–06:00 למחרת
-                        start = datetime.combine(current_date.date(), datetime.strptime("18:00", "%H:%M").time())
-                        end = datetime.combine(current_date.date(), datetime.strptime("06:00", "%H:%M").time()) + timedelta(days=1)
-                        events.append({
-                            "start": local_tz.localize(start).astimezone(pytz.utc),
-                            "end": local_tz.localize(end).astimezone(pytz.utc),
-                            "description": next_line
-                        })
-                    else:
-                        # ברירת מחדל: 08:00–08:00
-                        start = datetime.combine(current_date.date(), datetime.strptime("08:00", "%H:%M").time())
-                        end = start + timedelta(days=1)
-                        events.append({
-                            "start": local_tz.localize(start).astimezone(pytz.utc),
-                            "end": local_tz.localize(end).astimezone(pytz.utc),
-                            "description": next_line
-                        })
-
-                i += 1
-
-            continue  # סיימנו את הטיפול באותו תאריך
-        else:
-            # לא תאריך, לא שבוע ולא הנחיות => סתם טקסט
-            if any(keyword in line for keyword in instructions_keywords):
-                break
-            i += 1
+        session["preview_nonce"] = request.form.get("preview_nonce", "")[:64]
+
+
+@app.route("/preview", defaults={"preview_id": None})
+@app.route("/preview/<preview_id>")
+def preview(preview_id):
+    """
+    האירועים שזוהו בהמרה האחרונה (או לפי מזהה מפורש) כ-JSON. עם ?nonce=
+    עונה 404 עד שהשליחה עם אותו nonce הסתיימה, ולא מחזירה תצוגה ישנה.
+    """
+    nonce = request.args.get("nonce")
+    if preview_id is None and nonce is not None and nonce != session.get("preview_nonce"):
+        return jsonify({"error": "התצוגה המקדימה עוד לא מוכנה."}), 404
+    data = preview_store.get(preview_id or session.get("preview_id"))
+    if data is None:
+        return jsonify({"error": "לא נמצאה תצוגה מקדימה."}), 404
+    return jsonify(data)
+
+
+def _parse_moment(value):
+    """זמן ISO 8601 מפרמטר בשאילתה; בלי אזור זמן מתפרש כשעון מקומי"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        return LOCAL.to_utc(moment)
+    return moment.astimezone(UTC)
+
+
+@lru_cache(maxsize=64)
+def _duty_index(token, etag):
+    """אינדקס קטעי הזמן של הפיד - נבנה פעם אחת לכל גרסה (etag) של הפיד"""
+    stored = feed_store.get(token)
+    items = []
+    for uid, (dtstart, dtend, summary, description) in (stored.index if stored else {}).items():
+        start = datetime.strptime(dtstart, "%Y%m%dT%H%M%SZ").replace(tzinfo=UTC)
+        end = datetime.strptime(dtend, "%Y%m%dT%H%M%SZ").replace(tzinfo=UTC)
+        items.append((start, end, {
+            "uid": uid,
+            "title": summary,
+            "description": description,
+            "start": LOCAL.to_local(start).isoformat(),
+            "end": LOCAL.to_local(end).isoformat(),
+        }))
+    return IntervalIndex(items)
+
+
+@app.route("/on-duty", defaults={"token": None})
+@app.route("/feed/<token>/on-duty")
+def on_duty(token):
+    """
+    המשמרות שמכסות זמן נתון (?at=2025-03-23T21:00, ברירת מחדל: עכשיו)
+    או שחופפות לטווח (?at=...&until=...), מתוך הפיד של המשתמש
+    """
+    token = token or _feed_token()
+    stored = feed_store.get(token) if token else None
+    if stored is None:
+        return jsonify({"error": "פיד לא נמצא."}), 404
+    try:
+        begin = _parse_moment(request.args["at"]) if request.args.get("at") else datetime.now(UTC)
+        end = _parse_moment(request.args["until"]) if request.args.get("until") else None
+    except ValueError:
+        return jsonify({"error": "זמן לא תקין. יש להשתמש בפורמט ISO 8601."}), 400
+
+    duty = _duty_index(token, stored.etag)
+    shifts = duty.overlapping(begin, end) if end else duty.at(begin)
+    return jsonify({
+        "at": LOCAL.to_local(begin).isoformat(),
+        "until": LOCAL.to_local(end).isoformat() if end else None,
+        "shifts": shifts,
+    })
+
+
+@lru_cache(maxsize=64)
+def _compact_feed(token, etag):
+    """גוף הפיד המכווץ - נבנה פעם אחת לכל גרסה (etag) של הפיד; None אם הפיד כבר התחלף"""
+    stored = feed_store.get(token)
+    if stored is None or stored.etag != etag:
+        return None
+    index = stored.index
+    if not index:
+        # פיד שנשמר לפני שנשמר ה-index
+        return stored.ics
+    return _calendar_variant(stored.ics, stored.etag, index, True)[0]
+
+
+def _feed_headers(response, etag, last_modified):
+    response.vary.add("Accept-Encoding")
+    if etag:
+        response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route("/feed/<token>.ics")
+def feed(token):
+    head = feed_store.head(token)
+    if head is None:
+        return "פיד לא נמצא.", 404
+    feed_store.touch(token)
+
+    # ?compact=1 - משמרות חוזרות כ-RRULE שבועי (פחות אירועים לסנכרן)
+    compact = request.args.get("compact") == "1"
+    etag = f"{head.etag}-rrule" if compact else head.etag
+
+    # יומן שמושך שוב עם If-None-Match / If-Modified-Since מקבל 304 לפני
+    # שקוראים את הקובץ או בונים גוף. ה-ETag של התגובה תלוי בקידוד (וגוף
+    # קטן נשלח בלי דחיסה), אז שתי הגרסאות נבדקות
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    candidates = (f"{etag}-{encoding}", etag) if encoding else (etag,)
+    matched = next((tag for tag in candidates if request.if_none_match.contains(tag)), None)
+    if matched is not None:
+        return _feed_headers(Response(status=304), matched, head.last_modified)
+    if not request.if_none_match and request.if_modified_since is not None:
+        if request.if_modified_since >= head.last_modified:
+            # בלי If-None-Match לא ידוע איזה ייצוג הלקוח מחזיק - בלי ETag
+            return _feed_headers(Response(status=304), None, head.last_modified)
+
+    ics = _compact_feed(token, head.etag) if compact else None
+    if ics is None:
+        stored = feed_store.get(token)
+        if stored is None:
+            return "פיד לא נמצא.", 404
+        ics, etag = _calendar_variant(stored.ics, stored.etag, stored.index if compact else None, compact)
+        if compact:
+            etag = f"{stored.etag}-rrule"
+    body, encoding = _calendar_body(ics, etag)
+    response = Response(body, mimetype="text/calendar")
+    response.headers["Content-Type"] = "text/calendar; charset=utf-8"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return _feed_headers(response, f"{etag}-{encoding}" if encoding else etag, head.last_modified)
+
+
+@app.route("/merge", methods=["POST"])
+def merge():
+    """היומן שהועלה (calendar) ממוזג עם הלו"ז (schedule) בלי כפילויות, כתגובה זורמת"""
+    session.pop('_flashes', None)
+    upload = request.files.get("calendar")
+    if upload is None or not upload.filename:
+        flash("לא נבחר קובץ יומן למיזוג.", "error")
+        return redirect(url_for('index'))
+
+    with g.timer.stage("decode"):
+        schedule_text = request.form.get("schedule", "").strip()
+    if len(schedule_text) > MAX_SCHEDULE_CHARS:
+        flash("קלט ארוך מדי. אנא צמצם את לוח הזמנים שהוזן.", "error")
+        return redirect(url_for('index'))
+
+    vocabulary = _request_vocabulary()
+    if vocabulary is None:
+        return redirect(url_for('index'))
+    cached = _schedule_calendar(schedule_text, vocabulary)
+    if cached is None:
+        return redirect(url_for('index'))
+
+    with g.timer.stage("store"):
+        preview_id = preview_store.put(cached.preview, cached.conflicts)
+    _remember_preview(preview_id)
+
+    # הקובץ שהועלה נקרא שורה-שורה תוך כדי כתיבת התגובה
+    body = (line.encode("utf-8") for line in iter_merged_calendar(cached.index.items(), upload.stream))
+    return Response(
+        stream_with_context(body),
+        mimetype="text/calendar",
+        headers={
+            "Content-Disposition": "attachment; filename=merged.ics",
+            "Content-Type": "text/calendar; charset=utf-8",
+            "X-Preview-Id": preview_id,
+        },
+    )
+
 
-    # אם לא נוצרו אירועים וגם אין שגיאות – שגיאה כללית
-    if not events and not errors:
-        errors.append("לא נמצאו אירועים תקפים בטקסט שהוזן, ודא שהפורמט נכון.")
+@app.route("/cache-stats")
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+
+@app.route("/parser-stats")
+def parser_stats():
+    return jsonify({**dispatch_stats(), "vocabularies": vocabulary_store.stats()})
 
-    return events, errors
 
 @app.route("/", methods=["GET", "POST"], strict_slashes=False)
 def index():
     if request.method == "POST":
         # מוחק את כל ההודעות הקודמות
         session.pop('_flashes', None)
-        
-        schedule_text = request.form.get("schedule", "").strip()
-
-        if len(schedule_text) > 5000:
-            flash("קלט ארוך מדי. אנא צמצם את לוח הזמנים שהוזן.", "error")
-            return redirect(url_for('index'))
-
-        events, errors = parse_schedule(schedule_text)
 
-        if errors:
-            for error in errors:
-                flash(error, "error")
+        vocabulary = _request_vocabulary()
+        if vocabulary is None:
             return redirect(url_for('index'))
 
-        if not events:
-            flash("לא נמצאו אירועים תקפים בטקסט שהוזן.", "error")
-            return redirect(url_for('index'))
-
-        # הדפסת האירועים לדיבאג - רק אם הכל תקין
-        debug_info = []
-        for event in events:
-            start_time = event["start"].astimezone(pytz.timezone("Asia/Jerusalem")).strftime("%d/%m/%Y %H:%M")
-            end_time = event["end"].astimezone(pytz.timezone("Asia/Jerusalem")).strftime("%d/%m/%Y %H:%M")
-            title = event.get("title", event["description"])
-            debug_info.append(f"{title}: {start_time} - {end_time}")
-
-        # שומרים בפלאש במקום ב-session
-        for info in debug_info:
-            flash(info, "success")  # שימוש בקטגוריה 'success' כדי להבדיל משגיאות
-
-        calendar = Calendar()
-        for event in events:
-            e = Event()
-            e.name = event.get("title", event["description"])  # משתמשים בכותרת אם קיימת, אחרת בתיאור המלא
-            e.description = event["description"]
-            e.begin = event["start"]
-            e.end = event["end"]
-            calendar.events.add(e)
-
-        ics_file = io.StringIO()
-        ics_file.writelines(calendar)
-        ics_file.seek(0)
-
-        return Response(
-            ics_file.getvalue(),
-            mimetype="text/calendar",
-            headers={
-                "Content-Disposition": "attachment; filename=schedule.ics",
+        if request.mimetype == "text/plain":
+            # גוף גולמי: מפענחים שורה-שורה ישירות מזרם הבקשה
+            if (request.content_length or 0) > MAX_SCHEDULE_CHARS * 4:
+                flash("קלט ארוך מדי. אנא צמצם את לוח הזמנים שהוזן.", "error")
+                return redirect(url_for('index'))
+            errors = []
+            with g.timer.stage("parse"):
+                events = EventBatch(iter_rows(request.stream, errors, vocabulary=vocabulary))
+            if errors or not events:
+                SCHEDULES_REJECTED.inc()
+                for error in errors or ["לא נמצאו אירועים תקפים בטקסט שהוזן."]:
+                    flash(error, "error")
+                return redirect(url_for('index'))
+            cached = _build_calendar(events)
+        elif request.files.get("chat"):
+            # ייצוא צ'אט: רק בלוקי הלו"ז שבו מפוענחים
+            cached = _chat_calendar(request.files["chat"], request.form.get("chat_mode", "latest"), vocabulary)
+            if cached is None:
+                return redirect(url_for('index'))
+        else:
+            with g.timer.stage("decode"):
+                schedule_text = request.form.get("schedule", "").strip()
+
+            if len(schedule_text) > MAX_SCHEDULE_CHARS:
+                flash("קלט ארוך מדי. אנא צמצם את לוח הזמנים שהוזן.", "error")
+                return redirect(url_for('index'))
+
+            cached = _schedule_calendar(schedule_text, vocabulary)
+            if cached is None:
+                return redirect(url_for('index'))
+
+        # מצב מכווץ: משמרות שחוזרות כל שבוע כ-VEVENT אחד עם RRULE
+        with g.timer.stage("serialize"):
+            ics, ics_etag = _calendar_variant(
+                cached.ics, cached.etag, cached.index, request.values.get("compact") == "1"
+            )
+
+        if request.mimetype != "text/plain":
+            # מייל אופציונלי - רק נכנס לתור, השליחה עצמה ברקע
+            email = request.form.get("email", "").strip()
+            if email and mail_queue is not None and _EMAIL_PATTERN.match(email):
+                mail_queue.send(
+                    email,
+                    "הלו\"ז שלך מוכן",
+                    "מצורף קובץ היומן (schedule.ics). פתח אותו כדי להוסיף את המשמרות ליומן שלך.",
+                    ics,
+                )
+
+        # לקוח API (גוף text/plain) בדרך כלל לא שומר עוגיות ולא יראה את
+        # הטוקן לעולם - פיד חדש נפתח רק לטופס; קיים (לפי ה-session) מתעדכן
+        token = _feed_token(create=request.mimetype != "text/plain")
+        delta = request.values.get("delta") == "1"
+        if delta:
+            # לוח שינויים בלבד מול השליחה הקודמת של אותו משתמש
+            previous = feed_store.get(token) if token else None
+            changed, removed = diff_index(previous.index if previous else {}, cached.index)
+
+        with g.timer.stage("store"):
+            # הלו"ז החדש מחליף את מה שמוגש בפיד של המשתמש (רק אם האירועים השתנו)
+            if token:
+                feed_store.update(token, cached.ics, cached.etag, cached.fingerprint, cached.index)
+
+            # התצוגה המקדימה נשמרת בשרת; ב-session רק המזהה שלה
+            preview_id = preview_store.put(cached.preview, cached.conflicts)
+        _remember_preview(preview_id)
+
+        if delta:
+            body, encoding = _calendar_body("".join(iter_delta_calendar(changed, removed)).encode("utf-8"))
+            headers = {
+                "Content-Disposition": "attachment; filename=schedule-changes.ics",
                 "Content-Type": "text/calendar; charset=utf-8",
+                "Vary": "Accept-Encoding",
+                "X-Preview-Id": preview_id,
+                "X-Changed-Events": str(len(changed)),
+                "X-Removed-Events": str(len(removed)),
             }
-        )
+            if encoding:
+                headers["Content-Encoding"] = encoding
+            return Response(body, mimetype="text/calendar", headers=headers)
+
+        # ETag שונה לכל קידוד - הגוף הדחוס הוא ייצוג אחר של אותו לוח
+        body, encoding = _calendar_body(ics, ics_etag)
+        etag = f"{ics_etag}-{encoding}" if encoding else ics_etag
+
+        # הורדה חוזרת של אותו לו"ז - הלקוח כבר מחזיק את הקובץ
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"', "Vary": "Accept-Encoding"})
+
+        headers = {
+            "Content-Disposition": "attachment; filename=schedule.ics",
+            "Content-Type": "text/calendar; charset=utf-8",
+            "ETag": f'"{etag}"',
+            "Vary": "Accept-Encoding",
+            "X-Preview-Id": preview_id,
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(body, mimetype="text/calendar", headers=headers)
     else:
         # אין צורך בטיפול ב-session
         # מנקה הודעות ישנות בעת טעינת הדף
         session.pop('_flashes', None)
-        return render_template("index.html")
+        token = _feed_token()
+        feed_url = _feed_url(token) if token and feed_store.get(token) else None
+        return render_template(
+            "index.html",
+            max_chars=MAX_SCHEDULE_CHARS,
+            feed_url=feed_url,
+            mail_enabled=mail_queue is not None,
+            profiles=vocabulary_store.names(),
+            uploads_enabled=True,
+        )
 
 if __name__ == "__main__":
-    import os
     port = int(os.environ.get("PORT", 8080))
     app.run(host="0.0.0.0", port=port, debug=True)
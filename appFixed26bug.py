@@ -1,80 +1,41 @@
-from flask import Flask, request, render_template, send_file
+from flask import Flask, request, render_template, send_file, Response
 from ics import Calendar, Event
-from datetime import datetime, timedelta
-import pytz
 import os
-import re
 
-app = Flask(__name__)
+import parsers
+from artifacts import ArtifactStore, ArtifactTooLarge, default_spill_dir
+from assets import init_app as init_assets
+from timezones import LOCAL
 
-# פונקציה לעיבוד הטקסט
+app = Flask(__name__)
+# נכסים סטטיים ו-asset_url עבור index.html (כמו ב-app.py)
+init_assets(app)
+
+# קבצי ה-ICS שנוצרו נשמרים בזיכרון לפי מזהה אקראי (ולא בקובץ משותף),
+# וגם בתיקיית spill (tmpfs כברירת מחדל) כדי שכל ה-workers יוכלו להגיש אותם.
+# ARTIFACT_SPILL_DIR= (ריק) מבטל את ה-spill - מתאים רק ל-worker יחיד
+artifact_store = ArtifactStore(
+    max_bytes=int(os.environ.get("ARTIFACT_MAX_BYTES", 32 * 1024 * 1024)),
+    ttl=int(os.environ.get("ARTIFACT_TTL", 3600)),
+    spill_dir=os.environ.get("ARTIFACT_SPILL_DIR", default_spill_dir()) or None,
+)
+
+# פונקציה לעיבוד הטקסט - במנוע המשותף, שמזהה לבד את פורמט ההודעה
 def parse_schedule(schedule_text):
-    events = []
-    lines = schedule_text.split("\n")
-    current_date = None
-
-    # הגדרת אזור הזמן המקומי
-    local_tz = pytz.timezone("Asia/Jerusalem")
-
-    for line in lines:
-        line = line.strip()
-
-        # זיהוי תאריך בפורמטים גמישים
-        date_match = re.match(r"^\*?\w*\s*(\d{1,2}[./-]\d{1,2}(?:[./-]\d{2,4})?)", line)
-        if date_match:
-            try:
-                date_str = date_match.group(1)
-                if len(date_str.split(".")) == 2:  # אם אין שנה, הוסף שנה נוכחית
-                    date_str += f".{datetime.now().year}"
-                current_date = datetime.strptime(date_str, "%d.%m.%Y")
-                current_date = local_tz.localize(current_date)
-                continue
-            except Exception as e:
-                print(f"Error parsing date: {e}")
-
-        # זיהוי טווחי שעות ותיאור המשמרת
-        time_match = re.match(r"^(\d{1,2}(:\d{2})?)-(\\d{1,2}(:\\d{2})?)\\s+(.+)$", line)
-        if current_date and time_match:
-            try:
-                start_time = time_match.group(1)
-                end_time = time_match.group(3)
-                description = time_match.group(5)
-
-                start = current_date.replace(
-                    hour=int(start_time.split(":")[0]),
-                    minute=int(start_time.split(":")[1]) if ":" in start_time else 0
-                )
-                end = current_date.replace(
-                    hour=int(end_time.split(":")[0]),
-                    minute=int(end_time.split(":")[1]) if ":" in end_time else 0
-                )
-
-                # אם המשמרת חוצה חצות, שייכת ליום הבא
-                if start.hour > end.hour:
-                    end += timedelta(days=1)
-
-                # אם המשמרת מתחילה לפני 6 בבוקר, שייכת ליום הבא
-                if start.hour < 6:
-                    start += timedelta(days=1)
-
-                start_utc = start.astimezone(pytz.utc)
-                end_utc = end.astimezone(pytz.utc)
-
-                events.append({
-                    "start": start_utc,
-                    "end": end_utc,
-                    "description": description,
-                    "start_local": start,
-                    "end_local": end
-                })
-            except Exception as e:
-                print(f"Error parsing shift: {e}")
+    events, errors = parsers.parse_schedule(schedule_text)
+    for error in errors:
+        print(f"Error parsing schedule: {error}")
 
+    # זמנים מקומיים לתצוגה המקדימה ב-success.html (מילונים מהאצווה)
+    events = list(events)
+    for event in events:
+        event["start_local"] = LOCAL.to_local(event["start"])
+        event["end_local"] = LOCAL.to_local(event["end"])
     return events
 
 
-# פונקציה ליצירת קובץ ICS
-def create_ics(events, file_name="schedule.ics"):
+# פונקציה ליצירת קובץ ICS - מחזירה את המזהה שלו במאגר
+def create_ics(events):
     calendar = Calendar()
 
     for event in events:
@@ -84,17 +45,24 @@ def create_ics(events, file_name="schedule.ics"):
         e.end = event["end"]
         calendar.events.add(e)
 
-    with open(file_name, "w", encoding="utf-8") as f:
-        f.writelines(calendar)
+    return artifact_store.put("".join(calendar).encode("utf-8"))
 
-    return file_name
-
-@app.route("/download/<file_name>")
-def download_ics(file_name):
-    try:
-        return send_file(file_name, as_attachment=True)
-    except FileNotFoundError:
+@app.route("/download/<artifact_id>")
+def download_ics(artifact_id):
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None:
         return "קובץ לא נמצא.", 404
+    if artifact.path is not None:
+        # קובץ שנשפך ל-tmpfs - send_file מגיש אותו ישירות (sendfile)
+        return send_file(
+            artifact.path, mimetype="text/calendar", as_attachment=True, download_name="schedule.ics"
+        )
+    # מהזיכרון: ה-bytes עצמם הם גוף התגובה, בלי העתקה
+    return Response(
+        artifact.data,
+        mimetype="text/calendar",
+        headers={"Content-Disposition": "attachment; filename=schedule.ics"},
+    )
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -104,16 +72,21 @@ def index():
         # פענוח האירועים
         parsed_events = parse_schedule(schedule_text)
         if parsed_events:
-            file_name = create_ics(parsed_events)
+            try:
+                artifact_id = create_ics(parsed_events)
+            except ArtifactTooLarge:
+                return "קובץ היומן גדול מדי. נסה לפצל את הלו\"ז לכמה חלקים.", 413
 
             # יצירת קישור webcal ליומן אפל
-            webcal_url = request.host_url.replace("http://", "webcal://") + f"download/{file_name}"
+            webcal_url = request.host_url.replace("http://", "webcal://") + f"download/{artifact_id}"
 
             # הצעת אפשרויות למשתמש עם תצוגה מקדימה
             return render_template(
                 "success.html",
-                file_name=file_name,
+                artifact_id=artifact_id,
                 webcal_url=webcal_url,
+                # הקישור מפסיק לעבוד כשפג תוקף הקובץ במאגר
+                link_ttl=artifact_store.ttl,
                 events=parsed_events
             )
 
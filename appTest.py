@@ -1,12 +1,14 @@
-import re
-import pytz
 import logging
-from datetime import datetime, timedelta
 from flask import Flask, request, render_template, Response
 from ics import Calendar, Event
 import io
 
+import parsers
+from assets import init_app as init_assets
+
 app = Flask(__name__)
+# נכסים סטטיים ו-asset_url עבור index.html (כמו ב-app.py)
+init_assets(app)
 
 # הגדרת לוגים
 logger = logging.getLogger('flask_app')
@@ -18,72 +20,10 @@ console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
 def parse_schedule(schedule_text):
-    events = []
-    errors = []
-    lines = schedule_text.split("\n")
-    local_tz = pytz.timezone("Asia/Jerusalem")
-    current_year = datetime.now().year
-    day_names = "ראשון|שני|שלישי|רביעי|חמישי|שישי|שבת"
-
-    combined_regex = re.compile(
-        rf"^(?:\*?)?(?:בלילה\s+)?(?:שבין\s+)?(?:ביום\s+)?יום\s+(?P<day_name1>{day_names})\s+(?P<day1>\d{{1,2}})[./-](?P<month1>\d{{1,2}})(?:\.(?P<year1>\d{{4}}))?"
-        rf"(?:\s+ליום\s+(?P<day_name2>{day_names})\s+(?P<day2>\d{{1,2}})[./-](?P<month2>\d{{1,2}})(?:\.(?P<year2>\d{{4}}))?)?,?\s*"
-        rf"(?:תדריך\s+ב(?P<briefing>\d{{1,2}}:\d{{2}}(?::\d{{2}})?)\s*,\s*)?"
-        rf"נתחיל\s+ב(?P<start>\d{{1,2}}:\d{{2}}(?::\d{{2}})?)\s*,\s*"
-        rf"נסיים\s+ב(?P<end>\d{{1,2}}:\d{{2}}(?::\d{{2}})?)(?:\*)?$"
-    )
-
-    for i, line in enumerate(lines):
-        line = re.sub(r'^\*+|\*+$', '', line).strip()
-        
-        # התעלמות משורות לא רלוונטיות
-        if not line or line in ["נא לאשר בהודעה נפרדת", "🌹🌶️"]:
-            continue
-
-        logger.debug(f"מעבד שורה {i + 1}: {line}")
-
-        match = combined_regex.match(line)
-        if match:
-            try:
-                day1 = int(match.group('day1'))
-                month1 = int(match.group('month1'))
-                year1 = int(match.group('year1')) if match.group('year1') else current_year
-                day2 = int(match.group('day2')) if match.group('day2') else day1
-                month2 = int(match.group('month2')) if match.group('month2') else month1
-                year2 = int(match.group('year2')) if match.group('year2') else year1
-                
-                start_time_str = match.group('start')
-                end_time_str = match.group('end')
-
-                start_time = datetime.strptime(start_time_str, "%H:%M").time()
-                end_time = datetime.strptime(end_time_str, "%H:%M").time()
-
-                start = local_tz.localize(datetime.combine(datetime(year1, month1, day1), start_time))
-                end = local_tz.localize(datetime.combine(datetime(year2, month2, day2), end_time))
-
-                if start > end:
-                    end += timedelta(days=1)
-
-                # תיאור האירוע יהיה תמיד "פיריט - מפקד"
-                event_description = "פיריט - מפקד"
-
-                events.append({
-                    "description": event_description,
-                    "start": start.astimezone(pytz.utc),
-                    "end": end.astimezone(pytz.utc)
-                })
-            except Exception as e:
-                errors.append(f"שגיאה בעיבוד אירוע בשורה {i + 1}: {e}")
-                logger.error(f"שגיאה בעיבוד אירוע בשורה {i + 1}: {e}")
-            continue
-
-        # טיפול בשורות נוספות כמו פיריט ומפקד
-        if line in ["פיריט", "מפקד"] and events:
-            events[-1]["description"] += f" - {line}"
-
-    if not events and not errors:
-        errors.append("לא נמצאו אירועים תקפים בטקסט שהוזן. ודא שהפורמט נכון.")
-
+    # הפענוח עצמו במנוע המשותף - הפורמט ("יום X ... נתחיל ב.. נסיים ב..") מזוהה אוטומטית
+    events, errors = parsers.parse_schedule(schedule_text)
+    for error in errors:
+        logger.error(error)
     return events, errors
 
 @app.route("/", methods=["GET", "POST"])
@@ -0,0 +1,145 @@
+"""
+מאגר קבצי ICS שנוצרו, לפי מזהה אקראי - במקום קובץ schedule.ics משותף.
+
+כל קובץ נשמר בזיכרון תחת מזהה אקראי משלו, עם תוקף (TTL) ותקרת גודל כוללת.
+כשהתקרה נחצית, הקבצים הישנים ביותר יוצאים מהזיכרון.
+
+אם הוגדרה תיקיית spill (עדיף tmpfs כמו /dev/shm - ראו default_spill_dir), כל
+קובץ נכתב אליה גם כן בשם המזהה שלו. כך worker אחר של gunicorn יכול להגיש קובץ
+שלא נוצר אצלו, וקובץ שנזרק מהזיכרון עדיין זמין עד שפג תוקפו. אף פעם אין קובץ
+משותף לכמה משתמשים.
+
+קובץ גדול מהתקרה לא נכנס לזיכרון בכלל (הוא היה מוציא את עצמו מיד): הוא נכתב
+רק ל-spill, ובלי spill put זורקת ArtifactTooLarge.
+"""
+from collections import OrderedDict
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+
+_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+# כל כמה שניות לכל היותר מנקים קבצים שפג תוקפם מתיקיית ה-spill
+_SWEEP_INTERVAL = 60
+
+
+class ArtifactTooLarge(ValueError):
+    """קובץ גדול מתקרת הזיכרון של המאגר, ואין spill לכתוב אליו"""
+
+
+def default_spill_dir():
+    """
+    תיקיית ה-spill כשלא הוגדרה אחרת: tmpfs (/dev/shm) אם קיים, אחרת תיקיית ה-temp.
+    בלי spill, הורדה שמגיעה ל-worker אחר מזה שיצר את הקובץ מקבלת 404.
+    """
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "calander-artifacts")
+
+
+class Artifact:
+    """קובץ להגשה: data (bytes) אם הוא בזיכרון, אחרת path לקובץ ב-spill"""
+
+    __slots__ = ("data", "path", "size")
+
+    def __init__(self, data=None, path=None, size=0):
+        self.data = data
+        self.path = path
+        self.size = size
+
+
+class ArtifactStore:
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=3600, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self._items = OrderedDict()  # id -> (expires_at, bytes)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        if spill_dir:
+            os.makedirs(spill_dir, mode=0o700, exist_ok=True)
+
+    @staticmethod
+    def valid_id(artifact_id):
+        return bool(_ID_PATTERN.match(artifact_id))
+
+    def _spill_path(self, artifact_id):
+        return os.path.join(self.spill_dir, artifact_id + ".ics")
+
+    def put(self, data):
+        """שומרת bytes ומחזירה מזהה אקראי חדש; ArtifactTooLarge אם אין לו מקום"""
+        artifact_id = secrets.token_urlsafe(24)
+        if len(data) > self.max_bytes:
+            # בזיכרון הוא היה נזרק מיד ע"י _evict (יחד עם כל השאר) - רק ל-spill
+            if not self.spill_dir or not self._write_spill(artifact_id, data):
+                raise ArtifactTooLarge(
+                    f"file of {len(data)} bytes exceeds the {self.max_bytes}-byte artifact limit"
+                )
+            self._sweep_spill()
+            return artifact_id
+        now = time.monotonic()
+        with self._lock:
+            self._items[artifact_id] = (now + self.ttl, data)
+            self._size += len(data)
+            self._evict(now)
+        if self.spill_dir:
+            self._write_spill(artifact_id, data)
+            self._sweep_spill()
+        return artifact_id
+
+    def _evict(self, now):
+        # קודם כל מה שפג תוקפו, ואז הישנים ביותר עד שחוזרים מתחת לתקרה
+        for artifact_id in [k for k, (expires, _) in self._items.items() if expires <= now]:
+            self._size -= len(self._items.pop(artifact_id)[1])
+        while self._size > self.max_bytes and self._items:
+            _, (_, data) = self._items.popitem(last=False)
+            self._size -= len(data)
+
+    def _write_spill(self, artifact_id, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._spill_path(artifact_id))
+            return True
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def _sweep_spill(self):
+        now = time.time()
+        if now - self._last_sweep < _SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        with os.scandir(self.spill_dir) as it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime + self.ttl < now:
+                        os.unlink(entry.path)
+                except OSError:
+                    continue
+
+    def get(self, artifact_id):
+        """מחזירה Artifact או None אם המזהה לא קיים / פג תוקפו"""
+        if not self.valid_id(artifact_id):
+            return None
+        with self._lock:
+            item = self._items.get(artifact_id)
+            if item is not None:
+                if item[0] > time.monotonic():
+                    return Artifact(data=item[1], size=len(item[1]))
+                self._size -= len(self._items.pop(artifact_id)[1])
+        if self.spill_dir:
+            path = self._spill_path(artifact_id)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            if stat.st_mtime + self.ttl >= time.time():
+                return Artifact(path=path, size=stat.st_size)
+        return None
@@ -0,0 +1,191 @@
+"""
+צינור נכסים סטטיים ודחיסת תגובות.
+
+AssetManifest סורקת את static/ בעלייה: לכל קובץ נגזר שם עם טביעת אצבע
+של התוכן (index.css → index.3f2a9c1b0d4e.css), ובקבצי CSS הפניות
+url('logo.png') מוחלפות בשם עם הטביעה. קבצים שאינם דחוסים מראש (CSS,
+JS, SVG...) נשמרים בזיכרון גם כ-gzip ו-brotli (אם החבילה brotli מותקנת),
+כך שהגשה היא בחירת גרסה לפי Accept-Encoding בלבד. השם משתנה עם התוכן,
+ולכן אפשר להגיש עם Cache-Control: immutable לשנה.
+
+init_app מחברת את הצינור לאפליקציית Flask (route של /assets/ ו-asset_url
+בתבניות), כך שכל אפליקציה שמציגה את index.html משתמשת באותו מנגנון.
+negotiate_encoding/compress/EncodedBodies משמשות גם לדחיסת קובצי ה-ICS.
+"""
+from collections import OrderedDict
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response, request, url_for
+
+try:
+    import brotli
+except ImportError:  # אופציונלי - בלעדיו מגישים gzip בלבד
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# סוגים שכבר דחוסים - דחיסה נוספת רק מבזבזת CPU
+_PRECOMPRESSED_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp", "font/woff2")
+_CSS_URL = re.compile(r"""url\((['"]?)([^'")]+)\1\)""")
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    """הקידוד המועדף (br, אחר כך gzip) שהלקוח מקבל, או None"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in available or supported_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    if encoding == "gzip":
+        # mtime=0 - אותו קלט נותן אותם בתים (ETag יציב)
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return data
+
+
+class Asset:
+    __slots__ = ("name", "url_name", "mimetype", "bodies", "etag")
+
+    def __init__(self, name, url_name, mimetype, bodies, etag):
+        self.name = name
+        self.url_name = url_name
+        self.mimetype = mimetype
+        self.bodies = bodies  # {None: גולמי, "gzip": ..., "br": ...}
+        self.etag = etag
+
+
+class AssetManifest:
+    def __init__(self, directory):
+        self.directory = directory
+        self.by_name = {}
+        self.by_url = {}
+        self._load()
+
+    def _add(self, name, data, mimetype):
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        url_name = f"{stem}.{digest}{ext}"
+        bodies = {None: data}
+        if not mimetype.startswith(_PRECOMPRESSED_TYPES):
+            # מגישים גרסה דחוסה רק אם היא באמת קטנה יותר
+            for encoding in supported_encodings():
+                encoded = compress(data, encoding)
+                if len(encoded) < len(data):
+                    bodies[encoding] = encoded
+        asset = Asset(name, url_name, mimetype, bodies, digest)
+        self.by_name[name] = asset
+        self.by_url[url_name] = asset
+
+    def _load(self):
+        if not os.path.isdir(self.directory):
+            return
+        names = []
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                names.append(os.path.relpath(path, self.directory).replace(os.sep, "/"))
+        # CSS אחרון, כדי שההפניות בו יוחלפו בשמות שכבר חושבו
+        names.sort(key=lambda name: (name.endswith(".css"), name))
+        for name in names:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                data = f.read()
+            mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if name.endswith(".css"):
+                data = self._rewrite_css(name, data.decode("utf-8")).encode("utf-8")
+                mimetype = "text/css"
+            self._add(name, data, mimetype)
+
+    def _rewrite_css(self, name, text):
+        base = os.path.dirname(name)
+
+        def replace(match):
+            target = match.group(2)
+            asset = self.by_name.get(os.path.normpath(os.path.join(base, target)).replace(os.sep, "/"))
+            if asset is None:
+                return match.group(0)
+            url_name = os.path.relpath(asset.url_name, base or ".").replace(os.sep, "/")
+            return f"url({match.group(1)}{url_name}{match.group(1)})"
+
+        return _CSS_URL.sub(replace, text)
+
+    def url_name(self, name):
+        """השם עם טביעת האצבע (או השם המקורי אם הקובץ לא נמצא)"""
+        asset = self.by_name.get(name)
+        return asset.url_name if asset is not None else name
+
+    def get(self, url_name):
+        return self.by_url.get(url_name)
+
+
+class EncodedBodies:
+    """LRU קטן של גופים דחוסים לפי (ETag, קידוד) - לא לדחוס שוב אותו לוח"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag, encoding, data):
+        key = (etag, encoding)
+        with self._lock:
+            body = self._data.get(key)
+            if body is not None:
+                self._data.move_to_end(key)
+                return body
+        body = compress(data, encoding)
+        with self._lock:
+            self._data[key] = body
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return body
+
+
+def init_app(app, directory=None):
+    """
+    סורקת את static/ של האפליקציה, רושמת את /assets/<filename> (endpoint
+    בשם asset) ואת asset_url בתבניות. מחזירה את ה-AssetManifest.
+    """
+    manifest = AssetManifest(directory or os.path.join(app.root_path, "static"))
+
+    def asset(filename):
+        """נכס סטטי לפי השם עם טביעת האצבע - התוכן לא משתנה לעולם תחת אותו שם"""
+        item = manifest.get(filename)
+        if item is None:
+            return "קובץ לא נמצא.", 404
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding"), [e for e in item.bodies if e])
+        response = Response(item.bodies[encoding], mimetype=item.mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if len(item.bodies) > 1:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.set_etag(f"{item.etag}-{encoding}" if encoding else item.etag)
+        return response.make_conditional(request)
+
+    app.add_url_rule("/assets/<path:filename>", "asset", asset)
+    app.jinja_env.globals["asset_url"] = lambda name: url_for("asset", filename=manifest.url_name(name))
+    return manifest
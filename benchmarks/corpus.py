@@ -0,0 +1,82 @@
+"""
+מחולל לו"זים סינתטיים בעברית לבדיקות ביצועים.
+
+הלו"ז נראה כמו ההודעות האמיתיות: כותרות "🌟שבוע N (..)", שורות יום
+("ראשון 23.03"), משמרות בפורמטים שונים ("קשה 22-2", "22:30-06:45 חוץ"),
+"כוננות 60", יום/לילה, אירועים מיוחדים (תדריך, הכשרה, קה"ד...) ובסוף
+שורות ההנחיות. התוצאה דטרמיניסטית לכל seed.
+"""
+from datetime import date, timedelta
+import random
+
+DAY_NAMES = ("ראשון", "שני", "שלישי", "רביעי", "חמישי", "שישי", "שבת")
+
+SHIFT_LINES = (
+    "קשה 22-2",
+    "קל 14-22",
+    "22:30-06:45 חוץ",
+    "פנים 6-14",
+    "בינוני 8-16",
+    "2-6 רגיל",
+    "כוננות 60",
+    "יום",
+    "לילה",
+    "תדריך 14-15",
+    "הכשרה 9-12",
+    "קה\"ד 10:00-11:30",
+    "שיחת מפעילים 20:00-21:00",
+    "ישיבה 13-14 קשה",
+    "מאומץ 18-2",
+)
+
+TRAILER = (
+    "בקשות לחילופים יש להעביר עד יום חמישי",
+    "כדי להכניס ללו״ז יש להיכנס לאתר",
+    "נא לאשר בהודעה נפרדת",
+)
+
+# גדלים מוכנים: שם -> מספר שבועות
+SIZES = {
+    "week": 1,
+    "month": 4,
+    "quarter": 13,
+    "year": 52,
+    "unit": 160,
+}
+
+
+def _week_header(number, first, last):
+    if first.month == last.month:
+        return f"🌟שבוע {number} ({first.day}-{last.day}/{first.month})"
+    return f"🌟שבוע {number} ({first.day}/{first.month}-{last.day}/{last.month})"
+
+
+def generate_roster(weeks=1, seed=0, start=None, shifts_per_day=(1, 4), trailer=True):
+    """מחזירה לו"ז כטקסט אחד עם weeks שבועות"""
+    rng = random.Random(seed)
+    if start is None:
+        # יום ראשון הקרוב - כדי שהתאריכים יהיו בעתיד ביחס להיום
+        today = date.today()
+        start = today + timedelta(days=(6 - today.weekday()) % 7 or 7)
+
+    lines = []
+    for week in range(weeks):
+        first = start + timedelta(weeks=week)
+        lines.append(_week_header(week + 1, first, first + timedelta(days=6)))
+        for offset in range(7):
+            day = first + timedelta(days=offset)
+            if day.month == 2 and day.day == 29:
+                # בלי שנה בשורה, 29.02 מקבל שנה מוסקת שאינה בהכרח מעוברת
+                continue
+            lines.append(f"{DAY_NAMES[offset]} {day.day:02d}.{day.month:02d}")
+            for _ in range(rng.randint(*shifts_per_day)):
+                lines.append(rng.choice(SHIFT_LINES))
+            lines.append("")
+    if trailer:
+        lines.extend(TRAILER)
+    return "\n".join(lines)
+
+
+def corpus(seed=0):
+    """כל הגדלים המוכנים: {שם: טקסט}"""
+    return {name: generate_roster(weeks, seed=seed) for name, weeks in SIZES.items()}
@@ -0,0 +1,170 @@
+"""
+חבילת בדיקות ביצועים לנתיב parse → ICS.
+
+מודד לכל גודל לו"ז בקורפוס הסינתטי (benchmarks/corpus.py):
+- parse:      app.parse_schedule
+- serialize:  ics_writer.calendar_text על האירועים
+- build:      app._build_calendar (ICS + שורות תצוגה מקדימה)
+- post:       POST מלא דרך ה-test client של Flask, בלי מטמון
+- post_cached: POST מלא כשהתוצאה כבר במטמון
+
+שימוש:
+    python benchmarks/run.py                      # הרצה והשוואה ל-baseline אם קיים
+    python benchmarks/run.py --save-baseline      # שמירת התוצאות כ-baseline
+    python benchmarks/run.py --sizes week month --threshold 0.2
+
+בדיקות הנכונות עצמן נמצאות ב-tests/ (python -m pytest -q); כאן רק מדידת זמנים.
+
+יוצא עם קוד 1 אם אחד המדדים איטי מה-baseline ביותר מ-threshold.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def _setup_app():
+    """טוען את האפליקציה עם מאגרי SQLite זמניים כדי לא ללכלך את תיקיית העבודה"""
+    tmp = tempfile.mkdtemp(prefix="calander-bench-")
+    os.environ.setdefault("FEED_DB_PATH", os.path.join(tmp, "feeds.db"))
+    os.environ.setdefault("PREVIEW_DB_PATH", os.path.join(tmp, "previews.db"))
+    os.environ.setdefault("MAX_SCHEDULE_CHARS", str(10 ** 8))
+    # הבנצ'מרק שולח מאות בקשות מאותה כתובת - בלי הגבלת קצב
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    sys.path.insert(0, ROOT)
+    import app
+
+    return app
+
+
+def _time(func, repeat, min_seconds=0.2):
+    """חציון של זמן קריאה (בשניות), עם מספר לולאות שמותאם למשך הפעולה"""
+    func()  # חימום
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds / repeat or loops >= 1 << 16:
+            break
+        loops *= 2
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+    return statistics.median(samples)
+
+
+def run(sizes, repeat):
+    app = _setup_app()
+    from benchmarks.corpus import SIZES, generate_roster
+    from ics_writer import calendar_text
+    from response_cache import LocalCache
+
+    client = app.app.test_client()
+    cached_store = app.response_cache
+    uncached_store = LocalCache(max_entries=0)
+
+    def post(text):
+        response = client.post("/", data={"schedule": text})
+        assert response.status_code == 200, response.status_code
+        response.get_data()
+
+    results = {}
+    for name in sizes:
+        text = generate_roster(SIZES[name])
+        events, errors = app.parse_schedule(text)
+        assert events and not errors, errors
+        lines = text.count("\n") + 1
+
+        app.response_cache = uncached_store
+        post_ms = _time(lambda: post(text), repeat) * 1000
+        app.response_cache = cached_store
+        post_cached_ms = _time(lambda: post(text), repeat) * 1000
+
+        results[name] = {
+            "lines": lines,
+            "events": len(events),
+            "parse_ms": _time(lambda: app.parse_schedule(text), repeat) * 1000,
+            "serialize_ms": _time(lambda: calendar_text(events), repeat) * 1000,
+            "build_ms": _time(lambda: app._build_calendar(events), repeat) * 1000,
+            "post_ms": post_ms,
+            "post_cached_ms": post_cached_ms,
+        }
+    return results
+
+
+def compare(results, baseline, threshold):
+    """רשימת רגרסיות: (גודל, מדד, baseline, נוכחי)"""
+    regressions = []
+    for name, metrics in results.items():
+        for key, value in metrics.items():
+            if not key.endswith("_ms"):
+                continue
+            base = baseline.get(name, {}).get(key)
+            if base and value > base * (1 + threshold):
+                regressions.append((name, key, base, value))
+    return regressions
+
+
+def main(argv=None):
+    from benchmarks.corpus import SIZES
+
+    parser = argparse.ArgumentParser(description="parse → ICS benchmark suite")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.25, help="האטה יחסית מותרת (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="שמירת התוצאות כ-JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat)
+
+    header = f"{'size':>8} {'lines':>6} {'events':>6} " + " ".join(
+        f"{k:>14}" for k in ("parse_ms", "serialize_ms", "build_ms", "post_ms", "post_cached_ms")
+    )
+    print(header)
+    for name, m in results.items():
+        print(
+            f"{name:>8} {m['lines']:>6} {m['events']:>6} "
+            + " ".join(f"{m[k]:>14.3f}" for k in ("parse_ms", "serialize_ms", "build_ms", "post_ms", "post_cached_ms"))
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline yet (run with --save-baseline)")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for name, key, base, value in regressions:
+        print(f"REGRESSION {name}.{key}: {base:.3f}ms -> {value:.3f}ms (+{(value / base - 1) * 100:.0f}%)")
+    if regressions:
+        return 1
+    print("OK: no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT)
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+מדידת זמן עלייה וזיכרון של האפליקציה (cold start), בתהליך נקי.
+
+מודד את זמן ה-import של app, את ה-RSS המקסימלי ואת הזמן עד הבייט הראשון
+של בקשת POST ראשונה, ונכשל (exit code 1) אם אחד מהם חורג מהתקציב.
+בנוסף מוודא שספריות כבדות (ics/arrow/TatSu/pytz) לא נטענות בעלייה.
+
+שימוש:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --max-import-ms 300 --max-rss-mb 60 --max-first-byte-ms 50
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# מודולים שאסור שייטענו רק מעצם טעינת האפליקציה
+FORBIDDEN_AT_STARTUP = ("ics", "arrow", "tatsu", "pytz")
+
+_PROBE = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+loaded = sorted(m for m in FORBIDDEN if m in sys.modules)
+client = app.app.test_client()
+t2 = time.perf_counter()
+response = client.post("/", data={"schedule": "ראשון 23.03\nקשה 22-2\nכוננות 60"}, buffered=False)
+next(iter(response.response))
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_byte_ms": (t3 - t2) * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "forbidden_loaded": loaded,
+}))
+"""
+
+
+def measure():
+    code = f"FORBIDDEN = {FORBIDDEN_AT_STARTUP!r}\n" + _PROBE
+    # מאגרי SQLite זמניים (כמו ב-run.py) כדי לא ללכלך את תיקיית העבודה
+    with tempfile.TemporaryDirectory(prefix="calander-startup-") as tmp:
+        env = dict(
+            os.environ,
+            FEED_DB_PATH=os.path.join(tmp, "feeds.db"),
+            PREVIEW_DB_PATH=os.path.join(tmp, "previews.db"),
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-import-ms", type=float, default=float(os.environ.get("STARTUP_MAX_IMPORT_MS", 500)))
+    parser.add_argument("--max-rss-mb", type=float, default=float(os.environ.get("STARTUP_MAX_RSS_MB", 80)))
+    parser.add_argument("--max-first-byte-ms", type=float, default=float(os.environ.get("STARTUP_MAX_FIRST_BYTE_MS", 150)))
+    parser.add_argument("--runs", type=int, default=3, help="מספר הרצות; נלקח החציון")
+    args = parser.parse_args(argv)
+
+    results = [measure() for _ in range(args.runs)]
+
+    def median(key):
+        values = sorted(r[key] for r in results)
+        return values[len(values) // 2]
+
+    report = {
+        "import_ms": median("import_ms"),
+        "first_byte_ms": median("first_byte_ms"),
+        "max_rss_mb": median("max_rss_mb"),
+    }
+    forbidden = sorted({m for r in results for m in r["forbidden_loaded"]})
+
+    failures = []
+    if report["import_ms"] > args.max_import_ms:
+        failures.append(f"import {report['import_ms']:.1f}ms > {args.max_import_ms}ms")
+    if report["max_rss_mb"] > args.max_rss_mb:
+        failures.append(f"RSS {report['max_rss_mb']:.1f}MB > {args.max_rss_mb}MB")
+    if report["first_byte_ms"] > args.max_first_byte_ms:
+        failures.append(f"first byte {report['first_byte_ms']:.1f}ms > {args.max_first_byte_ms}ms")
+    if forbidden:
+        failures.append(f"heavy modules loaded at startup: {', '.join(forbidden)}")
+
+    for key, value in report.items():
+        print(f"{key:>14}: {value:8.1f}")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        return 1
+    print("OK: within startup budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
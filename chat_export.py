@@ -0,0 +1,194 @@
+"""
+איתור לו"זים בתוך ייצוא של צ'אט WhatsApp.
+
+הלו"ז מגיע כהודעה בקבוצה: כותרת "🌟שבוע 13 (23-29/3)", שורות יום ומשמרות,
+ובסוף ההנחיות ("בקשות לחילופים..."). ייצוא של שנה הוא כמה מגה-בייטים של
+שיחה, ולכן הקובץ לא עובר שורה-שורה דרך הפרסר: find_roster_blocks מחפשת
+ב-bytes (mmap) את רצף הבתים של "שבוע", ורק סביב כל מופע בודקת בביטוי על
+bytes שזו כותרת שבוע ושבהמשך ההודעה יש שורת יום. הבלוק נמשך עד תחילת
+ההודעה הבאה (שורה שמתחילה בתאריך ושעה של WhatsApp).
+
+רק הבלוקים שנבחרו (האחרון, או כולם - ושבוע שפורסם שוב נלקח מהפרסום
+האחרון) מפוענחים, כל אחד עם מועד ההודעה כזמן הייחוס להסקת השנה.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import io
+import mmap
+import os
+import re
+import tempfile
+import zipfile
+
+from events import EventBatch
+from parsers import iter_rows, reference_time
+
+MODES = ("latest", "all")
+# תקרה לקובץ הצ'אט אחרי חילוץ מ-zip (zip קטן יכול להתפרק לג'יגה-בייטים)
+MAX_EXPORT_BYTES = 64 * 1024 * 1024
+_ZIP_MAGIC = b"PK\x03\x04"
+_COPY_CHUNK = 1024 * 1024
+_WEEK_WORD = "שבוע".encode("utf-8")
+# "שבוע 13 (23-29/3)", "שבוע 5 (28/12-3/1)" - הטווח בסוגריים משמש כשם הבלוק
+_WEEK_HEADER = re.compile(r"שבוע\s+\d+\s*\(([\d./\- ]+)\)".encode("utf-8"))
+_DAY_LINE = re.compile(
+    ("^(?:\\*|\u200e|\u200f)*(?:יום )?(?:ראשון|שני|שלישי|רביעי|חמישי|שישי|שבת)\\s+\\d{1,2}[./-]\\d{1,2}").encode("utf-8"),
+    re.MULTILINE,
+)
+# תחילת הודעה: "23/03/2025, 14:05 - " (Android) או "[23.03.2025, 14:05:12] " (iPhone)
+_MESSAGE_START = re.compile(
+    rb"^(?:\xe2\x80\x8e)?\[?(\d{1,2})[./](\d{1,2})[./](\d{2,4}),? (\d{1,2}):(\d{2})(?::\d{2})?[^\]\n-]{0,6}(?:\]| - )",
+    re.MULTILINE,
+)
+# לו"ז מתפרסם לפני השבוע או במהלכו; הייחוס מוקדם בשבוע כדי שתיקון
+# באמצע השבוע לא יגלגל את הימים שכבר עברו לשנה הבאה
+_REFERENCE_LEAD = timedelta(days=7)
+
+# start/end - מיקום הבלוק ב-bytes, sent - מועד ההודעה (או None), week - טווח הכותרת
+RosterBlock = namedtuple("RosterBlock", "start end sent week")
+
+
+def _message_time(match):
+    day, month, year, hour, minute = (int(group) for group in match.groups())
+    if month > 12:
+        # ייצוא בתצורה אמריקאית (חודש/יום)
+        day, month = month, day
+    if year < 100:
+        year += 2000
+    try:
+        return datetime(year, month, day, hour, minute)
+    except ValueError:
+        return None
+
+
+def _sent_time(data, line_start, max_lines=500):
+    """מועד ההודעה שהשורה שייכת לה - חיפוש לאחור עד שורת הפתיחה שלה"""
+    for _ in range(max_lines):
+        match = _MESSAGE_START.match(data, line_start)
+        if match is not None:
+            return _message_time(match)
+        if line_start == 0:
+            break
+        line_start = data.rfind(b"\n", 0, line_start - 1) + 1
+    return None
+
+
+def find_roster_blocks(data):
+    """כל בלוקי הלו"ז בייצוא (bytes או mmap), לפי סדר הופעתם"""
+    blocks = []
+    size = len(data)
+    pos = 0
+    while True:
+        hit = data.find(_WEEK_WORD, pos)
+        if hit < 0:
+            break
+        line_end = data.find(b"\n", hit)
+        if line_end < 0:
+            line_end = size
+        header = _WEEK_HEADER.search(data, hit, line_end)
+        if header is None:
+            pos = hit + len(_WEEK_WORD)
+            continue
+        following = _MESSAGE_START.search(data, line_end)
+        end = following.start() if following else size
+        if _DAY_LINE.search(data, line_end, end) is None:
+            # "שבוע" בשיחה רגילה, או כותרת בלי ימים אחריה
+            pos = line_end
+            continue
+        line_start = data.rfind(b"\n", 0, hit) + 1
+        week = header.group(1).decode("ascii").strip()
+        blocks.append(RosterBlock(line_start, end, _sent_time(data, line_start), week))
+        pos = end
+    return blocks
+
+
+def select_blocks(blocks, mode="latest"):
+    """latest - הבלוק האחרון בלבד; all - כולם, ושבוע שפורסם שוב מהפרסום האחרון"""
+    if mode not in MODES:
+        raise ValueError(f"unknown chat import mode: {mode}")
+    if not blocks:
+        return []
+    if mode == "latest":
+        return [blocks[-1]]
+    latest = {}
+    for block in blocks:
+        latest[(block.week, block.sent.year if block.sent else None)] = block
+    return sorted(latest.values(), key=lambda block: block.start)
+
+
+def iter_block_rows(data, blocks, errors, vocabulary=None):
+    """שורות האירוע של הבלוקים, כל בלוק מפוענח עם מועד ההודעה שלו כייחוס"""
+    for block in blocks:
+        text = data[block.start:block.end].decode("utf-8", errors="replace")
+        block_errors = []
+        with reference_time(block.sent - _REFERENCE_LEAD if block.sent else None):
+            yield from iter_rows(text, block_errors, vocabulary=vocabulary)
+        label = f"שבוע {block.week}"
+        if block.sent:
+            label += f" (הודעה מ-{block.sent:%d/%m/%Y})"
+        errors.extend(f"{label}: {error}" for error in block_errors)
+
+
+def parse_blocks(data, blocks, vocabulary=None):
+    """(EventBatch, errors) לבלוקים שנבחרו - כמו parse_schedule"""
+    errors = []
+    events = EventBatch(iter_block_rows(data, blocks, errors, vocabulary))
+    return events, errors
+
+
+def _extract_chat(file, target, max_bytes):
+    """
+    ייצוא מ-iPhone (או עם מדיה) מגיע כ-zip עם _chat.txt: מעתיקה אותו
+    לקובץ target בחתיכות. ValueError אם הוא גדול מ-max_bytes (לפי הכותרת
+    או לפי מה שנקרא בפועל) או שה-zip פגום. מחזירה את מספר הבתים.
+    """
+    try:
+        with zipfile.ZipFile(file) as archive:
+            names = [info for info in archive.infolist() if info.filename.endswith(".txt")]
+            if not names:
+                return 0
+            chosen = max(names, key=lambda info: (info.filename.endswith("_chat.txt"), info.file_size))
+            if max_bytes is not None and chosen.file_size > max_bytes:
+                raise ValueError(f"chat export expands to {chosen.file_size} bytes (limit {max_bytes})")
+            written = 0
+            with archive.open(chosen) as source:
+                for chunk in iter(lambda: source.read(_COPY_CHUNK), b""):
+                    written += len(chunk)
+                    if max_bytes is not None and written > max_bytes:
+                        raise ValueError(f"chat export expands past {max_bytes} bytes")
+                    target.write(chunk)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError) as e:
+        raise ValueError(f"invalid chat export archive: {e}") from None
+    target.flush()
+    return written
+
+
+@contextmanager
+def map_export(file, max_bytes=MAX_EXPORT_BYTES):
+    """
+    תוכן הייצוא כ-bytes-like: mmap כשלקובץ יש descriptor אמיתי (קובץ על
+    הדיסק או העלאה גדולה ששמורה בקובץ זמני), אחרת read(). zip מחולץ לקובץ
+    זמני (עד max_bytes, אחרת ValueError) וממופה ממנו.
+    """
+    head = file.read(4)
+    file.seek(0)
+    if head == _ZIP_MAGIC:
+        with tempfile.TemporaryFile() as extracted:
+            if _extract_chat(file, extracted, max_bytes) == 0:
+                yield b""
+                return
+            with mmap.mmap(extracted.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+        return
+    try:
+        fileno = file.fileno()
+        # מה שעוד בבאפר של הקובץ הזמני חייב להגיע לדיסק לפני ה-mmap
+        file.flush()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fileno = None
+    if fileno is None or os.fstat(fileno).st_size == 0:
+        yield file.read()
+        return
+    with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as data:
+        yield data
@@ -0,0 +1,240 @@
+"""
+המרה מרוכזת של קבצי לו"ז (טקסט) ל-ICS, בלי שרת.
+
+מקבל תיקייה או glob, מחלק את הקבצים בין תהליכים (ProcessPoolExecutor,
+בחבילות של chunksize קבצים), קורא כל קובץ דרך mmap שורה-שורה ישירות
+לפרסר הזורם, וכותב קובץ .ics לכל קלט או קובץ אחד ממוזג.
+בקובץ הממוזג כל UID מופיע פעם אחת (אותו לו"ז בשני קבצים לא משוכפל), ובמצב
+קובץ-לכל-קלט קלטים עם אותו שם בתיקיות שונות מקבלים סיומת מספרית (week-2.ics).
+שגיאות מדווחות עם שם הקובץ (ומספר השורה, מתוך הודעת הפרסר).
+
+שימוש:
+    python convert.py rosters/ -o out/
+    python convert.py "exports/*.txt" --merge all.ics --workers 8
+    python convert.py rosters/ -o out/ --rrule   # משמרות חוזרות כ-RRULE
+    python convert.py "chats/*.txt" -o out/ --chat all   # ייצוא צ'אט WhatsApp
+    python convert.py rosters/ -o out/ --profile vocabularies/unit.json
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+import argparse
+import glob
+import mmap
+import os
+import sys
+import time
+
+from chat_export import MODES as CHAT_MODES, find_roster_blocks, map_export, parse_blocks, select_blocks
+from events import EventBatch
+from ics_writer import CRLF, PRODID, format_utc, iter_recurring_events, iter_uid_fields, iter_vevent
+from parsers import iter_rows
+from vocabulary import load_vocabulary
+
+
+def _iter_file_lines(path):
+    """שורות הקובץ כ-bytes דרך mmap, בלי לטעון את כולו למחרוזת אחת"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # BOM של UTF-8 (נפוץ בקבצים שיוצאו מ-Windows)
+            if mm[:3] == b"\xef\xbb\xbf":
+                mm.seek(3)
+            yield from iter(mm.readline, b"")
+
+
+@lru_cache(maxsize=None)
+def _profile(path):
+    # מקומפל פעם אחת לכל תהליך, לא לכל קובץ
+    return load_vocabulary(path) if path else None
+
+
+def _parse_chat(path, mode, errors, vocabulary=None):
+    # ייצוא צ'אט: רק בלוקי הלו"ז שבו מפוענחים
+    with open(path, "rb") as f, map_export(f) as data:
+        blocks = select_blocks(find_roster_blocks(data), mode)
+        if not blocks:
+            errors.append("לא נמצא לו\"ז בייצוא הצ'אט")
+        events, block_errors = parse_blocks(data, blocks, vocabulary)
+    errors.extend(block_errors)
+    return events
+
+
+def _iter_calendar_events(items, recurring, dtstamp):
+    """שורות ה-VEVENT מזוגות (uid, fields): מכווץ (RRULE) או אירוע לכל זוג"""
+    if recurring:
+        yield from iter_recurring_events(items, dtstamp)
+        return
+    for uid, fields in items:
+        yield from iter_vevent(uid, fields, dtstamp)
+
+
+def convert_file(path, output_dir=None, merge=False, recurring=False, chat=None, profile=None, output_name=None):
+    """
+    ממירה קובץ אחד. מחזירה dict עם מונים ושגיאות; במצב merge גם את
+    זוגות ה-(uid, fields) של האירועים (items) כדי שהתהליך הראשי יחבר אותם
+    לקובץ אחד בלי UID כפול.
+    recurring - פלט מכווץ עם RRULE/EXDATE למשמרות שחוזרות כל שבוע.
+    chat - הקובץ הוא ייצוא צ'אט ("latest" או "all" מבלוקי הלו"ז שבו).
+    profile - נתיב לקובץ פרופיל אוצר מילים (JSON, ראו vocabulary.py).
+    output_name - שם קובץ הפלט ב-output_dir (ברירת מחדל: שם הקלט עם .ics).
+    """
+    errors = []
+    items = []
+    try:
+        vocabulary = _profile(profile)
+        if chat:
+            events = _parse_chat(path, chat, errors, vocabulary)
+        else:
+            events = EventBatch(iter_rows(_iter_file_lines(path), errors, vocabulary=vocabulary))
+        items = list(iter_uid_fields(events))
+    except (OSError, ValueError) as e:
+        errors.append(str(e))
+    count = len(items)
+
+    result = {
+        "path": path,
+        "bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+        "events": count,
+        "errors": [f"{path}: {error}" for error in errors],
+        "items": None,
+        "output": None,
+    }
+    if merge:
+        result["items"] = items
+    elif count and output_dir:
+        output = os.path.join(output_dir, output_name or output_name_for(path))
+        dtstamp = format_utc(datetime.now(timezone.utc))
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            f.write("BEGIN:VCALENDAR" + CRLF + "VERSION:2.0" + CRLF + "PRODID:" + PRODID + CRLF)
+            f.writelines(_iter_calendar_events(items, recurring, dtstamp))
+            f.write("END:VCALENDAR" + CRLF)
+        result["output"] = output
+    return result
+
+
+def _convert_for_pool(args):
+    return convert_file(*args)
+
+
+def output_name_for(path):
+    return os.path.splitext(os.path.basename(path))[0] + ".ics"
+
+
+def output_names(paths):
+    """
+    שם פלט ייחודי לכל קלט: שם הקובץ עם .ics, ולשמות שחוזרים (a/week.txt,
+    b/week.txt) סיומת מספרית לפי סדר הקלט - week.ics, week-2.ics.
+    """
+    names = []
+    taken = set()
+    for path in paths:
+        name = output_name_for(path)
+        stem = name[:-4]
+        suffix = 1
+        # בלי תלות באותיות גדולות/קטנות (מערכות קבצים של macOS/Windows)
+        while name.lower() in taken:
+            suffix += 1
+            name = f"{stem}-{suffix}.ics"
+        taken.add(name.lower())
+        names.append(name)
+    return names
+
+
+def collect_inputs(sources, pattern="*.txt"):
+    """תיקיות (לפי pattern), glob או נתיבי קבצים → רשימת קבצים ממוינת"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(glob.glob(os.path.join(source, pattern)))
+        elif any(ch in source for ch in "*?["):
+            paths.extend(glob.glob(source, recursive=True))
+        else:
+            paths.append(source)
+    return sorted(set(p for p in paths if os.path.isfile(p)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="המרה מרוכזת של קבצי לו\"ז ל-ICS")
+    parser.add_argument("sources", nargs="+", help="תיקייה, glob או קבצים")
+    parser.add_argument("-o", "--output-dir", default=".", help="תיקיית הפלט (קובץ .ics לכל קלט)")
+    parser.add_argument("--merge", metavar="FILE", help="כתיבת כל האירועים לקובץ ICS אחד")
+    parser.add_argument("--rrule", action="store_true", help="משמרות חוזרות כאירוע אחד עם RRULE שבועי")
+    parser.add_argument("--chat", choices=CHAT_MODES, help="הקלט הוא ייצוא צ'אט: הלו\"ז האחרון או כולם")
+    parser.add_argument("--profile", metavar="FILE", help="פרופיל אוצר מילים של היחידה (JSON)")
+    parser.add_argument("--pattern", default="*.txt", help="סינון קבצים בתיקייה (ברירת מחדל: *.txt)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="מספר תהליכים")
+    parser.add_argument("--chunksize", type=int, default=0, help="קבצים לכל משימה (0 = אוטומטי)")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.sources, args.pattern)
+    if not paths:
+        print("no input files", file=sys.stderr)
+        return 2
+    if not args.merge:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    workers = max(1, min(args.workers or 1, len(paths)))
+    chunksize = args.chunksize or max(1, len(paths) // (workers * 4))
+    tasks = [
+        (path, args.output_dir, bool(args.merge), args.rrule, args.chat, args.profile, name)
+        for path, name in zip(paths, output_names(paths))
+    ]
+
+    started = time.perf_counter()
+    totals = {"files": 0, "bytes": 0, "events": 0, "errors": 0, "duplicates": 0}
+    merged = open(args.merge, "w", encoding="utf-8", newline="") if args.merge else None
+    # UID -> fields של כל מה שנכנס לקובץ הממוזג; אותו UID מקלט נוסף מדולג
+    merged_items = {}
+    dtstamp = format_utc(datetime.now(timezone.utc))
+    try:
+        if merged:
+            merged.write("BEGIN:VCALENDAR" + CRLF + "VERSION:2.0" + CRLF + "PRODID:" + PRODID + CRLF)
+        if workers == 1:
+            results = map(_convert_for_pool, tasks)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(_convert_for_pool, tasks, chunksize=chunksize)
+        try:
+            # התוצאות חוזרות לפי סדר הקלט, כך שהקובץ הממוזג דטרמיניסטי
+            for result in results:
+                totals["files"] += 1
+                totals["bytes"] += result["bytes"]
+                totals["events"] += result["events"]
+                totals["errors"] += len(result["errors"])
+                for error in result["errors"]:
+                    print(error, file=sys.stderr)
+                if merged and result["items"]:
+                    fresh = [(uid, fields) for uid, fields in result["items"] if uid not in merged_items]
+                    totals["duplicates"] += len(result["items"]) - len(fresh)
+                    merged_items.update(fresh)
+                    if not args.rrule:
+                        merged.writelines(_iter_calendar_events(fresh, False, dtstamp))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if merged:
+            if args.rrule:
+                # סדרות נבנות מכל הקלטים יחד, כדי שמשמרת לא תופיע בשתי סדרות
+                merged.writelines(_iter_calendar_events(merged_items.items(), True, dtstamp))
+            merged.write("END:VCALENDAR" + CRLF)
+    finally:
+        if merged:
+            merged.close()
+
+    elapsed = time.perf_counter() - started
+    if totals["duplicates"]:
+        print(f"{totals['duplicates']} events skipped in {args.merge}: UID already merged from an earlier input")
+    print(
+        f"{totals['files']} files, {totals['events']} events, {totals['errors']} errors "
+        f"in {elapsed:.2f}s with {workers} workers "
+        f"({totals['files'] / elapsed:.1f} files/s, {totals['events'] / elapsed:.0f} events/s, "
+        f"{totals['bytes'] / elapsed / 1e6:.2f} MB/s)"
+    )
+    return 1 if totals["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+ייצוג עמודתי של אירועים שפוענחו.
+
+במקום מילון עם שני datetime מודעי-אזור-זמן לכל אירוע, EventBatch שומרת
+את זמני ההתחלה והסיום כמערכי int64 (array('q')) של שניות מאז 1970 -
+פעם בזמן מקומי כפי שנכתב בלו"ז ופעם ב-UTC - ואת הכותרות והתיאורים כמחרוזות
+interned (בלו"ז של יחידה אותן שורות חוזרות מאות פעמים).
+
+הפרסרים מחזירים שורות [local_start, local_end, description, title] בחשבון
+שלמים, וההמרה ל-UTC רצה בבת אחת על כל העמודה עם טבלת ההיסטים ליום של
+timezones. מילון אירוע (start/end/description/title/uid) נבנה רק כשמבקשים
+אותו - האצווה היא sequence של מילונים, כך שקוד שעובר על האירועים כרשימה
+ממשיך לעבוד.
+"""
+from array import array
+from datetime import timedelta
+import sys
+import time
+
+from metrics import current_timer
+from timezones import EPOCH, LOCAL, UTC
+
+_EPOCH_UTC = EPOCH.replace(tzinfo=UTC)
+
+
+def format_seconds(seconds, fmt):
+    """שניות מאז 1970 → מחרוזת לפי fmt, בלי ליצור datetime"""
+    return time.strftime(fmt, time.gmtime(seconds))
+
+
+def row_event(local_start, local_end, description, title=None):
+    """שורת אירוע של הפרסר → מילון אירוע עם start/end מודעי-אזור-זמן ב-UTC"""
+    event = {
+        "start": _EPOCH_UTC + timedelta(seconds=LOCAL.local_seconds_to_utc(local_start)),
+        "end": _EPOCH_UTC + timedelta(seconds=LOCAL.local_seconds_to_utc(local_end)),
+        "description": description,
+    }
+    if title is not None:
+        event["title"] = title
+    return event
+
+
+class EventBatch:
+    __slots__ = ("local_starts", "local_ends", "starts", "ends", "titles", "descriptions", "uids")
+
+    def __init__(self, rows=()):
+        self.local_starts = array("q")
+        self.local_ends = array("q")
+        self.titles = []
+        self.descriptions = []
+        for local_start, local_end, description, title in rows:
+            self.local_starts.append(local_start)
+            self.local_ends.append(local_end)
+            self.descriptions.append(sys.intern(description))
+            self.titles.append(None if title is None else sys.intern(title))
+        # המרה ל-UTC על כל העמודה (ההיסט נשמר לכל יום מקומי)
+        with current_timer().stage("tz"):
+            self.starts = array("q", map(LOCAL.local_seconds_to_utc, self.local_starts))
+            self.ends = array("q", map(LOCAL.local_seconds_to_utc, self.local_ends))
+        self.uids = [None] * len(self.descriptions)
+
+    def __len__(self):
+        return len(self.descriptions)
+
+    def summary(self, i):
+        """הכותרת אם קיימת, אחרת התיאור המלא"""
+        title = self.titles[i]
+        return self.descriptions[i] if title is None else title
+
+    def event(self, i):
+        """מילון אירוע בצורה ש-parse_schedule החזירה תמיד"""
+        event = {
+            "start": _EPOCH_UTC + timedelta(seconds=self.starts[i]),
+            "end": _EPOCH_UTC + timedelta(seconds=self.ends[i]),
+            "description": self.descriptions[i],
+        }
+        if self.titles[i] is not None:
+            event["title"] = self.titles[i]
+        if self.uids[i] is not None:
+            event["uid"] = self.uids[i]
+        return event
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.event(i)
+
+    def __iter__(self):
+        return map(self.event, range(len(self)))
@@ -0,0 +1,169 @@
+"""
+מנויי יומן (webcal): לכל משתמש טוקן קבוע, והלו"ז האחרון שלו נשמר
+כקובץ ICS מוכן ב-SQLite מקומי.
+
+יומנים שמושכים את הפיד שוב ושוב מקבלים ETag/Last-Modified, כך שבקשה
+חוזרת ללא שינוי נענית ב-304 בלי פענוח ובלי סריאליזציה מחדש. שליחה חוזרת
+של אותו לו"ז לא משנה את הרשומה (ולא את Last-Modified) - רק שינוי באירועים.
+
+פיד שלא נשלח אליו לו"ז ולא נמשך במשך ttl שניות נמחק (accessed_at מתעדכן
+בשליחה, ובמשיכה לכל היותר פעם ב-_TOUCH_INTERVAL).
+"""
+from datetime import datetime, timezone
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+
+from events import EventBatch
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    token       TEXT PRIMARY KEY,
+    ics         BLOB NOT NULL,
+    etag        TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    updated_at  REAL NOT NULL,
+    event_index TEXT NOT NULL DEFAULT '{}',
+    accessed_at REAL NOT NULL DEFAULT 0
+)
+"""
+# כל כמה שניות לכל היותר מוחקים פידים שפג תוקפם
+_PURGE_INTERVAL = 60
+# יומן מושך את הפיד כל כמה דקות - לא לכתוב למאגר בכל משיכה
+_TOUCH_INTERVAL = 3600
+
+
+def new_token():
+    return secrets.token_urlsafe(18)
+
+
+def events_fingerprint(events):
+    """hash של תוכן האירועים (זמנים, כותרת, תיאור) - בלי UID ו-DTSTAMP"""
+    digest = hashlib.sha256()
+    if isinstance(events, EventBatch):
+        # ישירות מהעמודות: מערכי הזמנים כבתים ואחריהם הטקסטים
+        digest.update(events.starts.tobytes())
+        digest.update(events.ends.tobytes())
+        for title, description in zip(events.titles, events.descriptions):
+            digest.update(f"{title or ''}\x1f{description}\x1e".encode("utf-8"))
+        return digest.hexdigest()
+    for event in events:
+        digest.update(
+            "\x1f".join((
+                event["start"].isoformat(),
+                event["end"].isoformat(),
+                event.get("title", ""),
+                event["description"],
+            )).encode("utf-8")
+        )
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+class Feed:
+    __slots__ = ("ics", "etag", "updated_at", "_index")
+
+    def __init__(self, ics, etag, updated_at, index="{}"):
+        self.ics = ics
+        self.etag = etag
+        self.updated_at = updated_at
+        self._index = index
+
+    @property
+    def index(self):
+        """{uid: fields} של האירועים בפיד (ראו ics_writer.calendar_index)"""
+        return json.loads(self._index)
+
+    @property
+    def last_modified(self):
+        return datetime.fromtimestamp(int(self.updated_at), timezone.utc)
+
+
+class FeedStore:
+    """מאגר פידים ב-SQLite; חיבור נפרד לכל thread, WAL לכתיבה מכמה workers"""
+
+    def __init__(self, path, ttl=90 * 86400):
+        self.path = path
+        # 0 או None - פידים לא פגים לעולם
+        self.ttl = ttl
+        self._local = threading.local()
+        self._last_purge = 0.0
+        # חיבור זמני בלבד: עם gunicorn --preload המאגר נוצר בתהליך האב,
+        # ואסור שחיבור פתוח יעבור בירושה ל-workers אחרי fork
+        conn = sqlite3.connect(path, timeout=10)
+        try:
+            with conn:
+                conn.execute(_SCHEMA)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(feeds)")}
+                if "event_index" not in columns:
+                    # מאגר שנוצר לפני שנשמר index האירועים
+                    conn.execute("ALTER TABLE feeds ADD COLUMN event_index TEXT NOT NULL DEFAULT '{}'")
+                if "accessed_at" not in columns:
+                    # מאגר שנוצר לפני שפידים פגו: הפעילות האחרונה הידועה היא העדכון
+                    conn.execute("ALTER TABLE feeds ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+                    conn.execute("UPDATE feeds SET accessed_at = updated_at")
+                conn.execute("CREATE INDEX IF NOT EXISTS feeds_accessed_at ON feeds (accessed_at)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, token):
+        row = self._connect().execute(
+            "SELECT ics, etag, updated_at, event_index FROM feeds WHERE token = ?", (token,)
+        ).fetchone()
+        if row is None:
+            return None
+        return Feed(bytes(row[0]), row[1], row[2], row[3])
+
+    def head(self, token):
+        """Feed בלי התוכן (ics=None) - מספיק ל-ETag/Last-Modified של משיכה חוזרת"""
+        row = self._connect().execute(
+            "SELECT etag, updated_at FROM feeds WHERE token = ?", (token,)
+        ).fetchone()
+        if row is None:
+            return None
+        return Feed(None, row[0], row[1])
+
+    def update(self, token, ics, etag, fingerprint, index=None):
+        """
+        שומרת את הלו"ז של הטוקן. אם האירועים לא השתנו (אותו fingerprint)
+        הרשומה נשארת כמו שהיא (רק accessed_at מתעדכן). מחזירה True אם בוצע עדכון.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO feeds (token, ics, etag, fingerprint, updated_at, event_index, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(token) DO UPDATE SET ics = excluded.ics, etag = excluded.etag, "
+                "fingerprint = excluded.fingerprint, updated_at = excluded.updated_at, "
+                "event_index = excluded.event_index, accessed_at = excluded.accessed_at "
+                "WHERE feeds.fingerprint != excluded.fingerprint",
+                (token, ics, etag, fingerprint, now, json.dumps(index or {}, ensure_ascii=False), now),
+            )
+            updated = cursor.rowcount > 0
+            if not updated:
+                conn.execute("UPDATE feeds SET accessed_at = ? WHERE token = ?", (now, token))
+            if self.ttl and now - self._last_purge >= _PURGE_INTERVAL:
+                self._last_purge = now
+                conn.execute("DELETE FROM feeds WHERE accessed_at < ?", (now - self.ttl,))
+        return updated
+
+    def touch(self, token):
+        """מסמנת שהפיד נמשך (יומן מנוי) כדי שלא יפוג; כותבת לכל היותר פעם ב-_TOUCH_INTERVAL"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE feeds SET accessed_at = ? WHERE token = ? AND accessed_at < ?",
+                (now, token, now - _TOUCH_INTERVAL),
+            )
@@ -0,0 +1,32 @@
+# הגדרות gunicorn - נטענות אוטומטית מתיקיית העבודה.
+# פרמטרים בשורת הפקודה (למשל -w 2 -b 0.0.0.0:10000) גוברים על הקובץ.
+import gc
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# יותר מ-thread אחד מעביר את gunicorn ל-workers מסוג gthread. רק אז בקשות
+# רצות במקביל בתוך worker ותקרת הפענוחים (MAX_INFLIGHT_PARSES) נכנסת לפעולה
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+# עם preload האפליקציה נטענת פעם אחת בתהליך האב, וה-workers מקבלים
+# את המודולים והמצב לקריאה-בלבד במשותף (copy-on-write) - עלייה מהירה יותר
+# וזיכרון קטן יותר לכל worker. ניתן לכבות עם GUNICORN_PRELOAD=0.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    import app
+
+    app.warm_up()
+    # מוציאים את האובייקטים שכבר נטענו ממעקב ה-GC כדי שמעבר של ה-GC
+    # ב-worker לא יכתוב לדפים המשותפים ויבטל את השיתוף
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # worker.cfg.threads כולל גם --threads משורת הפקודה
+    import app
+
+    app.size_parse_slots(worker.cfg.threads)
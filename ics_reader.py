@@ -0,0 +1,236 @@
+"""
+קורא iCalendar (RFC 5545) זורם ליומנים שמשתמשים מעלים, ומיזוג עם הלו"ז.
+
+ספריית ics בונה עץ אובייקטים מלא דרך הדקדוק של TatSu - איטי וכבד בזיכרון
+ליומן אישי של כמה שנים. כאן הקובץ נקרא שורה-שורה: שורות המשך מחוברות
+(unfolding), ומכל VEVENT נשלפים רק DTSTART, DTEND, SUMMARY ו-UID. שאר
+השורות של האירוע נשמרות כמו שהן, כך שבמיזוג הוא נכתב חזרה בלי לאבד
+מידע (התראות, מיקום, אירועי יום שלם).
+
+iter_merged_calendar בונה אינדקס hash על (התחלה, סיום, כותרת) של אירועי
+הלו"ז בלבד, עוברת פעם אחת על הקובץ שהועלה ומזרימה אותו הלאה, ובסוף
+מוסיפה רק את אירועי הלו"ז שלא נמצאו בו. הזיכרון תלוי בגודל הלו"ז ובאירוע
+הנוכחי, לא בגודל היומן שהועלה.
+"""
+from calendar import timegm
+from datetime import datetime, timezone
+from functools import lru_cache
+import re
+import time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from events import format_seconds
+from ics_writer import CRLF, UTC_FORMAT, calendar_header, fold_line, format_utc, iter_vevent
+from timezones import LOCAL, LOCAL_TZ_NAME, TimezoneTable
+
+# מאפייני הלוח שהכותרת שלנו מחליפה
+_HEADER_PROPERTIES = frozenset(("VERSION", "PRODID", "METHOD", "CALSCALE"))
+_EVENT_PROPERTIES = ("DTSTART", "DTEND", "SUMMARY", "UID")
+_TEXT_ESCAPE = re.compile(r"\\(.)")
+
+
+class UploadedEvent:
+    """VEVENT מהקובץ: זמנים ב-UTC בפורמט של ics_writer (או None), ושורות המקור"""
+
+    __slots__ = ("start", "end", "summary", "uid", "lines")
+
+    def __init__(self):
+        self.start = self.end = self.summary = self.uid = None
+        self.lines = None
+
+    @property
+    def key(self):
+        return (self.start, self.end, self.summary)
+
+
+def iter_unfolded(lines):
+    """שורות תוכן אחרי unfolding ובלי סוף השורה; lines - str או bytes (למשל קובץ בינארי)"""
+    current = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current:
+            yield current
+        # BOM בתחילת הקובץ (ייצוא מ-Windows)
+        current = line.lstrip("\ufeff") if current is None else line
+    if current:
+        yield current
+
+
+def _split_property(line):
+    """NAME;PARAM=..:VALUE → (NAME, {PARAM: value}, VALUE)"""
+    colon = line.find(":")
+    if '"' in line[:colon]:
+        # ערך פרמטר במירכאות יכול להכיל נקודתיים
+        quoted = False
+        for colon, ch in enumerate(line):
+            if ch == '"':
+                quoted = not quoted
+            elif ch == ":" and not quoted:
+                break
+        else:
+            colon = -1
+    if colon < 0:
+        return line.upper(), {}, ""
+    name, *params = line[:colon].split(";")
+    parameters = {}
+    for param in params:
+        key, _, value = param.partition("=")
+        parameters[key.upper()] = value.strip('"')
+    return name.upper(), parameters, line[colon + 1:]
+
+
+def _unescape(value):
+    if "\\" not in value:
+        return value
+    return _TEXT_ESCAPE.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+@lru_cache(maxsize=256)
+def _zone_name(tzid):
+    """שם אזור zoneinfo ל-TZID מהקובץ, או None אם אינו מוכר"""
+    # למשל /mozilla.org/20050126_1/Asia/Jerusalem
+    for name in (tzid, "/".join(tzid.split("/")[-2:])):
+        try:
+            ZoneInfo(name)
+            return name
+        except (ZoneInfoNotFoundError, ValueError):
+            continue
+    return None
+
+
+@lru_cache(maxsize=16)
+def _zone_table(name):
+    return TimezoneTable(name)
+
+
+def _zone(tzid):
+    """
+    TimezoneTable ל-TZID; לא מוכר - שעון ישראל (כמו זמן צף). שני המטמונים
+    חסומים: קובץ עם אלפי TZID שונים לא מגדיל את הזיכרון של ה-worker.
+    """
+    name = _zone_name(tzid)
+    if name is None or name == LOCAL_TZ_NAME:
+        return LOCAL
+    return _zone_table(name)
+
+
+def _utc_value(value, parameters):
+    """ערך DTSTART/DTEND → 20240101T120000Z, או None אם אינו מובן"""
+    value = value.strip().upper()
+    if len(value) == 16 and value.endswith("Z"):
+        return value
+    try:
+        if len(value) == 15:
+            local = timegm(time.strptime(value, "%Y%m%dT%H%M%S"))
+        elif len(value) == 8:
+            # אירוע יום שלם: חצות בזמן המקומי
+            local = timegm(time.strptime(value, "%Y%m%d"))
+        else:
+            return None
+    except ValueError:
+        return None
+    tzid = parameters.get("TZID")
+    table = LOCAL if tzid is None else _zone(tzid)
+    return format_seconds(table.local_seconds_to_utc(local), UTC_FORMAT)
+
+
+def _read_property(event, line):
+    name, parameters, value = _split_property(line)
+    if name == "DTSTART":
+        event.start = _utc_value(value, parameters)
+    elif name == "DTEND":
+        event.end = _utc_value(value, parameters)
+    elif name == "SUMMARY":
+        event.summary = _unescape(value)
+    elif name == "UID":
+        event.uid = value.strip()
+
+
+def iter_calendar_items(lines):
+    """
+    (kind, value) לכל פריט ביומן, לפי הסדר:
+    ("property", שורה) - מאפיין של הלוח עצמו,
+    ("component", [שורות]) - רכיב שאינו VEVENT (VTIMEZONE, VTODO...),
+    ("event", UploadedEvent) - כל VEVENT.
+    כמה VCALENDAR ברצף נקראים כלוח אחד; רכיב שלא נסגר עד סוף הקובץ נזרק.
+    """
+    component = None
+    event = None
+    depth = 0
+    for line in iter_unfolded(lines):
+        if component is None:
+            if line.startswith("BEGIN:"):
+                if line[6:].upper() == "VCALENDAR":
+                    continue
+                component = [line]
+                depth = 1
+                event = UploadedEvent() if line[6:].upper() == "VEVENT" else None
+            elif not line.startswith("END:"):
+                # END:VCALENDAR - גם כשאחריו BEGIN:VCALENDAR באותה שורה (כך כתבה ספריית ics)
+                yield "property", line
+            continue
+        component.append(line)
+        if line.startswith("BEGIN:"):
+            depth += 1
+        elif line.startswith("END:"):
+            depth -= 1
+            if depth == 0:
+                if event is not None:
+                    event.lines = component
+                    yield "event", event
+                else:
+                    yield "component", component
+                component = event = None
+        elif event is not None and depth == 1 and line.upper().startswith(_EVENT_PROPERTIES):
+            # מאפיינים של VALARM שבתוך האירוע (depth > 1) לא נוגעים לו
+            _read_property(event, line)
+
+
+def iter_events(lines):
+    """רק אירועי ה-VEVENT של היומן"""
+    for kind, value in iter_calendar_items(lines):
+        if kind == "event":
+            yield value
+
+
+def iter_merged_calendar(items, lines):
+    """
+    VCALENDAR ממוזג: היומן שהועלה (lines) כמו שהוא, ואחריו אירועי הלו"ז
+    (items - זוגות (uid, fields) כמו ב-ics_writer) שאין בקובץ אירוע עם אותם
+    התחלה, סיום וכותרת. אירוע בקובץ עם UID של אירוע מהלו"ז (ייצוא קודם של
+    האפליקציה) מוחלף בגרסה מהלו"ז.
+    """
+    roster = list(items)
+    keys = {(fields[0], fields[1], fields[2]) for _, fields in roster}
+    uids = {uid for uid, _ in roster}
+    found = set()
+    in_header = True
+    yield from calendar_header()
+    for kind, value in iter_calendar_items(lines):
+        if kind == "property":
+            # מאפייני לוח חוקיים רק לפני הרכיב הראשון
+            name = value.split(":", 1)[0].split(";", 1)[0].upper()
+            if in_header and name not in _HEADER_PROPERTIES:
+                yield fold_line(value)
+            continue
+        in_header = False
+        if kind == "event":
+            if value.uid in uids:
+                continue
+            key = value.key
+            if key in keys:
+                found.add(key)
+            value = value.lines
+        for line in value:
+            yield fold_line(line)
+    dtstamp = format_utc(datetime.now(timezone.utc))
+    for uid, fields in roster:
+        if (fields[0], fields[1], fields[2]) not in found:
+            yield from iter_vevent(uid, fields, dtstamp)
+    yield "END:VCALENDAR" + CRLF
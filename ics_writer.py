@@ -0,0 +1,311 @@
+"""
+כותב iCalendar (RFC 5545) קליל שעובד ישירות על מילוני האירועים
+ש-parse_schedule מחזירה, בלי לבנות גרף אובייקטים של ספריית ics.
+
+iter_calendar מחזירה generator של שורות מוכנות (כולל CRLF), כך שאפשר
+להזרים אותן ישירות ל-Response של Flask או לחבר למחרוזת אחת.
+עבור EventBatch השדות נכתבים ישירות מהעמודות, בלי לבנות מילון לכל אירוע.
+
+iter_recurring_calendar היא מצב פלט מכווץ: משמרות שחוזרות באותו יום
+בשבוע, באותה שעה ובאותו משך נכתבות כ-VEVENT אחד עם RRULE שבועי, ושבועות
+חסרים באמצע הסדרה כ-EXDATE - הלוח נפרש בדיוק לאותם מופעים.
+"""
+from calendar import timegm
+from datetime import datetime, timezone
+import hashlib
+import time
+
+from events import EventBatch, format_seconds
+from timezones import LOCAL
+
+PRODID = "-//calander-app//Schedule Parser//HE"
+CRLF = "\r\n"
+# אורך שורה מקסימלי באוקטטים לפני קיפול (RFC 5545 3.1)
+MAX_LINE_OCTETS = 75
+UTC_FORMAT = "%Y%m%dT%H%M%SZ"
+_WEEK_SECONDS = 7 * 24 * 3600
+# פער מקסימלי בין מופעים באותה סדרה; שבועות חסרים בתוכו נכתבים כ-EXDATE
+MAX_SERIES_GAP_WEEKS = 4
+
+_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    ";": "\\;",
+    ",": "\\,",
+    "\n": "\\n",
+    "\r": "",
+})
+
+
+def escape_text(value):
+    """בריחה של ערך TEXT: \\ ; , ושורות חדשות"""
+    return value.translate(_ESCAPES)
+
+
+def fold_line(line):
+    """
+    מקפלת שורת תוכן ל-75 אוקטטים לכל היותר, בלי לחתוך תו UTF-8 באמצע.
+    שורות המשך מתחילות ברווח. מחזירה את השורה עם CRLF בסופה.
+    """
+    # מסלול מהיר: גם אם כל תו תופס 4 בתים השורה קצרה מספיק
+    if len(line) * 4 <= MAX_LINE_OCTETS or len(line.encode("utf-8")) <= MAX_LINE_OCTETS:
+        return line + CRLF
+
+    parts = []
+    start = 0
+    size = 0
+    limit = MAX_LINE_OCTETS
+    for pos, ch in enumerate(line):
+        width = len(ch.encode("utf-8"))
+        if size + width > limit:
+            parts.append(line[start:pos])
+            start = pos
+            size = 0
+            # שורת המשך מתחילה ברווח שתופס אוקטט אחד
+            limit = MAX_LINE_OCTETS - 1
+        size += width
+    parts.append(line[start:])
+    return (CRLF + " ").join(parts) + CRLF
+
+
+def format_utc(dt):
+    """datetime מודע-אזור-זמן → 20240101T120000Z"""
+    return dt.astimezone(timezone.utc).strftime(UTC_FORMAT)
+
+
+def _uid(local_day, summary, description, occurrence):
+    digest = hashlib.sha256(
+        "\x1f".join((local_day, summary, description, str(occurrence))).encode("utf-8")
+    ).hexdigest()
+    return f"{digest[:32]}@calander-app"
+
+
+def event_uid(event, occurrence=0):
+    """
+    UID יציב לאירוע: נגזר מהתאריך המקומי, מהכותרת ומהשורה המקורית, כך
+    ששליחה חוזרת של אותו לו"ז מעדכנת את האירועים ביומן במקום לשכפל אותם.
+    occurrence מבדיל בין שורות זהות באותו יום.
+    """
+    return _uid(*_uid_key(event), occurrence)
+
+
+def _uid_key(event):
+    # בדיוק מה שנכנס ל-hash של ה-UID (בלי occurrence)
+    return (
+        LOCAL.to_local(event["start"]).date().isoformat(),
+        event.get("title", event["description"]),
+        event["description"],
+    )
+
+
+def with_uids(events):
+    """generator שמוסיף UID יציב לכל אירוע שאין לו (משנה את המילון במקום)"""
+    seen = {}
+    for event in events:
+        if not event.get("uid"):
+            # המונה לפי אותו מפתח כמו ה-hash: שתי משמרות זהות באותו יום
+            # (בשעות שונות) מקבלות occurrence שונה ולכן UID שונה
+            key = _uid_key(event)
+            occurrence = seen.get(key, 0)
+            seen[key] = occurrence + 1
+            event["uid"] = _uid(*key, occurrence)
+        yield event
+
+
+def event_fields(event):
+    """(DTSTART, DTEND, SUMMARY, DESCRIPTION) כפי שייכתבו לקובץ"""
+    return (
+        format_utc(event["start"]),
+        format_utc(event["end"]),
+        # משתמשים בכותרת אם קיימת, אחרת בתיאור המלא
+        event.get("title", event["description"]),
+        event["description"],
+    )
+
+
+def iter_vevent(uid, fields, dtstamp, extra=()):
+    """שורות VEVENT משדות מוכנים (ראו event_fields); extra - שורות נוספות"""
+    dtstart, dtend, summary, description = fields
+    yield "BEGIN:VEVENT" + CRLF
+    yield fold_line("UID:" + uid)
+    yield "DTSTAMP:" + dtstamp + CRLF
+    yield "DTSTART:" + dtstart + CRLF
+    yield "DTEND:" + dtend + CRLF
+    yield fold_line("SUMMARY:" + escape_text(summary))
+    yield fold_line("DESCRIPTION:" + escape_text(description))
+    for line in extra:
+        yield fold_line(line)
+    yield "END:VEVENT" + CRLF
+
+
+def iter_event(event, dtstamp):
+    """שורות VEVENT אחד מתוך מילון אירוע"""
+    yield from iter_vevent(event.get("uid") or event_uid(event), event_fields(event), dtstamp)
+
+
+def _iter_batch_fields(batch):
+    # אותו UID כמו with_uids/event_uid, מחושב מהעמודות; נשמר באצווה
+    seen = {}
+    starts, ends, local_starts = batch.starts, batch.ends, batch.local_starts
+    descriptions, uids = batch.descriptions, batch.uids
+    for i in range(len(batch)):
+        description = descriptions[i]
+        summary = batch.summary(i)
+        uid = uids[i]
+        if uid is None:
+            key = (format_seconds(local_starts[i], "%Y-%m-%d"), summary, description)
+            occurrence = seen.get(key, 0)
+            seen[key] = occurrence + 1
+            uid = uids[i] = _uid(*key, occurrence)
+        yield uid, (
+            format_seconds(starts[i], UTC_FORMAT),
+            format_seconds(ends[i], UTC_FORMAT),
+            summary,
+            description,
+        )
+
+
+def iter_uid_fields(events):
+    """(uid, event_fields) לכל אירוע - מ-EventBatch או מרשימת מילונים"""
+    if isinstance(events, EventBatch):
+        return _iter_batch_fields(events)
+    return ((event["uid"], event_fields(event)) for event in with_uids(events))
+
+
+def iter_events(events, dtstamp):
+    """שורות ה-VEVENT של כל האירועים, בלי עטיפת VCALENDAR"""
+    for uid, fields in iter_uid_fields(events):
+        yield from iter_vevent(uid, fields, dtstamp)
+
+
+def calendar_header(method=None):
+    yield "BEGIN:VCALENDAR" + CRLF
+    yield "VERSION:2.0" + CRLF
+    yield "PRODID:" + PRODID + CRLF
+    if method:
+        yield "METHOD:" + method + CRLF
+
+
+def iter_calendar(events):
+    """generator של כל שורות ה-VCALENDAR עבור רשימת אירועים"""
+    dtstamp = format_utc(datetime.now(timezone.utc))
+    yield from calendar_header()
+    yield from iter_events(events, dtstamp)
+    yield "END:VCALENDAR" + CRLF
+
+
+def calendar_text(events):
+    """כל הלוח כמחרוזת אחת"""
+    return "".join(iter_calendar(events))
+
+
+def calendar_index(events):
+    """{uid: event_fields} - תמונת מצב של הלוח להשוואה מול שליחה הבאה"""
+    return {uid: list(fields) for uid, fields in iter_uid_fields(events)}
+
+
+def diff_index(previous, current):
+    """(שונו/נוספו, הוסרו) בין שתי תמונות מצב, כרשימות של (uid, fields)"""
+    changed = [(uid, fields) for uid, fields in current.items() if previous.get(uid) != fields]
+    removed = [(uid, fields) for uid, fields in previous.items() if uid not in current]
+    return changed, removed
+
+
+def iter_delta_calendar(changed, removed):
+    """
+    לוח שינויים בלבד: VCALENDAR עם METHOD:PUBLISH לאירועים שנוספו/שונו,
+    ואחריו VCALENDAR עם METHOD:CANCEL לאירועים שהוסרו (RFC 5545 מתיר
+    כמה אובייקטי iCalendar באותו קובץ).
+    """
+    dtstamp = format_utc(datetime.now(timezone.utc))
+    if changed or not removed:
+        yield from calendar_header("PUBLISH")
+        for uid, fields in changed:
+            yield from iter_vevent(uid, fields, dtstamp)
+        yield "END:VCALENDAR" + CRLF
+    if removed:
+        yield from calendar_header("CANCEL")
+        for uid, fields in removed:
+            yield from iter_vevent(uid, fields, dtstamp, ("STATUS:CANCELLED", "SEQUENCE:1"))
+        yield "END:VCALENDAR" + CRLF
+
+
+def _utc_seconds(value):
+    return timegm(time.strptime(value, UTC_FORMAT))
+
+
+def _iter_series(items):
+    """
+    (uid, fields, extra) לכל VEVENT בפלט המכווץ, לפי סדר המופע הראשון.
+    הקיבוץ הוא לפי שעת ההתחלה בשבוע ומשך האירוע ב-UTC (אחרי מעבר שעון
+    הזמנים ב-UTC זזים, ולכן הסדרה נחתכת שם), ולפי הכותרת והתיאור.
+    """
+    groups = {}
+    for uid, fields in items:
+        start = _utc_seconds(fields[0])
+        key = (start % _WEEK_SECONDS, _utc_seconds(fields[1]) - start, fields[2], fields[3])
+        groups.setdefault(key, []).append((start, uid, fields))
+
+    entries = []
+    for occurrences in groups.values():
+        occurrences.sort(key=lambda occurrence: occurrence[0])
+        run = []
+        for occurrence in occurrences:
+            if run and occurrence[0] == run[-1][0]:
+                # שורה זהה באותו זמן - RRULE לא מבטא כפילות, נשאר אירוע נפרד
+                entries.append(occurrence + ((),))
+                continue
+            if run and occurrence[0] - run[-1][0] > MAX_SERIES_GAP_WEEKS * _WEEK_SECONDS:
+                entries.append(_series_entry(run))
+                run = []
+            run.append(occurrence)
+        entries.append(_series_entry(run))
+    entries.sort(key=lambda entry: entry[0])
+    for _, uid, fields, extra in entries:
+        yield uid, fields, extra
+
+
+def _series_entry(run):
+    # סדרה של מופע יחיד נכתבת כאירוע רגיל
+    first, uid, fields = run[0]
+    if len(run) == 1:
+        return first, uid, fields, ()
+    last = run[-1][0]
+    present = {occurrence[0] for occurrence in run}
+    missing = [
+        format_seconds(moment, UTC_FORMAT)
+        for moment in range(first, last, _WEEK_SECONDS)
+        if moment not in present
+    ]
+    extra = ["RRULE:FREQ=WEEKLY;UNTIL=" + format_seconds(last, UTC_FORMAT)]
+    if missing:
+        extra.append("EXDATE:" + ",".join(missing))
+    return first, uid, fields, extra
+
+
+def iter_recurring_events(items, dtstamp):
+    """שורות ה-VEVENT במצב המכווץ; items - זוגות (uid, fields) כמו iter_uid_fields"""
+    for uid, fields, extra in _iter_series(items):
+        yield from iter_vevent(uid, fields, dtstamp, extra)
+
+
+def calendar_dtstamp(ics):
+    """ה-DTSTAMP של האירוע הראשון בקובץ ICS מוכן (bytes), או None"""
+    at = ics.find(b"\nDTSTAMP:")
+    if at < 0:
+        return None
+    return ics[at + 9:at + 25].decode("ascii")
+
+
+def iter_recurring_calendar(items, dtstamp=None):
+    """
+    VCALENDAR מכווץ (RRULE/EXDATE) מזוגות (uid, fields), למשל calendar_index(...).items().
+    dtstamp קבוע (למשל calendar_dtstamp של הלוח המלא) נותן אותם בתים לאותו קלט.
+    """
+    dtstamp = dtstamp or format_utc(datetime.now(timezone.utc))
+    yield from calendar_header()
+    yield from iter_recurring_events(items, dtstamp)
+    yield "END:VCALENDAR" + CRLF
+
+
+def recurring_calendar_text(items, dtstamp=None):
+    return "".join(iter_recurring_calendar(items, dtstamp))
@@ -0,0 +1,89 @@
+"""
+אינדקס קטעי זמן לאירועים שפוענחו.
+
+הקטעים ממוינים לפי זמן התחלה ונשמרים כעץ חיפוש מרומז (אמצע כל טווח הוא
+שורש תת-העץ) עם זמן הסיום המקסימלי בכל תת-עץ, כך ששאילתת "מי במשמרת
+בזמן T" או "אילו משמרות חופפות לטווח" עוברת רק על הענפים הרלוונטיים
+(O(log n + k)) במקום על כל האירועים.
+
+conflicts מוצאת את כל זוגות החפיפות במעבר יחיד על הקטעים הממוינים עם
+ערימה של זמני הסיום הפעילים - O(n log n + k).
+"""
+from bisect import bisect_left, bisect_right
+import heapq
+
+
+class IntervalIndex:
+    """אינדקס סטטי של קטעים חצי-פתוחים [start, end) עם ערך לכל קטע"""
+
+    def __init__(self, items):
+        ordered = sorted(items, key=lambda item: (item[0], item[1]))
+        self._starts = [item[0] for item in ordered]
+        self._ends = [item[1] for item in ordered]
+        self._values = [item[2] for item in ordered]
+        self._max_end = list(self._ends)
+        if ordered:
+            self._build(0, len(ordered))
+
+    @classmethod
+    def from_events(cls, events):
+        """אינדקס על מילוני אירועים של parse_schedule (הערך - המילון עצמו)"""
+        return cls((event["start"], event["end"], event) for event in events)
+
+    def _build(self, lo, hi):
+        # זמן הסיום המקסימלי בתת-העץ ששורשו באמצע [lo, hi)
+        mid = (lo + hi) // 2
+        best = self._ends[mid]
+        if lo < mid:
+            best = max(best, self._build(lo, mid))
+        if mid + 1 < hi:
+            best = max(best, self._build(mid + 1, hi))
+        self._max_end[mid] = best
+        return best
+
+    def __len__(self):
+        return len(self._values)
+
+    def _search(self, begin, limit):
+        """אינדקסים של קטעים שמתחילים לפני limit (במיקום) ומסתיימים אחרי begin"""
+        found = []
+        stack = [(0, len(self._values))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi or lo >= limit:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= begin:
+                # אף קטע בתת-העץ לא מגיע עד begin
+                continue
+            stack.append((lo, mid))
+            if mid < limit:
+                if self._ends[mid] > begin:
+                    found.append(mid)
+                stack.append((mid + 1, hi))
+        found.sort()
+        return found
+
+    def at(self, moment):
+        """הערכים של הקטעים שמכסים את moment (start <= moment < end)"""
+        limit = bisect_right(self._starts, moment)
+        return [self._values[i] for i in self._search(moment, limit)]
+
+    def overlapping(self, begin, end):
+        """הערכים של הקטעים שחופפים לטווח [begin, end)"""
+        if end <= begin:
+            return self.at(begin)
+        limit = bisect_left(self._starts, end)
+        return [self._values[i] for i in self._search(begin, limit)]
+
+    def conflicts(self):
+        """רשימת זוגות (מוקדם, מאוחר) של ערכים שהקטעים שלהם חופפים"""
+        pairs = []
+        active = []  # ערימה של (end, position)
+        for position, start in enumerate(self._starts):
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            for _, other in active:
+                pairs.append((self._values[other], self._values[position]))
+            heapq.heappush(active, (self._ends[position], position))
+        return pairs
@@ -0,0 +1,279 @@
+"""
+שליחת קובץ ה-ICS במייל דרך SendGrid, ברקע.
+
+הבקשה ל-/ רק מכניסה משימה לתור וחוזרת מיד; worker threads שולחים את
+המיילים עם requests.Session משותף (חיבורי HTTPS נשמרים ב-pool), עם
+ניסיונות חוזרים ו-backoff אקספוננציאלי. משימות שממתינות בתור עם אותו
+תוכן (אותו קובץ, נושא וגוף) מאוחדות לבקשה אחת עם כמה personalizations,
+עד MAX_PERSONALIZATIONS לבקשה כפי ש-SendGrid מאפשר.
+
+כל אחד יכול להקליד כתובת בטופס, ולכן השליחה מוגבלת במכסות (MailQuota):
+מספר מיילים ליום לכל נמען, ותקרה יומית לכל המיילים. המכסות נשמרות ב-SQLite
+משותף, כך שהן תקפות לכל ה-workers יחד. מייל מעבר למכסה לא נכנס לתור.
+
+ההגדרות נקראות מהסביבה (from_env): SENDGRID_API_KEY, MAIL_FROM,
+SENDGRID_API_URL (למשל שרת בדיקה מקומי), MAIL_WORKERS, MAIL_DB_PATH,
+MAIL_PER_RECIPIENT_DAILY, MAIL_DAILY_CAP.
+"""
+import base64
+from datetime import datetime, timezone
+import hashlib
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SENDGRID_API_URL = "https://api.sendgrid.com/v3/mail/send"
+# מגבלת SendGrid למספר personalizations בבקשה אחת
+MAX_PERSONALIZATIONS = 1000
+_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+_QUOTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mail_quota (
+    day       TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    count     INTEGER NOT NULL,
+    PRIMARY KEY (day, recipient)
+)
+"""
+
+
+class MailQuota:
+    """
+    מכסות שליחה יומיות (לפי תאריך UTC) ב-SQLite: per_recipient מיילים לכל נמען
+    ו-daily מיילים בסך הכל. חיבור נפרד לכל thread, כמו ב-FeedStore.
+    הנמען נשמר כ-hash בלבד - אין כתובות מייל במאגר.
+    """
+
+    def __init__(self, path, per_recipient=3, daily=100):
+        self.path = path
+        self.per_recipient = per_recipient
+        self.daily = daily
+        self._local = threading.local()
+        # חיבור זמני בלבד - לא עובר בירושה ל-workers אחרי fork (preload)
+        conn = sqlite3.connect(path, timeout=10)
+        try:
+            with conn:
+                conn.execute(_QUOTA_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # בלי טרנזקציות אוטומטיות - acquire פותחת BEGIN IMMEDIATE בעצמה
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, recipient):
+        """None אם מותר לשלוח (והשליחה נספרה), אחרת "recipient" או "daily" - איזו מכסה מלאה"""
+        day = datetime.now(timezone.utc).date().isoformat()
+        key = hashlib.sha256(recipient.strip().lower().encode("utf-8")).hexdigest()
+        conn = self._connect()
+        # נעילת כתיבה מראש: בדיקה והגדלה אטומיות גם בין workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM mail_quota WHERE day = ?", (day,)
+            ).fetchone()[0]
+            if total == 0:
+                # ראשון היום - הימים הקודמים כבר לא נחוצים
+                conn.execute("DELETE FROM mail_quota WHERE day != ?", (day,))
+            row = conn.execute(
+                "SELECT count FROM mail_quota WHERE day = ? AND recipient = ?", (day, key)
+            ).fetchone()
+            sent = row[0] if row else 0
+            if sent >= self.per_recipient:
+                refused = "recipient"
+            elif total >= self.daily:
+                refused = "daily"
+            else:
+                refused = None
+                conn.execute(
+                    "INSERT INTO mail_quota (day, recipient, count) VALUES (?, ?, 1) "
+                    "ON CONFLICT(day, recipient) DO UPDATE SET count = count + 1",
+                    (day, key),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return refused
+
+
+class MailJob:
+    __slots__ = ("recipient", "subject", "body", "attachment", "filename", "key")
+
+    def __init__(self, recipient, subject, body, attachment, filename="schedule.ics"):
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+        self.attachment = attachment
+        self.filename = filename
+        # משימות עם אותו key נשלחות יחד בבקשה אחת
+        digest = hashlib.sha256(attachment)
+        digest.update(subject.encode("utf-8"))
+        digest.update(body.encode("utf-8"))
+        digest.update(filename.encode("utf-8"))
+        self.key = digest.hexdigest()
+
+
+class MailQueue:
+    def __init__(self, api_key, sender, api_url=SENDGRID_API_URL, workers=2,
+                 max_retries=4, backoff=0.5, timeout=10, batch_size=MAX_PERSONALIZATIONS,
+                 max_queue=1000, quota=None):
+        self.api_key = api_key
+        self.sender = sender
+        self.api_url = api_url
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = min(batch_size, MAX_PERSONALIZATIONS)
+        # MailQuota (או None - בלי הגבלה, למשל בבדיקות)
+        self.quota = quota
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._session = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "requests": 0, "retries": 0, "dropped": 0, "limited": 0}
+
+    @classmethod
+    def from_env(cls):
+        """MailQueue לפי משתני הסביבה, או None אם המייל לא מוגדר"""
+        api_key = os.environ.get("SENDGRID_API_KEY")
+        sender = os.environ.get("MAIL_FROM")
+        if not api_key or not sender:
+            return None
+        return cls(
+            api_key,
+            sender,
+            api_url=os.environ.get("SENDGRID_API_URL", SENDGRID_API_URL),
+            workers=int(os.environ.get("MAIL_WORKERS", 2)),
+            quota=MailQuota(
+                os.environ.get("MAIL_DB_PATH", "mail.db"),
+                per_recipient=int(os.environ.get("MAIL_PER_RECIPIENT_DAILY", 3)),
+                daily=int(os.environ.get("MAIL_DAILY_CAP", 100)),
+            ),
+        )
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _ensure_started(self):
+        # ה-threads נוצרים בשליחה הראשונה ולא בטעינת המודול, כך שזה בטוח
+        # גם עם gunicorn --preload (threads לא עוברים fork)
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.headers.update({
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            })
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"mailer-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def send(self, recipient, subject, body, attachment, filename="schedule.ics"):
+        """מכניסה מייל לתור בלי לחכות לשליחה. מחזירה False אם התור מלא או שהמכסה נוצלה"""
+        if self.quota is not None:
+            refused = self.quota.acquire(recipient)
+            if refused is not None:
+                self._count("limited")
+                logger.warning("mail quota (%s) reached, not sending", refused)
+                return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(MailJob(recipient, subject, body, attachment, filename))
+        except queue.Full:
+            self._count("dropped")
+            logger.warning("mail queue full, dropping message to %s", recipient)
+            return False
+        self._count("queued")
+        return True
+
+    def join(self):
+        """ממתינה עד שכל המשימות בתור טופלו (לבדיקות ולכיבוי מסודר)"""
+        self._queue.join()
+
+    def _worker(self):
+        while True:
+            first = self._queue.get()
+            jobs = [first]
+            # מאחדים משימות שכבר ממתינות בתור - בלי לחכות לחדשות
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                groups = {}
+                for job in jobs:
+                    groups.setdefault(job.key, []).append(job)
+                for group in groups.values():
+                    self._deliver(group)
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+
+    def _payload(self, jobs):
+        job = jobs[0]
+        return {
+            # personalization נפרד לכל נמען - הנמענים לא רואים זה את זה
+            "personalizations": [{"to": [{"email": j.recipient}]} for j in jobs],
+            "from": {"email": self.sender},
+            "subject": job.subject,
+            "content": [{"type": "text/plain", "value": job.body}],
+            "attachments": [{
+                "content": base64.b64encode(job.attachment).decode("ascii"),
+                "type": "text/calendar",
+                "filename": job.filename,
+                "disposition": "attachment",
+            }],
+        }
+
+    def _deliver(self, jobs):
+        payload = self._payload(jobs)
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+            try:
+                self._count("requests")
+                response = self._session.post(self.api_url, json=payload, timeout=self.timeout)
+            except Exception as e:
+                logger.warning("mail send failed (attempt %d): %s", attempt + 1, e)
+            else:
+                if response.status_code < 300:
+                    self._count("sent", len(jobs))
+                    return True
+                if response.status_code not in _RETRY_STATUSES:
+                    logger.error("mail rejected %s: %s", response.status_code, response.text[:200])
+                    break
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            if attempt < self.max_retries:
+                self._count("retries")
+                time.sleep(delay)
+        self._count("failed", len(jobs))
+        return False
@@ -0,0 +1,300 @@
+"""
+מדידת זמנים ומדדים בפורמט Prometheus.
+
+- RequestTimer: זמנים לפי שלב (פענוח הטופס, סיווג שורות, הסקת תאריכים,
+  המרת אזור זמן, בניית הלוח, סריאליזציה) לבקשה אחת. הטיימר הפעיל נשמר
+  ב-thread-local, כך שגם הפרסר יכול להוסיף לו שלבים בלי לשנות חתימות.
+  server_timing() מחזירה את הערך לכותרת Server-Timing.
+- Counter / Histogram / Registry: מונים והיסטוגרמות עם labels, ו-collectors
+  שמוסיפים בזמן הקריאה מדדים קיימים (מטמון, פרסר, מייל). render() מחזירה
+  את פורמט הטקסט של Prometheus. המדדים הם לכל תהליך (worker) בנפרד.
+- SlowRequestSampler: פרופיילר דוגם אופציונלי - thread שדוגם את המחסנית
+  של כל בקשה פעילה (sys._current_frames) ושומר את הדגימות רק לבקשות
+  שנמשכו יותר מהסף, בפורמט folded stacks (מתאים ל-flamegraph).
+"""
+from collections import Counter as _StackCounter
+from contextlib import contextmanager
+from time import perf_counter
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# גבולות הדליים בשניות - מ-0.5ms ועד 5 שניות
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_local = threading.local()
+
+
+class RequestTimer:
+    """זמן מצטבר לכל שלב בבקשה אחת (שלב שנמדד כמה פעמים מצטבר)"""
+
+    __slots__ = ("stages", "started")
+
+    def __init__(self):
+        self.stages = {}
+        self.started = perf_counter()
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - started)
+
+    def elapsed(self):
+        return perf_counter() - self.started
+
+    def server_timing(self):
+        """decode;dur=0.120, classify;dur=1.300, ..., total;dur=4.000 (במילישניות)"""
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.3f}")
+        return ", ".join(parts)
+
+
+class _NullTimer:
+    """טיימר שלא שומר כלום - כשאין בקשה פעילה (למשל convert.py)"""
+
+    __slots__ = ()
+
+    def add(self, stage, seconds):
+        pass
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def start_timer():
+    """יוצרת טיימר לבקשה הנוכחית ב-thread הזה"""
+    timer = _local.timer = RequestTimer()
+    return timer
+
+
+def stop_timer():
+    _local.timer = None
+
+
+def current_timer():
+    """הטיימר של הבקשה הנוכחית, או טיימר ריק"""
+    return getattr(_local, "timer", None) or _NULL_TIMER
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, total in items:
+            yield f"{self.name}{_format_labels(self.labels, values)} {total}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # לכל צירוף labels: [מונה לכל דלי..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((values, list(series)) for values, series in self._values.items())
+        names = self.labels + ("le",)
+        for values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, values + (repr(bound),))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(names, values + ('+Inf',))} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {series[-1]}"
+
+
+class Registry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(self.prefix + name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self.prefix + name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """
+        רושמת פונקציה שמחזירה בזמן הקריאה רשימה של
+        (name, type, help, [(labels dict, value), ...]) - למדדים שנשמרים במקום אחר
+        """
+        self._collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for func in self._collectors:
+            try:
+                families = func()
+            except Exception:
+                logger.exception("metrics collector failed")
+                continue
+            for name, kind, help, samples in families:
+                name = self.prefix + name
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class SlowRequestSampler:
+    """
+    דוגם את המחסנית של בקשות פעילות כל interval שניות. בקשה שנמשכה
+    threshold שניות או יותר נרשמת ללוג (המחסניות הנפוצות) ואם הוגדרה
+    output_dir גם לקובץ .folded. ה-thread מופעל רק בבקשה הראשונה.
+    """
+
+    def __init__(self, threshold, interval=0.005, output_dir=None, top=5):
+        self.threshold = threshold
+        self.interval = interval
+        self.output_dir = output_dir
+        self.top = top
+        self._active = {}  # thread ident -> (label, started, Counter של מחסניות)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        """SlowRequestSampler לפי SLOW_REQUEST_MS, או None אם לא הוגדר"""
+        threshold_ms = os.environ.get("SLOW_REQUEST_MS")
+        if not threshold_ms:
+            return None
+        return cls(
+            float(threshold_ms) / 1000,
+            interval=float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000,
+            output_dir=os.environ.get("PROFILE_DIR"),
+        )
+
+    def _ensure_started(self):
+        # כמו ב-MailQueue: ה-thread נוצר בשימוש הראשון, לא לפני fork
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-request-sampler", daemon=True)
+                self._thread.start()
+
+    def begin(self, label):
+        self._ensure_started()
+        with self._lock:
+            self._active[threading.get_ident()] = (label, time.monotonic(), _StackCounter())
+        self._wakeup.set()
+
+    def end(self):
+        """מסיימת את הדגימה של הבקשה הנוכחית; מחזירה את המחסניות אם הייתה איטית"""
+        with self._lock:
+            entry = self._active.pop(threading.get_ident(), None)
+            if not self._active:
+                self._wakeup.clear()
+        if entry is None:
+            return None
+        label, started, stacks = entry
+        duration = time.monotonic() - started
+        if duration < self.threshold or not stacks:
+            return None
+        self._report(label, duration, stacks)
+        return stacks
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, (_, _, stacks) in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != me:
+                        stacks[_fold(frame)] += 1
+
+    def _report(self, label, duration, stacks):
+        total = sum(stacks.values())
+        logger.warning(
+            "slow request %s: %.0fms, %d samples; top stacks:\n%s",
+            label,
+            duration * 1000,
+            total,
+            "\n".join(f"{count:5d} {stack}" for stack, count in stacks.most_common(self.top)),
+        )
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            name = f"slow-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{threading.get_ident()}.folded"
+            with open(os.path.join(self.output_dir, name), "w", encoding="utf-8") as f:
+                for stack, count in stacks.items():
+                    f.write(f"{stack} {count}\n")
+
+
+def _fold(frame):
+    """מחסנית כשורה אחת בסגנון folded: file:function;file:function;..."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
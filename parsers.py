@@ -0,0 +1,607 @@
+"""
+מנוע הפענוח של הלו"ז.
+
+הודעות מיחידות שונות מגיעות בכמה צורות, ולכל צורה יש פרסר משלו עם
+ביטויים רגולריים שמקומפלים פעם אחת בטעינת המודול:
+
+- day_blocks: שורת יום ("ראשון 23.03") ואחריה שורות משמרת ("קשה 22-2")
+- sentences:  משפט אחד לכל אירוע ("יום ראשון 23.03, נתחיל ב08:00, נסיים ב16:00")
+- loose:      תאריך בכל צורה ("*23.03", "ב-23/03/27") ואחריו "HH-HH תיאור"
+
+במקום להעביר כל שורה דרך כל התבניות, המנוע מסתכל על השורות הראשונות
+בלבד (sniff זול לפי תחילית/מאפיין), בוחר פרסר אחד ומעביר אליו את כל
+הקלט בצורה זורמת. מספר ההפניות לכל פורמט וזמן ה-sniff נספרים ב-dispatch_stats.
+
+הפרסרים מחזירים שורות אירוע בחשבון שלמים (ראו _make_row); parse_schedule
+אוספת אותן ל-EventBatch עמודתית, ו-iter_schedule הופכת כל אחת למילון.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from itertools import chain
+from time import perf_counter
+import re
+import threading
+
+from events import EventBatch, row_event
+from metrics import current_timer
+from timezones import EPOCH_ORDINAL
+from vocabulary import (  # noqa: F401 - השמות הציבוריים הקודמים של המודול
+    DAY_KEYWORD,
+    DEFAULT_VOCABULARY,
+    INSTRUCTIONS_KEYWORDS,
+    NIGHT_KEYWORD,
+    ROLES,
+    SPECIAL_EVENTS,
+    STANDBY_KEYWORD,
+    KeywordMatcher,
+)
+
+def _parse_hour_minute(hhmm):
+    """
+    פונקציית עזר שמקבלת מחרוזת '22' או '22:30'
+    ומחזירה (22, 30). אם אין דקות מצוינות, מניחים 00.
+    """
+    parts = hhmm.split(":")
+    if len(parts) == 1:
+        hour = int(parts[0])
+        minute = 0
+    else:
+        hour = int(parts[0])
+        minute = int(parts[1])
+    return hour, minute
+
+# ---------------------------------------------------------------------------
+# מסווג שורות - נבנה פעם אחת בטעינת המודול ומשותף לכל הבקשות ב-worker
+# ---------------------------------------------------------------------------
+
+# סוגי שורות אפשריים
+LINE_EMPTY = "empty"
+LINE_INSTRUCTIONS = "instructions"
+LINE_WEEK = "week"
+LINE_DATE = "date"
+LINE_STANDBY = "standby"
+LINE_SHIFT = "shift"
+LINE_DAY_NIGHT = "day_night"
+LINE_TEXT = "text"
+
+# אוצר המילים (תפקידים, אירועים מיוחדים, כוננות, יום/לילה) וחלונות הזמן
+# מגיעים מפרופיל מקומפל - ראו vocabulary.py; ברירת המחדל היא DEFAULT_VOCABULARY
+
+# כותרת שבוע ושורת תאריך בביטוי אחד; שבוע נבדק קודם, כמו בגרסה הקודמת.
+# לדוגמה: 🌟שבוע 13 (23-29/3) או "ראשון 23.03"
+_HEADER_PATTERN = re.compile(
+    r"^(?:"
+    r"(?P<week>.*?שבוע\s+\d+\s+\((\d{1,2}[./-]\d{1,2})-?(\d{1,2}[./-]\d{1,2})\).*?$)"
+    r"|"
+    r"(?:\*?)?(?:יום )?(?P<day_name>ראשון|שני|שלישי|רביעי|חמישי|שישי|שבת)\s+(?P<date>\d{1,2}[./-]\d{1,2})"
+    r")"
+)
+# טווח שעות בכל מקום בשורה (למשל "22-2 קשה", "קשה 22:30-06:45")
+_TIME_PATTERN = re.compile(r"(\d{1,2}(?::\d{2})?)\s*-\s*(\d{1,2}(?::\d{2})?)")
+
+
+def classify_line(line, vocabulary=DEFAULT_VOCABULARY):
+    """
+    מסווגת שורה (אחרי strip) לקטגוריה אחת במעבר יחיד.
+    מחזירה (kind, match, hits): match הוא תוצאת הביטוי הרלוונטי
+    (כותרת או טווח שעות) ו-hits הן מילות המפתח שנמצאו בשורה.
+    """
+    if not line:
+        return LINE_EMPTY, None, frozenset()
+
+    hits = vocabulary.matcher.find(line)
+    if hits & vocabulary.instructions_set:
+        return LINE_INSTRUCTIONS, None, hits
+
+    header = _HEADER_PATTERN.match(line)
+    if header:
+        return (LINE_WEEK if header.group("week") is not None else LINE_DATE), header, hits
+
+    if hits & vocabulary.standby:
+        return LINE_STANDBY, None, hits
+
+    time_match = _TIME_PATTERN.search(line)
+    if time_match:
+        return LINE_SHIFT, time_match, hits
+
+    if hits & vocabulary.day or hits & vocabulary.night:
+        return LINE_DAY_NIGHT, None, hits
+
+    return LINE_TEXT, None, hits
+
+
+def _event_title(hits, start_display, end_display, vocabulary=DEFAULT_VOCABULARY):
+    """כותרת מתומצתת: אירוע מיוחד, אחרת תפקיד, אחרת 'משמרת'"""
+    for keyword in vocabulary.title_keywords:
+        if keyword in hits:
+            return f"{keyword} ({start_display}-{end_display})"
+    return f"{vocabulary.shift_title} ({start_display}-{end_display})"
+
+
+def _time_display(hour, minute):
+    """'22' עבור 22:00, '22:30' עבור 22:30"""
+    return f"{hour:02d}" if minute == 0 else f"{hour:02d}:{minute:02d}"
+
+
+_reference = threading.local()
+
+
+@contextmanager
+def reference_time(moment):
+    """
+    הזמן שלפיו מוסקת השנה לתאריכים שנכתבו בלי שנה (ברירת המחדל - עכשיו).
+    למשל מועד ההודעה, כשמפענחים לו"ז ישן מתוך ייצוא של צ'אט.
+    """
+    previous = getattr(_reference, "moment", None)
+    _reference.moment = moment
+    try:
+        yield
+    finally:
+        _reference.moment = previous
+
+
+def _now():
+    return getattr(_reference, "moment", None) or datetime.now()
+
+
+def _parse_date(date_str, now):
+    """
+    ממירה '23.03' / '23/03' לתאריך מלא.
+    אם לא צוינה שנה - השנה הנוכחית, או הבאה אם החודש כבר עבר / התאריך עבר.
+    """
+    date_str = date_str.replace("/", ".").replace("-", ".")
+    if len(date_str.split(".")) == 2:
+        current_month = int(date_str.split(".")[1])
+        current_year = now.year
+        # אם החודש קטן מהחודש הנוכחי והוא לא דצמבר/ינואר, כנראה מדובר בשנה הבאה
+        if current_month < now.month and not (now.month == 12 and current_month == 1):
+            current_year += 1
+        date_str += f".{current_year}"
+
+    parsed_date = datetime.strptime(date_str, "%d.%m.%Y")
+
+    # אם התאריך כבר עבר (קטן מהיום), נניח שמדובר בשנה הבאה
+    if parsed_date.date() < now.date():
+        parsed_date = parsed_date.replace(year=parsed_date.year + 1)
+    return parsed_date
+
+def _iter_lines(source):
+    """
+    מקבלת מחרוזת או כל iterable של שורות (str או bytes, למשל request.stream)
+    ומחזירה את השורות אחת-אחת בלי לפצל את כל הקלט מראש.
+    """
+    if isinstance(source, str):
+        start = 0
+        while True:
+            end = source.find("\n", start)
+            if end == -1:
+                yield source[start:]
+                return
+            yield source[start:end]
+            start = end + 1
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        yield line
+
+
+_DAY_MINUTES = 24 * 60
+
+
+def _day_seconds(day):
+    """תחילת תאריך מקומי (date/datetime) כשניות מאז 1970, בלי אזור זמן"""
+    return (day.toordinal() - EPOCH_ORDINAL) * 86400
+
+
+def _make_row(day_start, start_minutes, end_minutes, description, title=None):
+    """
+    שורת אירוע אחידה לכל הפורמטים: [local_start, local_end, description, title]
+    בשניות מקומיות מאז 1970. ההמרה ל-UTC נעשית ב-EventBatch לכל העמודה.
+    """
+    return [day_start + start_minutes * 60, day_start + end_minutes * 60, description, title]
+
+
+def _clock_minutes(hour, minute):
+    """דקות מתחילת היום, עם אותה בדיקת טווח כמו datetime.time"""
+    if not 0 <= hour <= 23:
+        raise ValueError("hour must be in 0..23")
+    if not 0 <= minute <= 59:
+        raise ValueError("minute must be in 0..59")
+    return hour * 60 + minute
+
+
+def _work_day_span(sh, sm, eh, em, work_day_start=6 * 60):
+    """
+    לוגיקת "יום עבודה" בטייסות: 06:00 עד 06:00 למחרת (הגבול לפי הפרופיל).
+    כל שעה 00:00-05:59 שייכת ליום העבודה הקודם (תאריך קלנדרי הבא).
+    מחזירה (התחלה, סיום) בדקות מתחילת היום שבשורת התאריך.
+    """
+    start = _clock_minutes(sh, sm)
+    end = _clock_minutes(eh, em)
+    if start < work_day_start:
+        # דוגמה: "שלישי 2-6" → רביעי 02:00-06:00
+        start += _DAY_MINUTES
+        end += _DAY_MINUTES
+    elif end < work_day_start:
+        # דוגמה: "שלישי 22-02" → שלישי 22:00 ועד רביעי 02:00
+        end += _DAY_MINUTES
+    elif end <= start:
+        # מקרי קצה (למשל 14-12 למחרת)
+        end += _DAY_MINUTES
+    return start, end
+
+
+# ---------------------------------------------------------------------------
+# פורמט day_blocks - שורת יום ואחריה שורות משמרת
+# ---------------------------------------------------------------------------
+
+# תחילית זולה לזיהוי הפורמט: שורה שמתחילה בשם יום ותאריך
+_DAY_BLOCK_SNIFF = re.compile(r"^\*?(?:יום )?(?:ראשון|שני|שלישי|רביעי|חמישי|שישי|שבת)\s+\d{1,2}[./-]\d{1,2}")
+
+
+def _sniff_day_blocks(head):
+    return any(_DAY_BLOCK_SNIFF.match(line) for line in head)
+
+
+def _parse_day_blocks(lines, errors, vocabulary=DEFAULT_VOCABULARY):
+    """
+    מפענחת בלוקים של ימים בצורה זורמת: כל אירוע מוחזר (yield) ברגע
+    שהשורה שלו פוענחה, והזיכרון חסום במצב של בלוק היום הנוכחי.
+    """
+    now = _now()
+    timer = current_timer()
+    produced = 0
+    current_date = None
+    current_day_name = None
+    in_day = False  # האם אנחנו בתוך בלוק של יום (אחרי שורת תאריך)
+
+    for i, raw_line in enumerate(lines):
+        line = raw_line.strip()
+        started = perf_counter()
+        kind, match, hits = classify_line(line, vocabulary)
+        timer.add("classify", perf_counter() - started)
+
+        if kind == LINE_INSTRUCTIONS:
+            # הגענו להנחיות - מפסיקים. בתוך בלוק יום מחזירים מיד כמו קודם
+            if in_day:
+                return
+            break
+
+        if kind == LINE_DATE:
+            # שורת תאריך (לדוגמה: "ראשון 30.03") פותחת בלוק יום חדש
+            in_day = True
+            current_day_name = match.group("day_name").strip()
+            started = perf_counter()
+            try:
+                current_date = _parse_date(match.group("date"), now)
+                day = _day_seconds(current_date)
+            except Exception as e:
+                errors.append(f"שגיאה בעיבוד תאריך בשורה {i+1}: {e}")
+                current_date = None
+            timer.add("dates", perf_counter() - started)
+            continue
+
+        # יום חדש / שבוע חדש / שורה ריקה => סוגרים את בלוק היום
+        if kind in (LINE_EMPTY, LINE_WEEK):
+            in_day = False
+            continue
+
+        # מחוץ לבלוק יום - סתם טקסט
+        if not in_day or current_date is None:
+            continue
+
+        if kind == LINE_STANDBY:
+            # כוננות 60: 08:00 עד 08:00 למחרת (בברירת המחדל)
+            event = _make_row(day, *vocabulary.standby_window, line)
+        elif line == current_day_name:
+            # שורה שמכילה רק את שם היום - מדלגים
+            continue
+        elif kind == LINE_SHIFT:
+            try:
+                sh, sm = _parse_hour_minute(match.group(1).strip())
+                eh, em = _parse_hour_minute(match.group(2).strip())
+                start, end = _work_day_span(sh, sm, eh, em, vocabulary.work_day_start)
+            except ValueError as e:
+                # שעה מחוץ לטווח ("קשה 25-2") - שגיאה עם מספר השורה, ממשיכים לשאר הלו"ז
+                errors.append(f"שגיאה בעיבוד משמרת בשורה {i + 1}: {e}")
+                continue
+            title = _event_title(hits, _time_display(sh, sm), _time_display(eh, em), vocabulary)
+            event = _make_row(day, start, end, line, title)
+        elif hits & vocabulary.day:
+            # יום: 06:00–18:00
+            event = _make_row(day, *vocabulary.day_window, line)
+        elif hits & vocabulary.night:
+            # לילה: 18:00–06:00 למחרת
+            event = _make_row(day, *vocabulary.night_window, line)
+        else:
+            # ברירת מחדל: 08:00–08:00
+            event = _make_row(day, *vocabulary.default_window, line)
+
+        produced += 1
+        yield event
+
+    # אם לא נוצרו אירועים וגם אין שגיאות – שגיאה כללית
+    if not produced and not errors:
+        errors.append("לא נמצאו אירועים תקפים בטקסט שהוזן, ודא שהפורמט נכון.")
+
+
+# ---------------------------------------------------------------------------
+# פורמט sentences - משפט "יום X ... נתחיל ב.. נסיים ב.." לכל אירוע
+# ---------------------------------------------------------------------------
+
+_DAY_NAMES = "ראשון|שני|שלישי|רביעי|חמישי|שישי|שבת"
+_SENTENCE_PATTERN = re.compile(
+    rf"^(?:\*?)?(?:בלילה\s+)?(?:שבין\s+)?(?:ביום\s+)?יום\s+(?P<day_name1>{_DAY_NAMES})\s+(?P<day1>\d{{1,2}})[./-](?P<month1>\d{{1,2}})(?:\.(?P<year1>\d{{4}}))?"
+    rf"(?:\s+ליום\s+(?P<day_name2>{_DAY_NAMES})\s+(?P<day2>\d{{1,2}})[./-](?P<month2>\d{{1,2}})(?:\.(?P<year2>\d{{4}}))?)?,?\s*"
+    rf"(?:תדריך\s+ב(?P<briefing>\d{{1,2}}:\d{{2}}(?::\d{{2}})?)\s*,\s*)?"
+    rf"נתחיל\s+ב(?P<start>\d{{1,2}}:\d{{2}}(?::\d{{2}})?)\s*,\s*"
+    rf"נסיים\s+ב(?P<end>\d{{1,2}}:\d{{2}}(?::\d{{2}})?)(?:\*)?$"
+)
+_SENTENCE_STRIP = re.compile(r"^\*+|\*+$")
+_SENTENCE_IGNORED = frozenset(["נא לאשר בהודעה נפרדת", "🌹🌶️"])
+# שורות המשך שמצטרפות לתיאור האירוע הקודם
+_SENTENCE_ROLES = frozenset(["פיריט", "מפקד"])
+_SENTENCE_DESCRIPTION = "פיריט - מפקד"
+
+
+@lru_cache(maxsize=256)
+def _sentence_clock(text):
+    """'08:00' → דקות מתחילת היום (אותן שעות חוזרות בכל הודעה)"""
+    parsed = datetime.strptime(text, "%H:%M")
+    return parsed.hour * 60 + parsed.minute
+
+
+def _sniff_sentences(head):
+    # משפט שלם בלבד - הערה חופשית עם "נתחיל ב"/"נסיים ב" לא מעבירה את כל הלו"ז לפורמט הזה
+    return any(_SENTENCE_PATTERN.match(_SENTENCE_STRIP.sub("", line).strip()) for line in head)
+
+
+def _parse_sentences(lines, errors, vocabulary=DEFAULT_VOCABULARY):
+    """
+    מפענחת משפט אחד לכל אירוע. שורת "פיריט"/"מפקד" שאחרי האירוע מצטרפת
+    לתיאור שלו, ולכן כל אירוע מוחזק עד שמגיע האירוע הבא (או סוף הקלט).
+    """
+    current_year = _now().year
+    timer = current_timer()
+    pending = None
+    produced = 0
+
+    for i, raw_line in enumerate(lines):
+        line = _SENTENCE_STRIP.sub("", raw_line).strip()
+
+        # התעלמות משורות לא רלוונטיות
+        if not line or line in _SENTENCE_IGNORED:
+            continue
+
+        started = perf_counter()
+        match = _SENTENCE_PATTERN.match(line)
+        timer.add("classify", perf_counter() - started)
+        if match:
+            started = perf_counter()
+            try:
+                day1 = int(match.group("day1"))
+                month1 = int(match.group("month1"))
+                year1 = int(match.group("year1")) if match.group("year1") else current_year
+                day2 = int(match.group("day2")) if match.group("day2") else day1
+                month2 = int(match.group("month2")) if match.group("month2") else month1
+                year2 = int(match.group("year2")) if match.group("year2") else year1
+
+                start_minutes = _sentence_clock(match.group("start"))
+                end_minutes = _sentence_clock(match.group("end"))
+
+                start_day = _day_seconds(datetime(year1, month1, day1))
+                end_day = _day_seconds(datetime(year2, month2, day2))
+                start = start_day + start_minutes * 60
+                end = end_day + end_minutes * 60
+                if start > end:
+                    end += _DAY_MINUTES * 60
+            except Exception as e:
+                errors.append(f"שגיאה בעיבוד אירוע בשורה {i + 1}: {e}")
+                continue
+            finally:
+                timer.add("dates", perf_counter() - started)
+
+            if pending is not None:
+                produced += 1
+                yield pending
+            pending = [start, end, _SENTENCE_DESCRIPTION, None]
+            continue
+
+        # טיפול בשורות נוספות כמו פיריט ומפקד
+        if line in _SENTENCE_ROLES and pending is not None:
+            pending[2] += f" - {line}"
+
+    if pending is not None:
+        produced += 1
+        yield pending
+
+    if not produced and not errors:
+        errors.append("לא נמצאו אירועים תקפים בטקסט שהוזן. ודא שהפורמט נכון.")
+
+
+# ---------------------------------------------------------------------------
+# פורמט loose - שורת תאריך חופשית ואחריה "HH-HH תיאור"
+# ---------------------------------------------------------------------------
+
+# תחילית של אותיות בלבד (שם יום, "ב-") - כדי שספרות התאריך לא ייבלעו בה
+_LOOSE_DATE = re.compile(r"^\*?[^\W\d]*[\s-]*(\d{1,2}[./]\d{1,2}(?:[./]\d{2,4})?)(?!\d)")
+_LOOSE_SHIFT = re.compile(r"^(\d{1,2}(?::\d{2})?)\s*-\s*(\d{1,2}(?::\d{2})?)\s+(.+)$")
+
+
+def _sniff_loose(head):
+    return any(_LOOSE_DATE.match(line) for line in head) and any(
+        _LOOSE_SHIFT.match(line) for line in head
+    )
+
+
+def _parse_loose_date(date_str, now):
+    """תאריך עם שנה אופציונלית (2 או 4 ספרות); בלי שנה - כמו day_blocks"""
+    parts = date_str.replace("/", ".").split(".")
+    if len(parts) == 3:
+        year = int(parts[2])
+        if year < 100:
+            year += 2000
+        return datetime(year, int(parts[1]), int(parts[0]))
+    return _parse_date(date_str, now)
+
+
+def _parse_loose(lines, errors, vocabulary=DEFAULT_VOCABULARY):
+    now = _now()
+    timer = current_timer()
+    current_date = None
+    produced = 0
+
+    for i, raw_line in enumerate(lines):
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        # שורת משמרת נבדקת קודם, כדי ש-"22-2 קשה" לא תיחשב לתאריך
+        started = perf_counter()
+        shift = _LOOSE_SHIFT.match(line)
+        date_match = None if shift else _LOOSE_DATE.match(line)
+        timer.add("classify", perf_counter() - started)
+        if shift:
+            if current_date is None:
+                continue
+            try:
+                sh, sm = _parse_hour_minute(shift.group(1))
+                eh, em = _parse_hour_minute(shift.group(2))
+                start, end = _work_day_span(sh, sm, eh, em, vocabulary.work_day_start)
+            except ValueError as e:
+                errors.append(f"שגיאה בעיבוד משמרת בשורה {i + 1}: {e}")
+                continue
+            produced += 1
+            yield _make_row(current_date, start, end, shift.group(3).strip())
+            continue
+
+        if date_match:
+            started = perf_counter()
+            try:
+                current_date = _day_seconds(_parse_loose_date(date_match.group(1), now))
+            except ValueError as e:
+                errors.append(f"שגיאה בעיבוד תאריך בשורה {i + 1}: {e}")
+                current_date = None
+            timer.add("dates", perf_counter() - started)
+
+    if not produced and not errors:
+        errors.append("לא נמצאו אירועים תקפים בטקסט שהוזן, ודא שהפורמט נכון.")
+
+
+# ---------------------------------------------------------------------------
+# רישום פורמטים והפניה
+# ---------------------------------------------------------------------------
+
+ScheduleFormat = namedtuple("ScheduleFormat", ["name", "sniff", "parse"])
+
+# לפי סדר עדיפות: הפורמט הראשון שה-sniff שלו מצליח נבחר
+FORMATS = []
+DEFAULT_FORMAT = "day_blocks"
+# כמה שורות לא ריקות מתחילת הקלט נבדקות בזיהוי הפורמט
+SNIFF_LINES = 20
+
+
+def register_format(name, sniff, parse, before=None):
+    """
+    רושמת פורמט: sniff(head) מקבלת את השורות הראשונות (אחרי strip) ומחזירה
+    bool; parse(lines, errors, vocabulary) היא generator של שורות אירוע (ראו
+    _make_row), עם אוצר המילים של הפרופיל שנבחר (vocabulary.Vocabulary).
+    """
+    fmt = ScheduleFormat(name, sniff, parse)
+    index = len(FORMATS)
+    if before is not None:
+        index = next(i for i, f in enumerate(FORMATS) if f.name == before)
+    FORMATS.insert(index, fmt)
+    return fmt
+
+
+def get_format(name):
+    for fmt in FORMATS:
+        if fmt.name == name:
+            return fmt
+    raise KeyError(name)
+
+
+register_format("sentences", _sniff_sentences, _parse_sentences)
+register_format("day_blocks", _sniff_day_blocks, _parse_day_blocks)
+register_format("loose", _sniff_loose, _parse_loose)
+
+
+class _DispatchStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.sniff_seconds = 0.0
+        self.dispatches = 0
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.sniff_seconds += seconds
+            self.dispatches += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "dispatches": self.dispatches,
+                "formats": dict(self.counts),
+                "sniff_ms_total": self.sniff_seconds * 1000,
+                "sniff_ms_avg": self.sniff_seconds * 1000 / self.dispatches if self.dispatches else 0.0,
+            }
+
+
+_STATS = _DispatchStats()
+
+
+def dispatch_stats():
+    return _STATS.as_dict()
+
+
+def detect_format(head):
+    """בוחרת פורמט לפי השורות הראשונות (אחרי strip, בלי שורות ריקות)"""
+    for fmt in FORMATS:
+        if fmt.sniff(head):
+            return fmt
+    return get_format(DEFAULT_FORMAT)
+
+
+def iter_rows(lines, errors=None, format=None, vocabulary=None):
+    """
+    מפענחת לו"ז בצורה זורמת: מקבלת מחרוזת או iterable של שורות ומחזירה
+    (yield) שורות אירוע. הפורמט מזוהה מהשורות הראשונות אלא אם צוין format.
+    שגיאות נוספות לרשימה errors אם הועברה. vocabulary - פרופיל מקומפל של
+    היחידה (ברירת מחדל: DEFAULT_VOCABULARY).
+    """
+    if errors is None:
+        errors = []
+    source = _iter_lines(lines)
+
+    started = perf_counter()
+    head_raw = []
+    head = []
+    for raw_line in source:
+        head_raw.append(raw_line)
+        stripped = raw_line.strip()
+        if stripped:
+            head.append(stripped)
+            if len(head) >= SNIFF_LINES:
+                break
+    fmt = get_format(format) if format else detect_format(head)
+    _STATS.record(fmt.name, perf_counter() - started)
+
+    yield from fmt.parse(chain(head_raw, source), errors, vocabulary or DEFAULT_VOCABULARY)
+
+
+def iter_schedule(lines, errors=None, format=None, vocabulary=None):
+    """כמו iter_rows, אבל כל אירוע מוחזר כמילון (start/end ב-UTC, description, title)"""
+    for row in iter_rows(lines, errors, format, vocabulary):
+        yield row_event(*row)
+
+
+def parse_schedule(schedule_text, format=None, vocabulary=None):
+    """(EventBatch, errors) - האצווה היא גם sequence של מילוני אירוע"""
+    errors = []
+    events = EventBatch(iter_rows(schedule_text, errors, format, vocabulary))
+    return events, errors
@@ -0,0 +1,91 @@
+"""
+מאגר תצוגות מקדימות בצד השרת.
+
+במקום לשמור שורת flash לכל אירוע בתוך עוגיית ה-session (שנשלחת ונבדקת
+מחדש בכל בקשה ועלולה לחרוג ממגבלת הגודל של הדפדפן), נשמרות שורות
+התצוגה ב-SQLite וב-session נשמר רק מזהה קצר. מספר השורות ותוקף הרשומה
+חסומים.
+"""
+import json
+import secrets
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS previews (
+    id         TEXT PRIMARY KEY,
+    lines      TEXT NOT NULL,
+    total      INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    conflicts  TEXT NOT NULL DEFAULT '[]'
+)
+"""
+# כל כמה שניות לכל היותר מוחקים רשומות שפג תוקפן
+_PURGE_INTERVAL = 60
+
+
+class PreviewStore:
+    def __init__(self, path, max_lines=500, ttl=3600):
+        self.path = path
+        self.max_lines = max_lines
+        self.ttl = ttl
+        self._local = threading.local()
+        self._last_purge = 0.0
+        # חיבור זמני בלבד - כמו ב-FeedStore, כדי שלא יעבור בירושה אחרי fork
+        conn = sqlite3.connect(path, timeout=10)
+        try:
+            with conn:
+                conn.execute(_SCHEMA)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(previews)")}
+                if "conflicts" not in columns:
+                    conn.execute("ALTER TABLE previews ADD COLUMN conflicts TEXT NOT NULL DEFAULT '[]'")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, lines, conflicts=()):
+        """שומרת את שורות התצוגה והחפיפות (עד max_lines כל אחד) ומחזירה מזהה קצר"""
+        preview_id = secrets.token_urlsafe(9)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO previews (id, lines, total, expires_at, conflicts) VALUES (?, ?, ?, ?, ?)",
+                (
+                    preview_id,
+                    json.dumps(lines[:self.max_lines], ensure_ascii=False),
+                    len(lines),
+                    now + self.ttl,
+                    json.dumps(list(conflicts)[:self.max_lines], ensure_ascii=False),
+                ),
+            )
+            if now - self._last_purge >= _PURGE_INTERVAL:
+                self._last_purge = now
+                conn.execute("DELETE FROM previews WHERE expires_at < ?", (now,))
+        return preview_id
+
+    def get(self, preview_id):
+        """מחזירה {"events", "total", "truncated", "conflicts"} או None"""
+        if not preview_id:
+            return None
+        row = self._connect().execute(
+            "SELECT lines, total, conflicts FROM previews WHERE id = ? AND expires_at >= ?",
+            (preview_id, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        lines = json.loads(row[0])
+        return {
+            "events": lines,
+            "total": row[1],
+            "truncated": row[1] > len(lines),
+            "conflicts": json.loads(row[2]),
+        }
@@ -0,0 +1,212 @@
+"""
+מטמון תגובות ל-endpoint של ה-ICS.
+
+המפתח הוא hash של טקסט הלו"ז המנורמל יחד עם התאריך של היום (parse_schedule
+מסיקה את השנה מ-datetime.now(), ולכן אותו טקסט יכול לתת תוצאה אחרת מחר)
+ועם פרופיל אוצר המילים שבו פוענח.
+הערך הוא קובץ ה-ICS המוכן, שורות התצוגה המקדימה ו-ETag חזק.
+
+שני מימושים:
+- LocalCache: LRU + TTL בזיכרון התהליך (ברירת המחדל)
+- SharedDirCache: קבצים בתיקייה משותפת (למשל /dev/shm) כך שכל ה-workers
+  של gunicorn משתמשים באותו מטמון
+"""
+from collections import OrderedDict
+from datetime import date
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class CachedCalendar:
+    """
+    תוצאה מוכנה להגשה: גוף ה-ICS, ETag, שורות התצוגה המקדימה,
+    fingerprint של תוכן האירועים (לזיהוי שינוי אמיתי בלו"ז), index
+    של האירועים לפי UID (לחישוב לוח שינויים מול השליחה הקודמת) ושורות
+    התיאור של משמרות חופפות
+    """
+
+    __slots__ = ("ics", "etag", "preview", "fingerprint", "index", "conflicts")
+
+    def __init__(self, ics, preview, etag=None, fingerprint=None, index=None, conflicts=()):
+        self.ics = ics
+        self.preview = list(preview)
+        self.etag = etag or hashlib.sha256(ics).hexdigest()[:32]
+        self.fingerprint = fingerprint or self.etag
+        self.index = index or {}
+        self.conflicts = list(conflicts)
+
+
+def normalize_schedule(schedule_text):
+    """
+    מנרמלת שורות (CRLF, רווחים בקצוות) בלי לשנות את משמעות הלו"ז.
+    מפצלת רק על "\n" כמו _iter_lines של הפרסר - splitlines מפצל גם על \x0b, \x85, \u2028 וכו',
+    ושני לו"זים שהפרסר קורא אחרת היו מקבלים אותו מפתח.
+    """
+    return "\n".join(line.strip() for line in schedule_text.strip().split("\n"))
+
+
+def cache_key(schedule_text, today=None, variant=""):
+    """variant - מה שעוד משנה את הפענוח (למשל פרופיל אוצר המילים וגרסתו)"""
+    today = today or date.today()
+    digest = hashlib.sha256(normalize_schedule(schedule_text).encode("utf-8"))
+    digest.update(today.isoformat().encode("ascii"))
+    if variant:
+        digest.update(b"\0" + variant.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class LocalCache:
+    """LRU חסום בגודל עם תוקף לכל רשומה, בטוח לשימוש מכמה threads"""
+
+    def __init__(self, max_entries=256, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                self._stats.hits += 1
+                return item[1]
+            if item is not None:
+                # פג תוקף
+                del self._data[key]
+                self._stats.evictions += 1
+            self._stats.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats.as_dict(), entries=len(self._data), backend="local")
+
+
+class SharedDirCache:
+    """
+    מטמון משותף לכל ה-workers: קובץ JSON אחד לכל מפתח בתיקייה (עדיף tmpfs).
+    כתיבה אטומית עם rename; זמן השינוי של הקובץ משמש גם ל-TTL וגם ל-LRU.
+    המונים הם לכל תהליך בנפרד.
+    """
+
+    def __init__(self, directory, max_entries=256, ttl=600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._stats = _Stats()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            mtime = os.stat(path).st_mtime
+            if mtime + self.ttl < time.time():
+                os.unlink(path)
+                with self._lock:
+                    self._stats.evictions += 1
+                    self._stats.misses += 1
+                return None
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._stats.misses += 1
+            return None
+        with self._lock:
+            self._stats.hits += 1
+        return CachedCalendar(
+            data["ics"].encode("utf-8"),
+            data["preview"],
+            data["etag"],
+            data.get("fingerprint"),
+            data.get("index"),
+            data.get("conflicts", ()),
+        )
+
+    def put(self, key, value):
+        data = {
+            "ics": value.ics.decode("utf-8"),
+            "preview": value.preview,
+            "etag": value.etag,
+            "fingerprint": value.fingerprint,
+            "index": value.index,
+            "conflicts": value.conflicts,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._stats.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            stats = self._stats.as_dict()
+        return dict(stats, entries=len(self._entries()), backend="shared")
+
+
+def create_cache(directory=None, max_entries=256, ttl=600):
+    """מטמון משותף אם הוגדרה תיקייה, אחרת מטמון מקומי לתהליך"""
+    if directory:
+        return SharedDirCache(directory, max_entries=max_entries, ttl=ttl)
+    return LocalCache(max_entries=max_entries, ttl=ttl)
@@ -0,0 +1,93 @@
+window.onload = function() {
+    const textarea = document.getElementById('schedule');
+    if (textarea) {
+        textarea.value = ""; // ניקוי ה-textarea בעת טעינת הדף
+    }
+
+    // אתחול מונה התווים
+    const maxLength = textarea.getAttribute('maxlength');
+    const charCount = document.getElementById('char-count');
+    const updateCharCount = () => {
+        const remaining = maxLength - textarea.value.length;
+        charCount.textContent = `תווים נותרים: ${remaining}`;
+    };
+    textarea.addEventListener('input', updateCharCount);
+    updateCharCount();
+};
+
+// המתנה בין ניסיונות (מילישניות) - שליחה גדולה יכולה לקחת כמה שניות
+const PREVIEW_DELAYS = [300, 500, 1000, 1000, 2000];
+const PREVIEW_TIMEOUT = 120000;
+
+// טעינת האירועים שזוהו מהשרת (הקובץ עצמו יורד כקובץ מצורף).
+// השרת עונה 404 עד שהשליחה עם ה-nonce הזה הסתיימה, כך שלא מוצגת
+// התצוגה של שליחה קודמת
+function loadPreview(nonce, attempt, started) {
+    fetch('/preview?nonce=' + encodeURIComponent(nonce), { credentials: 'same-origin', cache: 'no-store' })
+        .then(function(response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        })
+        .then(function(data) {
+            const list = document.getElementById('preview-list');
+            list.innerHTML = "";
+            data.events.forEach(function(line) {
+                const item = document.createElement('li');
+                item.textContent = line;
+                list.appendChild(item);
+            });
+            if (data.truncated) {
+                const item = document.createElement('li');
+                item.textContent = `ועוד ${data.total - data.events.length} אירועים...`;
+                list.appendChild(item);
+            }
+            const conflicts = document.getElementById('preview-conflicts');
+            conflicts.innerHTML = "";
+            (data.conflicts || []).forEach(function(line) {
+                const item = document.createElement('li');
+                item.textContent = line;
+                conflicts.appendChild(item);
+            });
+            document.getElementById('conflicts').hidden = !conflicts.children.length;
+            document.getElementById('preview').hidden = false;
+        })
+        .catch(function() {
+            if (nonce !== currentNonce || Date.now() - started > PREVIEW_TIMEOUT) {
+                return; // שליחה חדשה יותר, או שהשליחה הזו נכשלה
+            }
+            const delay = PREVIEW_DELAYS[Math.min(attempt, PREVIEW_DELAYS.length - 1)];
+            setTimeout(function() { loadPreview(nonce, attempt + 1, started); }, delay);
+        });
+}
+
+let currentNonce = null;
+
+document.addEventListener('submit', function(event) {
+    // ה-nonce נכנס לטופס לפני שהדפדפן אוסף את השדות
+    const form = event.target;
+    let field = form.querySelector('input[name="preview_nonce"]');
+    if (!field) {
+        field = document.createElement('input');
+        field.type = 'hidden';
+        field.name = 'preview_nonce';
+        form.appendChild(field);
+    }
+    currentNonce = Date.now().toString(36) + Math.random().toString(36).slice(2);
+    field.value = currentNonce;
+    // התצוגה של השליחה הקודמת כבר לא רלוונטית
+    const preview = document.getElementById('preview');
+    if (preview) {
+        preview.hidden = true;
+    }
+
+    setTimeout(function() {
+        const textarea = document.getElementById('schedule');
+        if (textarea) {
+            textarea.value = "";
+        }
+    }, 100); // ניקוי ה-textarea לאחר שליחת הטופס
+    const nonce = currentNonce;
+    setTimeout(function() { loadPreview(nonce, 0, Date.now()); }, PREVIEW_DELAYS[0]);
+});
@@ -0,0 +1,41 @@
+"""
+הגדרות משותפות לבדיקות: שורש הפרויקט ב-sys.path, ומאגרי SQLite זמניים
+לפני ש-app נטען (app קורא את משתני הסביבה בזמן ה-import).
+"""
+from datetime import datetime
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="calander-tests-")
+os.environ.setdefault("FEED_DB_PATH", os.path.join(_TMP, "feeds.db"))
+os.environ.setdefault("PREVIEW_DB_PATH", os.path.join(_TMP, "previews.db"))
+# הבדיקות שולחות הרבה בקשות מאותה כתובת; test_app מחליף את ה-limiter כשצריך
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+
+import parsers  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fixed_now():
+    """תאריכים בלי שנה מוסקים מול 1.3.2026 - תוצאות זהות בכל יום שמריצים"""
+    with parsers.reference_time(datetime(2026, 3, 1, 12, 0)):
+        yield
+
+
+@pytest.fixture
+def app_module():
+    import app
+
+    app.app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
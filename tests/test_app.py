@@ -0,0 +1,101 @@
+from datetime import date
+import io
+
+from admission import InFlightLimiter, RateLimiter
+from response_cache import cache_key
+
+ROSTER = "*23.03.2026\n08-12 שמירה\n14-18 שמירה"
+
+
+def test_cache_key_ignores_line_endings_and_padding():
+    today = date(2026, 3, 1)
+    key = cache_key("ראשון 23.03\nקשה 22-2", today)
+    assert cache_key("  ראשון 23.03 \r\n\tקשה 22-2\r\n", today) == key
+    assert cache_key("ראשון 23.03\nקשה 22-2", today, variant="navy:3") != key
+    assert cache_key("ראשון 23.03\nקשה 22-2", date(2026, 3, 2)) != key
+
+
+def test_cache_key_splits_lines_like_the_parser():
+    # \u2028 ו-\x0b אינם סוף שורה עבור הפרסר, ולכן גם לא עבור המפתח
+    today = date(2026, 3, 1)
+    key = cache_key("ראשון 23.03\nקשה 22-2", today)
+    assert cache_key("ראשון 23.03\u2028קשה 22-2", today) != key
+    assert cache_key("ראשון 23.03\x0bקשה 22-2", today) != key
+
+
+def test_rate_limiter_bucket(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("admission.time.monotonic", lambda: clock[0])
+    limiter = RateLimiter(rate=1.0, burst=2)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 1.0
+    # כתובת אחרת עם bucket משלה
+    assert limiter.acquire("b") == 0
+    clock[0] += 1.0
+    assert limiter.acquire("a") == 0
+
+
+def test_rate_limiter_forgets_oldest_keys():
+    limiter = RateLimiter(rate=1.0, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+    assert list(limiter._buckets) == ["b", "c"]
+    assert limiter.acquire("a") == 0
+
+
+def test_in_flight_limiter():
+    limiter = InFlightLimiter(1)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+
+
+def test_parse_slots_sized_from_threads(app_module, monkeypatch):
+    monkeypatch.delenv("MAX_INFLIGHT_PARSES", raising=False)
+    monkeypatch.setattr(app_module, "parse_slots", InFlightLimiter(4))
+    app_module.size_parse_slots(8)
+    assert app_module.parse_slots.limit == 7
+    app_module.size_parse_slots(1)
+    assert app_module.parse_slots.limit == 1
+    monkeypatch.setenv("MAX_INFLIGHT_PARSES", "3")
+    app_module.size_parse_slots(8)
+    assert app_module.parse_slots.limit == 1
+
+
+def test_submissions_rate_limited(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "rate_limiter", RateLimiter(rate=1 / 60, burst=1))
+    assert client.post("/", data={"schedule": ROSTER}).status_code == 200
+    response = client.post("/", data={"schedule": ROSTER})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_out_of_range_shift_is_flashed(client):
+    response = client.post("/", data={"schedule": "ראשון 23.03\nקשה 25-2"})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        messages = [message for _, message in session["_flashes"]]
+    assert any("בשורה 2" in message for message in messages)
+
+
+def test_identical_shifts_stay_separate(client):
+    response = client.post("/", data={"schedule": ROSTER})
+    assert response.status_code == 200
+    assert response.data.count(b"BEGIN:VEVENT") == 2
+    duty = client.get("/on-duty?at=2026-03-23T09:00").get_json()
+    assert len(duty["shifts"]) == 1
+
+
+def test_merge_endpoint_deduplicates_own_export(client):
+    exported = client.post("/", data={"schedule": ROSTER}).data
+    response = client.post(
+        "/merge",
+        data={"schedule": ROSTER, "calendar": (io.BytesIO(exported), "old.ics")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    uids = [line for line in response.data.split(b"\r\n") if line.startswith(b"UID:")]
+    assert len(uids) == 2
+    assert len(set(uids)) == 2
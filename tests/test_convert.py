@@ -0,0 +1,48 @@
+import convert
+
+ROSTER = "ראשון 23.03\nקשה 22-2\nקל 8-12\nשני 24.03\nקשה 22-2"
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def _uids(path):
+    return [line[4:] for line in path.read_bytes().decode("utf-8").split("\r\n") if line.startswith("UID:")]
+
+
+def test_output_names_are_unique():
+    paths = ["a/week.txt", "b/week.txt", "c/Week.txt", "week-2.txt"]
+    assert convert.output_names(paths) == ["week.ics", "week-2.ics", "Week-3.ics", "week-2-2.ics"]
+
+
+def test_same_basename_in_two_folders(tmp_path):
+    first = _write(tmp_path / "in" / "a" / "week.txt", ROSTER)
+    _write(tmp_path / "in" / "b" / "week.txt", "שלישי 25.03\nקל 8-12")
+    out = tmp_path / "out"
+    assert convert.main([str(tmp_path / "in" / "*" / "*.txt"), "-o", str(out), "--workers", "1"]) == 0
+    assert sorted(p.name for p in out.iterdir()) == ["week-2.ics", "week.ics"]
+    assert len(_uids(out / "week.ics")) == len(convert.convert_file(first, merge=True)["items"])
+    assert len(_uids(out / "week-2.ics")) == 1
+
+
+def test_merge_skips_duplicate_uids(tmp_path, capsys):
+    _write(tmp_path / "a.txt", ROSTER)
+    _write(tmp_path / "b.txt", ROSTER + "\nשלישי 25.03\nקל 8-12")
+    merged = tmp_path / "all.ics"
+    assert convert.main([str(tmp_path), "--merge", str(merged), "--workers", "1"]) == 0
+    uids = _uids(merged)
+    assert len(uids) == len(set(uids)) == 4
+    assert "3 events skipped" in capsys.readouterr().out
+
+
+def test_merge_rrule_builds_series_across_inputs(tmp_path):
+    _write(tmp_path / "a.txt", "ראשון 08.03\nקשה 22-2")
+    _write(tmp_path / "b.txt", "ראשון 08.03\nקשה 22-2\nראשון 15.03\nקשה 22-2")
+    merged = tmp_path / "all.ics"
+    assert convert.main([str(tmp_path), "--merge", str(merged), "--rrule", "--workers", "1"]) == 0
+    text = merged.read_text(encoding="utf-8")
+    assert text.count("BEGIN:VEVENT") == 1
+    assert "RRULE:FREQ=WEEKLY" in text
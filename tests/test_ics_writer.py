@@ -0,0 +1,160 @@
+from collections import Counter
+from datetime import datetime, timedelta
+import io
+
+import pytest
+
+from ics_reader import iter_events, iter_merged_calendar
+from ics_writer import (
+    calendar_dtstamp,
+    calendar_index,
+    calendar_text,
+    diff_index,
+    iter_delta_calendar,
+    iter_uid_fields,
+    recurring_calendar_text,
+)
+from parsers import parse_schedule
+
+# שתי משמרות זהות באותו יום בשעות שונות - ב-UID הן נבדלות רק ב-occurrence
+UID_SAMPLES = (
+    "*23.03\n08-12 שמירה\n14-18 שמירה",
+    "יום ראשון 23.03, נתחיל ב08:00, נסיים ב12:00\nיום ראשון 23.03, נתחיל ב14:00, נסיים ב18:00",
+    "ראשון 23.03\nקשה 8-12\nקשה 14-18\nקשה 14-18",
+)
+LOOSE_PAIR = "*23.03\n08-12 שמירה\n14-16 סיור"
+
+UTC_FORMAT = "%Y%m%dT%H%M%SZ"
+
+
+def _weekly_roster(weeks, skip=()):
+    """משמרת ראשון ומשמרת שלישי בכל שבוע מ-4.1; בשבועות skip אין משמרת שלישי"""
+    days = []
+    for week in range(weeks):
+        day = datetime(2026, 1, 4) + timedelta(weeks=week)
+        days.append(f"ראשון {day:%d.%m}\nקשה 22-2")
+        if week not in skip:
+            days.append(f"שלישי {day + timedelta(days=2):%d.%m}\nקל 8-12")
+    return "\n".join(days)
+
+
+def _vevents(text):
+    """(שדות) לכל VEVENT - מפתחות ה-iCalendar וערכיהם, אחרי unfold"""
+    current = None
+    for line in text.replace("\r\n ", "").split("\r\n"):
+        if line == "BEGIN:VEVENT":
+            current = {}
+        elif line == "END:VEVENT":
+            yield current
+            current = None
+        elif current is not None:
+            name, _, value = line.partition(":")
+            current[name] = value
+
+
+def _expand(text):
+    """המופעים שהלוח מתאר, כולל סדרות RRULE:FREQ=WEEKLY;UNTIL עם EXDATE"""
+    occurrences = Counter()
+    for event in _vevents(text):
+        start = datetime.strptime(event["DTSTART"], UTC_FORMAT)
+        length = datetime.strptime(event["DTEND"], UTC_FORMAT) - start
+        starts = [start]
+        if "RRULE" in event:
+            until = datetime.strptime(event["RRULE"].split("UNTIL=")[1], UTC_FORMAT)
+            excluded = {datetime.strptime(value, UTC_FORMAT) for value in event.get("EXDATE", "").split(",") if value}
+            starts = []
+            moment = start
+            while moment <= until:
+                if moment not in excluded:
+                    starts.append(moment)
+                moment += timedelta(weeks=1)
+        for moment in starts:
+            occurrences[(moment, length, event["SUMMARY"], event["DESCRIPTION"])] += 1
+    return occurrences
+
+
+@pytest.mark.parametrize("text", UID_SAMPLES)
+def test_unique_uids(text):
+    events, errors = parse_schedule(text)
+    assert not errors
+    assert len(events) >= 2
+    batch_uids = [uid for uid, _ in iter_uid_fields(events)]
+    dict_uids = [uid for uid, _ in iter_uid_fields([dict(event) for event in events])]
+    assert len(set(batch_uids)) == len(events)
+    assert batch_uids == dict_uids
+    assert len(calendar_index(events)) == len(events)
+
+
+def test_uids_stable_across_submissions():
+    first = calendar_index(parse_schedule(UID_SAMPLES[2])[0])
+    second = calendar_index(parse_schedule(UID_SAMPLES[2])[0])
+    assert first == second
+
+
+def test_compact_calendar_describes_same_events():
+    events, errors = parse_schedule(_weekly_roster(8))
+    assert not errors
+    full = calendar_text(events)
+    compact = recurring_calendar_text(calendar_index(events).items())
+    assert "RRULE:FREQ=WEEKLY" in compact
+    assert compact.count("BEGIN:VEVENT") < full.count("BEGIN:VEVENT")
+    assert _expand(compact) == _expand(full)
+
+
+def test_compact_calendar_with_gap_uses_exdate():
+    events, _ = parse_schedule(_weekly_roster(6, skip=(3,)))
+    full = calendar_text(events)
+    compact = recurring_calendar_text(calendar_index(events).items())
+    assert "EXDATE:" in compact
+    assert _expand(compact) == _expand(full)
+
+
+def test_compact_calendar_is_deterministic():
+    events, _ = parse_schedule(_weekly_roster(4))
+    full = calendar_text(events).encode("utf-8")
+    items = calendar_index(events).items()
+    dtstamp = calendar_dtstamp(full)
+    assert recurring_calendar_text(items, dtstamp) == recurring_calendar_text(items, dtstamp)
+    assert f"DTSTAMP:{dtstamp}" in recurring_calendar_text(items, dtstamp)
+
+
+def test_delta_calendar():
+    previous = calendar_index(parse_schedule("ראשון 23.03\nקשה 22-2\nקל 8-12")[0])
+    current = calendar_index(parse_schedule("ראשון 23.03\nקשה 22-2\nקל 9-12")[0])
+    changed, removed = diff_index(previous, current)
+    assert len(changed) == 1 and len(removed) == 1
+    text = "".join(iter_delta_calendar(changed, removed))
+    assert text.count("BEGIN:VCALENDAR") == 2
+    assert "METHOD:PUBLISH" in text and "METHOD:CANCEL" in text
+    cancelled = [event for event in _vevents(text) if event.get("STATUS") == "CANCELLED"]
+    assert [event["UID"] for event in cancelled] == [removed[0][0]]
+
+
+def test_delta_calendar_without_changes():
+    index = calendar_index(parse_schedule(UID_SAMPLES[2])[0])
+    changed, removed = diff_index(index, index)
+    assert changed == [] and removed == []
+    text = "".join(iter_delta_calendar(changed, removed))
+    assert "METHOD:PUBLISH" in text
+    assert "BEGIN:VEVENT" not in text
+
+
+def test_merge_replaces_own_export():
+    events, _ = parse_schedule(UID_SAMPLES[2])
+    index = calendar_index(events)
+    exported = calendar_text(events)
+    merged = "".join(iter_merged_calendar(index.items(), io.StringIO(exported)))
+    uids = [event["UID"] for event in _vevents(merged)]
+    assert sorted(uids) == sorted(index)
+
+
+def test_merge_skips_identical_foreign_events():
+    events, _ = parse_schedule(LOOSE_PAIR)
+    index = calendar_index(events)
+    foreign = calendar_text(events).replace("@calander-app", "@other")
+    merged = "".join(iter_merged_calendar(index.items(), io.StringIO(foreign)))
+    uids = [event["UID"] for event in _vevents(merged)]
+    assert len(uids) == len(events)
+    assert all(uid.endswith("@other") for uid in uids)
+    assert [event.uid for event in iter_events(io.StringIO(merged))] == uids
+
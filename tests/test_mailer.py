@@ -0,0 +1,46 @@
+import threading
+
+from mailer import MailQueue, MailQuota
+
+
+def test_quota_per_recipient(tmp_path):
+    quota = MailQuota(str(tmp_path / "mail.db"), per_recipient=2, daily=100)
+    assert quota.acquire("a@example.com") is None
+    # אותה כתובת באותיות אחרות היא אותו נמען
+    assert quota.acquire(" A@Example.com") is None
+    assert quota.acquire("a@example.com") == "recipient"
+    assert quota.acquire("b@example.com") is None
+
+
+def test_quota_daily_cap_shared_between_instances(tmp_path):
+    # שני מופעים על אותו קובץ - כמו שני workers
+    path = str(tmp_path / "mail.db")
+    first, second = MailQuota(path, per_recipient=5, daily=3), MailQuota(path, per_recipient=5, daily=3)
+    assert first.acquire("a@example.com") is None
+    assert second.acquire("b@example.com") is None
+    assert first.acquire("c@example.com") is None
+    assert second.acquire("d@example.com") == "daily"
+
+
+def test_quota_is_atomic_across_threads(tmp_path):
+    quota = MailQuota(str(tmp_path / "mail.db"), per_recipient=1000, daily=50)
+    results = []
+
+    def send(n):
+        for i in range(20):
+            results.append(quota.acquire(f"user{n}-{i}@example.com"))
+
+    threads = [threading.Thread(target=send, args=(n,)) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(None) == 50
+
+
+def test_queue_refuses_over_quota(tmp_path):
+    quota = MailQuota(str(tmp_path / "mail.db"), per_recipient=0, daily=100)
+    mail = MailQueue("key", "from@example.com", quota=quota)
+    assert mail.send("a@example.com", "subject", "body", b"BEGIN:VCALENDAR") is False
+    assert mail.stats["limited"] == 1
+    assert mail.stats["queued"] == 0
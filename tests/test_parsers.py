@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import parsers
+from parsers import detect_format, parse_schedule
+
+DAY_BLOCKS = "ראשון 23.03\nקשה 22-2\nקל 8-12"
+SENTENCES = "יום ראשון 23.03, נתחיל ב08:00, נסיים ב16:00"
+LOOSE = "*23.03\n08-12 שמירה\n14-18 שמירה"
+
+
+def _head(text):
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+@pytest.mark.parametrize("text, expected", [
+    (DAY_BLOCKS, "day_blocks"),
+    (SENTENCES, "sentences"),
+    (LOOSE, "loose"),
+    ("סתם טקסט בלי לו\"ז", parsers.DEFAULT_FORMAT),
+])
+def test_detect_format(text, expected):
+    assert detect_format(_head(text)).name == expected
+
+
+def test_note_line_does_not_switch_to_sentences():
+    # הערה חופשית עם "נתחיל ב"/"נסיים ב" לא הופכת לו"ז רגיל לפורמט המשפטים
+    text = "שימו לב: בתדריך נתחיל בזמן ונסיים בזמן\n" + DAY_BLOCKS
+    assert detect_format(_head(text)).name == "day_blocks"
+    events, errors = parse_schedule(text)
+    assert not errors
+    assert len(events) == 2
+
+
+def test_day_blocks_times():
+    events, errors = parse_schedule(DAY_BLOCKS)
+    assert not errors
+    # 23.03.2026 בשעון חורף (UTC+2); משמרת לילה עוברת ליום הבא
+    assert events[0]["start"] == datetime(2026, 3, 23, 20, 0, tzinfo=timezone.utc)
+    assert events[0]["end"] == datetime(2026, 3, 24, 0, 0, tzinfo=timezone.utc)
+    assert events[1]["start"] == datetime(2026, 3, 23, 6, 0, tzinfo=timezone.utc)
+
+
+def test_forced_format():
+    events, errors = parse_schedule(LOOSE, format="day_blocks")
+    assert len(events) == 0
+
+
+@pytest.mark.parametrize("text, line", [
+    ("ראשון 23.03\nקשה 25-2\nקל 8-12", 2),
+    ("ראשון 23.03\nקל 8-12\nקשה 22:75-2", 3),
+])
+def test_out_of_range_shift_reports_line(text, line):
+    events, errors = parse_schedule(text)
+    assert len(events) == 1
+    assert len(errors) == 1
+    assert f"בשורה {line}:" in errors[0]
+
+
+def test_crlf_input():
+    events, errors = parse_schedule(DAY_BLOCKS.replace("\n", "\r\n"))
+    assert not errors
+    assert [e["description"] for e in events] == [e["description"] for e in parse_schedule(DAY_BLOCKS)[0]]
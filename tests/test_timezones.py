@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from timezones import EPOCH, LOCAL, TimezoneTable
+
+# ב-2026 שעון הקיץ בישראל מתחיל ב-27.3 (02:00 → 03:00) ונגמר ב-25.10 (02:00 → 01:00)
+SPRING_FORWARD = date(2026, 3, 27)
+FALL_BACK = date(2026, 10, 25)
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_day_offset_table():
+    assert LOCAL._local_day_offset(date(2026, 1, 15)) == timedelta(hours=2)
+    assert LOCAL._local_day_offset(date(2026, 7, 15)) == timedelta(hours=3)
+    # ביום מעבר אין היסט אחד ליום כולו
+    assert LOCAL._local_day_offset(SPRING_FORWARD) is None
+    assert LOCAL._local_day_offset(FALL_BACK) is None
+    assert LOCAL._utc_day_offset(SPRING_FORWARD - timedelta(days=2)) == timedelta(hours=2)
+    # יום ה-UTC שלפני המעבר נגמר בדיוק ברגע המעבר (00:00 UTC = 02:00 מקומי)
+    assert LOCAL._utc_day_offset(SPRING_FORWARD - timedelta(days=1)) is None
+
+
+@pytest.mark.parametrize("local, expected", [
+    (datetime(2026, 3, 23, 8, 0), _utc(2026, 3, 23, 6, 0)),
+    (datetime(2026, 6, 1, 8, 0), _utc(2026, 6, 1, 5, 0)),
+    (datetime(2026, 3, 27, 1, 30), _utc(2026, 3, 26, 23, 30)),
+    (datetime(2026, 3, 27, 3, 30), _utc(2026, 3, 27, 0, 30)),
+    # השעה שלא קיימת בדילוג ושעה כפולה במעבר לשעון חורף - לפי שעון החורף
+    (datetime(2026, 3, 27, 2, 30), _utc(2026, 3, 27, 0, 30)),
+    (datetime(2026, 10, 25, 1, 30), _utc(2026, 10, 24, 23, 30)),
+    (datetime(2026, 10, 25, 3, 0), _utc(2026, 10, 25, 1, 0)),
+])
+def test_to_utc(local, expected):
+    assert LOCAL.to_utc(local) == expected
+
+
+@pytest.mark.parametrize("day", [SPRING_FORWARD, FALL_BACK, date(2026, 8, 1)])
+def test_local_seconds_match_to_utc(day):
+    start = datetime.combine(day, datetime.min.time()) - timedelta(hours=3)
+    for quarter in range(0, 30 * 4):
+        naive = start + timedelta(minutes=15 * quarter)
+        seconds = int((naive - EPOCH).total_seconds())
+        assert LOCAL.local_seconds_to_utc(seconds) == LOCAL.to_utc(naive).timestamp(), naive
+
+
+def test_to_local_round_trip():
+    moment = _utc(2026, 3, 26, 22, 0)
+    for _ in range(48):
+        local = LOCAL.to_local(moment)
+        assert local == moment.astimezone(LOCAL.zone).replace(tzinfo=None)
+        moment += timedelta(minutes=30)
+
+
+def test_tables_are_per_instance():
+    other = TimezoneTable("Europe/London")
+    assert other._local_day_offset(date(2026, 1, 15)) == timedelta(0)
+    assert LOCAL._local_day_offset(date(2026, 1, 15)) == timedelta(hours=2)
@@ -0,0 +1,104 @@
+"""
+שכבת המרת אזורי זמן מבוססת zoneinfo עם טבלת היסטים שמורה.
+
+ברוב הימים ההיסט מ-UTC קבוע לכל היום, ולכן מספיק לחשב אותו פעם אחת לכל
+תאריך מקומי (ולכל תאריך UTC בכיוון ההפוך) ולהמיר בחיסור פשוט. רק בימים
+שבהם יש מעבר שעון (קיץ/חורף) עוברים לחישוב המדויק של zoneinfo.
+
+במקרים דו-משמעיים (השעה שחוזרת על עצמה במעבר לשעון חורף) ובשעות שלא
+קיימות (הדילוג במעבר לשעון קיץ) נבחר ההיסט של שעון החורף - בדיוק כמו
+pytz.localize(..., is_dst=False) שהיה בשימוש קודם.
+"""
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+UTC = timezone.utc
+LOCAL_TZ_NAME = "Asia/Jerusalem"
+
+_ONE_DAY = timedelta(days=1)
+_DAY_SECONDS = 86400
+# 1970-01-01: נקודת האפס של שניות ה-epoch (מקומיות או UTC)
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+class TimezoneTable:
+    """המרות wall-clock <-> UTC עבור אזור זמן אחד, עם מטמון היסטים ליום"""
+
+    def __init__(self, name, cache_size=4096):
+        self.name = name
+        self.zone = ZoneInfo(name)
+        # מטמון לכל מופע בנפרד
+        self._local_day_offset = lru_cache(maxsize=cache_size)(self._compute_local_day_offset)
+        self._utc_day_offset = lru_cache(maxsize=cache_size)(self._compute_utc_day_offset)
+        self._local_day_seconds = lru_cache(maxsize=cache_size)(self._compute_local_day_seconds)
+
+    def _compute_local_day_offset(self, day):
+        """היסט קבוע לתאריך מקומי, או None אם באותו יום יש מעבר שעון"""
+        start = datetime.combine(day, time(0, 0), tzinfo=self.zone)
+        end = datetime.combine(day + _ONE_DAY, time(0, 0), tzinfo=self.zone)
+        offset = start.utcoffset()
+        if offset != end.utcoffset():
+            return None
+        # חצות עצמה עלולה ליפול בתוך מעבר (יש אזורים שמחליפים שעון בחצות)
+        if start.replace(fold=1).utcoffset() != offset:
+            return None
+        return offset
+
+    def _compute_utc_day_offset(self, day):
+        """היסט קבוע לתאריך UTC, או None אם באותו יום UTC יש מעבר שעון"""
+        start = datetime.combine(day, time(0, 0), tzinfo=UTC).astimezone(self.zone)
+        end = datetime.combine(day + _ONE_DAY, time(0, 0), tzinfo=UTC).astimezone(self.zone)
+        offset = start.utcoffset()
+        return offset if offset == end.utcoffset() else None
+
+    def _compute_local_day_seconds(self, day_number):
+        """כמו _compute_local_day_offset, לפי מספר יום מאז 1970 ובשניות שלמות"""
+        offset = self._local_day_offset(EPOCH.date() + timedelta(days=day_number))
+        return None if offset is None else int(offset.total_seconds())
+
+    def _exact_offset(self, naive):
+        """היסט מדויק ליום מעבר: בדו-משמעות/דילוג בוחרים את שעון החורף"""
+        first = naive.replace(tzinfo=self.zone, fold=0)
+        second = naive.replace(tzinfo=self.zone, fold=1)
+        if first.utcoffset() == second.utcoffset():
+            return first.utcoffset()
+        return first.utcoffset() if not first.dst() else second.utcoffset()
+
+    def offset_for_local(self, naive):
+        offset = self._local_day_offset(naive.date())
+        if offset is None:
+            offset = self._exact_offset(naive)
+        return offset
+
+    def to_utc(self, naive):
+        """זמן מקומי (naive) → datetime ב-UTC"""
+        return (naive - self.offset_for_local(naive)).replace(tzinfo=UTC)
+
+    def local_seconds_to_utc(self, seconds):
+        """
+        זמן מקומי כשניות מאז 1970 (בלי אזור זמן) → שניות epoch ב-UTC.
+        אותה המרה כמו to_utc, בחשבון שלמים ובלי ליצור datetime ברוב הימים.
+        """
+        offset = self._local_day_seconds(seconds // _DAY_SECONDS)
+        if offset is None:
+            naive = EPOCH + timedelta(seconds=seconds)
+            offset = int(self._exact_offset(naive).total_seconds())
+        return seconds - offset
+
+    def to_local(self, moment):
+        """datetime מודע-אזור-זמן → זמן מקומי naive"""
+        moment = moment.astimezone(UTC)
+        naive_utc = moment.replace(tzinfo=None)
+        offset = self._utc_day_offset(naive_utc.date())
+        if offset is None:
+            return moment.astimezone(self.zone).replace(tzinfo=None)
+        return naive_utc + offset
+
+    def format_local(self, moment, fmt="%d/%m/%Y %H:%M"):
+        return self.to_local(moment).strftime(fmt)
+
+
+# הטבלה המשותפת לכל האפליקציה
+LOCAL = TimezoneTable(LOCAL_TZ_NAME)
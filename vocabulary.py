@@ -0,0 +1,270 @@
+"""
+פרופילי אוצר מילים ליחידות.
+
+כל יחידה כותבת את הלו"ז במילים שלה: תפקידים ("קשה", "חוץ"), אירועים
+מיוחדים ("תדריך"), מילת כוננות, מילות יום/לילה, וגבול "יום העבודה"
+(06:00 בטייסות). Vocabulary הוא פרופיל מקומפל: KeywordMatcher אחד לכל
+המילים, קבוצות (frozenset) לכל כלל וחלונות הזמן בדקות - כך שבקשה לא
+בונה שום ביטוי או רשימה.
+
+פרופיל נטען מקובץ JSON בתיקייה (שם הקובץ הוא שם הפרופיל); מפתח שחסר
+בקובץ נלקח מברירת המחדל המובנית (DEFAULT_VOCABULARY). VocabularyStore
+מחזיקה את הפרופילים המקומפלים ב-LRU חסום, ובודקת (לכל היותר פעם
+ב-check_interval שניות) אם הקובץ השתנה כדי לקמפל אותו מחדש.
+
+דוגמה (vocabularies/navy.json):
+    {
+        "roles": ["גשר", "מכונה"],
+        "special_events": ["תדריך", "תרגיל"],
+        "standby": {"keywords": ["כוננות"], "start": "07:00", "end": "07:00"},
+        "work_day_start": "07:00"
+    }
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INSTRUCTIONS_KEYWORDS = ("בקשות לחילופים", "כדי להכניס ללו״ז")
+STANDBY_KEYWORD = "כוננות 60"
+# תפקידים במשמרת וסדר העדיפות שלהם (הראשון ברשימה שמופיע בשורה זוכה)
+ROLES = ("קשה", "קל", "בינוני", "מאומץ", "נינוח", "רגיל", "חוץ", "פנים")
+# אירועים מיוחדים - קודמים לתפקיד בכותרת האירוע
+SPECIAL_EVENTS = ("שיחת מפעילים", "קה\"ד", "הכשרה", "תדריך", "ישיבה")
+DAY_KEYWORD = "יום"
+NIGHT_KEYWORD = "לילה"
+
+DEFAULT_PROFILE = "default"
+# הפרופיל המובנה; קובץ פרופיל דורס רק את המפתחות שהוא מגדיר
+DEFAULT_CONFIG = {
+    "instructions": list(INSTRUCTIONS_KEYWORDS),
+    "roles": list(ROLES),
+    "special_events": list(SPECIAL_EVENTS),
+    "shift_title": "משמרת",
+    # חלון זמן: סיום <= התחלה פירושו למחרת
+    "standby": {"keywords": [STANDBY_KEYWORD], "start": "08:00", "end": "08:00"},
+    "day": {"keywords": [DAY_KEYWORD], "start": "06:00", "end": "18:00"},
+    "night": {"keywords": [NIGHT_KEYWORD], "start": "18:00", "end": "06:00"},
+    # שורה בבלוק יום בלי שעות ובלי מילת יום/לילה
+    "default_window": {"start": "08:00", "end": "08:00"},
+    # שעות לפני הגבול שייכות ליום העבודה הקודם
+    "work_day_start": "06:00",
+}
+
+_DAY_MINUTES = 24 * 60
+_PROFILE_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class KeywordMatcher:
+    """
+    מזהה בבת אחת את כל מילות המפתח שמופיעות בשורה.
+    כל המילים מאוחדות לביטוי אחד (lookahead, מהארוכה לקצרה) כך שסריקה
+    אחת של השורה מוצאת גם מופעים חופפים. מילה שמוכלת במילה ארוכה יותר
+    שמתחילה באותו מקום נגזרת מראש מטבלת ההכלה.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(keywords))
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        alternation = "|".join(re.escape(k) for k in ordered)
+        self._pattern = re.compile(f"(?=({alternation}))", re.IGNORECASE)
+        self._canonical = {k.casefold(): k for k in self.keywords}
+        self._implied = {
+            k: frozenset(o for o in self.keywords if o.casefold() in k.casefold())
+            for k in self.keywords
+        }
+
+    def find(self, line):
+        """מחזירה frozenset של כל מילות המפתח שמופיעות בשורה"""
+        hits = set()
+        for m in self._pattern.finditer(line):
+            hits |= self._implied[self._canonical[m.group(1).casefold()]]
+        return frozenset(hits)
+
+
+def _clock(value, field):
+    """'06:00' → דקות מתחילת היום"""
+    try:
+        hour, _, minute = str(value).partition(":")
+        hour, minute = int(hour), int(minute or 0)
+    except ValueError:
+        raise ValueError(f"{field}: expected HH:MM, got {value!r}") from None
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"{field}: expected HH:MM, got {value!r}")
+    return hour * 60 + minute
+
+
+def _window(config, field):
+    """(התחלה, סיום) בדקות מתחילת יום התאריך; סיום <= התחלה - למחרת"""
+    start = _clock(config["start"], f"{field}.start")
+    end = _clock(config["end"], f"{field}.end")
+    if end <= start:
+        end += _DAY_MINUTES
+    return start, end
+
+
+def _keywords(values, field):
+    if isinstance(values, str):
+        values = [values]
+    if not isinstance(values, (list, tuple)) or not all(isinstance(v, str) and v.strip() for v in values):
+        raise ValueError(f"{field}: expected a list of non-empty strings")
+    return tuple(v.strip() for v in values)
+
+
+class Vocabulary:
+    """פרופיל מקומפל - נבנה פעם אחת ומשותף לכל הבקשות"""
+
+    def __init__(self, name=DEFAULT_PROFILE, config=None, version=""):
+        merged = dict(DEFAULT_CONFIG)
+        for key, value in (config or {}).items():
+            if key not in DEFAULT_CONFIG:
+                raise ValueError(f"unknown vocabulary key: {key}")
+            if isinstance(DEFAULT_CONFIG[key], dict):
+                if not isinstance(value, dict):
+                    raise ValueError(f"{key}: expected an object")
+                value = {**DEFAULT_CONFIG[key], **value}
+            merged[key] = value
+
+        self.name = name
+        # משתנה עם תוכן הקובץ - חלק ממפתח המטמון של הלוחות
+        self.version = version
+        self.instructions = _keywords(merged["instructions"], "instructions")
+        self.roles = _keywords(merged["roles"], "roles")
+        self.special_events = _keywords(merged["special_events"], "special_events")
+        self.shift_title = str(merged["shift_title"])
+        standby = _keywords(merged["standby"]["keywords"], "standby.keywords")
+        day = _keywords(merged["day"]["keywords"], "day.keywords")
+        night = _keywords(merged["night"]["keywords"], "night.keywords")
+
+        self.matcher = KeywordMatcher(self.instructions + standby + self.special_events + self.roles + day + night)
+        self.instructions_set = frozenset(self.instructions)
+        self.standby = frozenset(standby)
+        self.day = frozenset(day)
+        self.night = frozenset(night)
+        # סדר הבדיקה לכותרת: אירוע מיוחד, אחר כך תפקיד
+        self.title_keywords = self.special_events + self.roles
+
+        self.standby_window = _window(merged["standby"], "standby")
+        self.day_window = _window(merged["day"], "day")
+        self.night_window = _window(merged["night"], "night")
+        self.default_window = _window(merged["default_window"], "default_window")
+        self.work_day_start = _clock(merged["work_day_start"], "work_day_start")
+
+    def __repr__(self):
+        return f"<Vocabulary {self.name}>"
+
+
+DEFAULT_VOCABULARY = Vocabulary()
+
+
+def load_vocabulary(path, name=None):
+    """פרופיל מקובץ JSON; ValueError אם הקובץ אינו פרופיל תקין"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    config = json.loads(raw.decode("utf-8"))
+    if not isinstance(config, dict):
+        raise ValueError("expected a JSON object")
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    return Vocabulary(name, config, hashlib.sha256(raw).hexdigest()[:16])
+
+
+class VocabularyStore:
+    """
+    פרופילים מקבצי <name>.json בתיקייה, מקומפלים לפי דרישה ונשמרים ב-LRU.
+    הפרופיל default קיים תמיד (מובנה, או מקובץ default.json אם יש).
+    """
+
+    def __init__(self, directory, max_entries=32, check_interval=2.0):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._entries = OrderedDict()  # name -> [vocabulary, (mtime_ns, size), checked_at]
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + ".json") if self.directory else None
+
+    def names(self):
+        """שמות הפרופילים הזמינים (default תמיד ראשון)"""
+        found = set()
+        if self.directory and os.path.isdir(self.directory):
+            for filename in os.listdir(self.directory):
+                stem, ext = os.path.splitext(filename)
+                if ext == ".json" and _PROFILE_NAME.match(stem):
+                    found.add(stem)
+        found.discard(DEFAULT_PROFILE)
+        return [DEFAULT_PROFILE] + sorted(found)
+
+    def _stat(self, name):
+        path = self._path(name)
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        return None if st is None else (st.st_mtime_ns, st.st_size)
+
+    def _load(self, name):
+        vocabulary = load_vocabulary(self._path(name), name)
+        self.loads += 1
+        return vocabulary
+
+    def get(self, name=None):
+        """הפרופיל המקומפל; KeyError אם אין פרופיל כזה"""
+        name = name or DEFAULT_PROFILE
+        if not _PROFILE_NAME.match(name):
+            raise KeyError(name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                if now - entry[2] < self.check_interval:
+                    return entry[0]
+        # בדיקת שינוי בקובץ (stat) - מחוץ למנעול
+        stamp = self._stat(name)
+        if stamp is None:
+            if name != DEFAULT_PROFILE:
+                with self._lock:
+                    self._entries.pop(name, None)
+                raise KeyError(name)
+            vocabulary = DEFAULT_VOCABULARY
+        elif entry is not None and entry[1] == stamp:
+            vocabulary = entry[0]
+        else:
+            try:
+                vocabulary = self._load(name)
+            except (OSError, ValueError) as e:
+                # קובץ שבור: ממשיכים עם הגרסה הקודמת אם יש
+                logger.error("vocabulary profile %s failed to load: %s", name, e)
+                if entry is None:
+                    if name == DEFAULT_PROFILE:
+                        return DEFAULT_VOCABULARY
+                    raise KeyError(name) from e
+                # הגרסה החדשה של הקובץ לא תיקרא שוב עד השינוי הבא
+                vocabulary = entry[0]
+        with self._lock:
+            self._entries[name] = [vocabulary, stamp, now]
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vocabulary
+
+    def warm_up(self):
+        """מקמפלת מראש את הפרופילים שבתיקייה (עד גודל המטמון)"""
+        for name in self.names()[: self.max_entries]:
+            try:
+                self.get(name)
+            except KeyError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            cached = list(self._entries)
+        return {"profiles": self.names(), "cached": cached, "loads": self.loads}